@@ -10,14 +10,23 @@ import json
 from pathlib import Path
 import queue
 
-from services.resolver.core import resolve as resolve_entity
+from services.resolver.cache import resolve_cached as resolve_entity
 from services.mapper.engine import Mapper
-from services.historical.timeseries import stitch_periods, validate_accounting_identities
-from services.historical.kpi import enrich_with_kpis
+from services.mapper.registry import get_mapper
+from services.historical.validation import validate_rows
+from services.historical.frame import HistoricalFrame
+from services.historical.kpi import add_kpis, latest_quarter
+from services.historical.store import HistoryStore
 from services.forecasting.assumptions import Scenario, validate_scenario
-from services.forecasting.engine import project_12q
+from services.forecasting.engine import project_n
 from services.valuation.fcff import FCFFInputs, fcff
 from services.valuation.wacc import WACCInputs, wacc
+from services.valuation.beta import BETA_CACHE, beta_many
+from services.ingestion.prices import PriceStore
+from services.ingestion.fx_rates import convert_rows
+from services.ingestion.stage import IngestRequest, IngestResult, ingest
+from services.ingestion.sources import recording_payloads
+from services.config.env import get_forecast_config, get_ingest_config, get_market_config
 from services.valuation.terminal import TerminalInputs, gordon_pv
 from services.valuation.discount import discount_factors
 from services.exports.writers import write_dcf, write_income_statement, write_metadata
@@ -33,6 +42,7 @@ class Run:
     summary: Dict[str, Any] = field(default_factory=dict)
     artifacts: Dict[str, str] = field(default_factory=dict)  # filename -> content
     error: Optional[str] = None
+    payloads: List[Dict[str, Any]] = field(default_factory=list)  # archived raw inputs (sha256 refs)
 
 
 class RunRegistry:
@@ -89,6 +99,7 @@ def _persist_run(run: "Run") -> None:
         "events": run.events,
         "error": run.error,
         "artifacts": list(run.artifacts.keys()),
+        "payloads": run.payloads,
         "completed_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
     }
     (run_dir / "run.json").write_text(json.dumps(meta, indent=2))
@@ -137,6 +148,84 @@ def _event(run: Run, stage: str, message: str):
     run.events.append({"stage": stage, "message": message, "ts": time.time()})
 
 
+def _levered_beta(ticker: str, live: Optional[IngestResult] = None) -> Optional[float]:
+    """Beta from the local price store (or freshly ingested prices), None when unavailable."""
+    cfg = get_market_config()
+    try:
+        if cfg.price_store_path:
+            return BETA_CACHE.get(ticker, PriceStore(cfg.price_store_path), cfg.beta_benchmark, cfg.beta_window)
+        if live is not None and live.prices is not None and live.benchmark is not None:
+            return beta_many({ticker: live.prices}, live.benchmark, cfg.beta_window)[ticker]
+    except Exception:
+        return None
+    return None
+
+
+def _ingest_live(run: Run, entity, mapper: Mapper) -> Optional[IngestResult]:
+    """Fetch facts, profile, prices and FX for `entity` concurrently (INGEST_LIVE=1 only).
+
+    References to the raw payloads behind the results are recorded on `run.payloads`.
+    """
+    cfg = get_ingest_config()
+    if not cfg.live or not entity.cik:
+        return None
+    market = get_market_config()
+    currency = entity.currency or "USD"
+    req = IngestRequest(
+        cik=entity.cik,
+        tags=tuple(dict.fromkeys([r.tag for r in mapper.rules] + list(mapper.aliases))),
+        unit=currency,
+        ticker=entity.ticker,
+        exchange_hint=entity.exchange,
+        benchmark=market.beta_benchmark,
+        price_store=PriceStore(market.price_store_path) if market.price_store_path else None,
+        fx_quote=currency if currency != "USD" else None,
+        history_store=HistoryStore(cfg.history_store_path) if cfg.history_store_path and currency == "USD" else None,
+        mapper=mapper,
+    )
+    with recording_payloads() as refs:
+        result = ingest(req, per_host=cfg.per_host_concurrency)
+    unique: Dict[tuple, Dict[str, Any]] = {}
+    for ref in refs:
+        unique.setdefault((ref["url"], ref["sha256"]), ref)
+    run.payloads = list(unique.values())
+    return result
+
+
+def _history_from_facts(live: IngestResult, mapper: Mapper, currency: str):
+    """(annual, quarterly) canonical rows from ingested facts, in USD.
+
+    USD filers arrive already mapped (`live.history`) when a history store
+    (HISTORY_STORE_PATH) is configured, so only periods touched by new
+    filings were extracted and mapped.
+    """
+    if live.history is not None:
+        periods = [(p["period_end"], p["period_type"], p["lines"]) for _, p in sorted(live.history.periods.items())]
+    else:
+        rows = live.facts.rows()
+        tags = list(live.facts.values)
+        if currency != "USD":
+            if live.fx is None:
+                raise ValueError(f"no {currency}/USD rates ingested")
+            # balances convert at the closing rate, flows at the period's
+            # average rate; facts often predate the FX history, so keep
+            # the periods it covers
+            flows = [t for t in tags if t not in live.facts.instants]
+            rows = convert_rows(rows, tags, currency, "USD", live.fx, drop_missing=True, flows=flows)
+            if not rows:
+                raise ValueError(f"no {currency}/USD rates cover the ingested periods")
+        mapped_rows = mapper.map_periods(({t: r[t] for t in tags if t in r} for r in rows), unit="USD")
+        periods = [(r["period_end"], r["period_type"], m) for r, m in zip(rows, mapped_rows)]
+    annual: List[Dict[str, Any]] = []
+    quarterly: List[Dict[str, Any]] = []
+    for period_end, period_type, mapped in periods:
+        if "revenue" not in mapped:
+            continue
+        out = {"period_end": period_end, "period_type": period_type, **mapped}
+        (annual if period_type == "A" else quarterly).append(out)
+    return annual, quarterly
+
+
 def orchestrate(run: Run):
     try:
         run.status = "running"
@@ -147,29 +236,48 @@ def orchestrate(run: Run):
             raise ValueError("No entity candidates found")
         entity = cands[0].entity
 
-        # Ingestion (stub): create tiny facts and map
-        _event(run, "Ingest", "Fetching & mapping facts (stub dataset)")
-        mapper = Mapper.from_json_path("services/mapper/mapping_gaap.json")
-        facts = {
-            "RevenueFromContractWithCustomerExcludingAssessedTax": 1000.0,
-            "CostOfRevenue": 400.0,
-            "ResearchAndDevelopmentExpense": 50.0,
-            "SellingGeneralAndAdministrativeExpense": 100.0,
-            "OperatingIncomeLoss": 200.0,
-            "DepreciationAndAmortization": 30.0,
-        }
-        mapped = mapper.map_period(facts, unit="USD")
+        mapper = get_mapper()
+        live = _ingest_live(run, entity, mapper)
+        annual: List[Dict[str, Any]] = []
+        quarterly: List[Dict[str, Any]] = []
+        fiscal_year_end = entity.fiscal_year_end or "12-31"
+        if live is not None:
+            _event(run, "Ingest", f"Fetched {len(live.timings)} sources concurrently in {live.elapsed:.2f}s")
+            for name, err in sorted(live.errors.items()):
+                _event(run, "Ingest", f"{name} unavailable: {err}")
+            if live.profile and live.profile.get("fiscal_year_end"):
+                fiscal_year_end = live.profile["fiscal_year_end"]
+            if live.history is not None or (live.facts is not None and len(live.facts)):
+                try:
+                    annual, quarterly = _history_from_facts(live, mapper, entity.currency or "USD")
+                except ValueError as e:
+                    _event(run, "Ingest", f"FX conversion failed: {e}")
+
+        if not annual and not quarterly:
+            # Ingestion (stub): create tiny facts and map
+            _event(run, "Ingest", "Fetching & mapping facts (stub dataset)")
+            facts = {
+                "RevenueFromContractWithCustomerExcludingAssessedTax": 1000.0,
+                "CostOfRevenue": 400.0,
+                "ResearchAndDevelopmentExpense": 50.0,
+                "SellingGeneralAndAdministrativeExpense": 100.0,
+                "OperatingIncomeLoss": 200.0,
+                "DepreciationAndAmortization": 30.0,
+            }
+            mapped = mapper.map_period(facts, unit="USD")
+            annual = [{"period_end": "2023-12-31", "period_type": "A", **mapped, "ar": 100, "inventory": 80, "ap": 70}]
+            quarterly = [{"period_end": "2023-09-30", "period_type": "Q", **mapped}]
 
         # Historical build
         _event(run, "Map", "Building historical series")
-        annual = [{"period_end": "2023-12-31", "period_type": "A", **mapped, "ar": 100, "inventory": 80, "ap": 70}]
-        quarterly = [{"period_end": "2023-09-30", "period_type": "Q", **mapped}]
-        hist = stitch_periods(annual, quarterly)
-        hist = enrich_with_kpis(hist)
-        identities_ok = validate_accounting_identities(hist)
+        frame = HistoricalFrame.stitch(HistoricalFrame.from_rows(annual), HistoricalFrame.from_rows(quarterly))
+        hist = add_kpis(frame).to_rows()
+        identities_ok = validate_rows(hist, identities=("cash_flow",)).ok
 
         # Forecast
-        _event(run, "Forecast", "Projecting 12 quarters")
+        forecast_cfg = get_forecast_config()
+        periods = "years" if forecast_cfg.period == "A" else "quarters"
+        _event(run, "Forecast", f"Projecting {forecast_cfg.horizon} {periods}")
         scenario = Scenario(
             revenue_growth_qoq=0.02,
             target_gross_margin=0.6,
@@ -180,8 +288,17 @@ def orchestrate(run: Run):
             tax_rate=0.25,
         )
         validate_scenario(scenario)
-        last_q = {**hist[-1]}
-        fcast = project_12q(last_q, scenario)
+        # a 10-K's FY row is newest after stitching; seed from a quarter, never the full year
+        last_q = latest_quarter(hist)
+        fcast = project_n(last_q, scenario, forecast_cfg.horizon, forecast_cfg.period)
+
+        # Market data: levered beta vs the benchmark index
+        beta = _levered_beta(entity.ticker, live)
+        if beta is None:
+            beta = 1.0
+            _event(run, "Market", "No price history; using beta 1.0")
+        else:
+            _event(run, "Market", f"Levered beta {beta:.2f}")
 
         # Valuation (build dcf rows from forecast)
         _event(run, "DCF", "Computing FCFF and DCF")
@@ -194,6 +311,7 @@ def orchestrate(run: Run):
             fcfs.append(f)
             dcf_rows.append({
                 "period_end": f"T+{idx}",
+                "period_type": forecast_cfg.period,
                 "ebit": r["ebit"],
                 "tax_rate": tax_rate,
                 "nopat": r["ebit"] * (1 - tax_rate),
@@ -202,10 +320,10 @@ def orchestrate(run: Run):
                 "delta_nwc": r["delta_nwc"],
                 "fcf": f,
             })
-        w = wacc(WACCInputs(rf=0.03, erp=0.05, beta=1.0, tax_rate=0.25, debt_ratio=0.2, equity_ratio=0.8, rd=0.05))
+        w = wacc(WACCInputs(rf=0.03, erp=0.05, beta=beta, tax_rate=0.25, debt_ratio=0.2, equity_ratio=0.8, rd=0.05))
         dfs = discount_factors(w, len(fcfs))
         pv_fcfs = [f * df for f, df in zip(fcfs, dfs)]
-        # Terminal at T+12 based on next period FCF with g
+        # Terminal at the last forecast period based on next period FCF with g
         g = 0.03
         last_fcf_next = fcfs[-1] * (1 + g)
         tv = gordon_pv(TerminalInputs(last_fcf=last_fcf_next, wacc=w, g=g))
@@ -235,7 +353,7 @@ def orchestrate(run: Run):
                 "basis": "US-GAAP",
                 "currency": entity.currency or "USD",
                 "period_end": "T+1",
-                "period_type": "Q",
+                "period_type": forecast_cfg.period,
                 "revenue": fcast[0]["revenue"],
                 "cogs": fcast[0]["cogs"],
                 "gross_profit": fcast[0]["gross_profit"],
@@ -251,17 +369,29 @@ def orchestrate(run: Run):
                 "company_key": f"{entity.ticker}/{entity.exchange}",
                 "basis": "US-GAAP",
                 "currency": entity.currency or "USD",
-                "fiscal_year_end": "12-31",
+                "fiscal_year_end": fiscal_year_end,
                 "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
                 "mapper_version": "0.1",
-                "taxonomy_version": "2024.0",
+                "taxonomy_version": mapper.taxonomy_version or "unknown",
                 "code_sha": "dev",
             }
         ])
         assumptions = assumptions_md(asdict(scenario), warnings=["identities_ok" if identities_ok else "identity_failed"])
-        validation = validation_report_md({
-            "cash_flow_identity": validate_accounting_identities(fcast),
-        })
+        hist_check = validate_rows(hist)
+        fcast_check = validate_rows(fcast)
+        validation = validation_report_md(
+            {
+                "cash_flow_identity": fcast_check.checks["cash_flow"].ok,
+                "delta_cash_identity": fcast_check.checks["delta_cash"].ok,
+                "historical_identities": hist_check.ok,
+            },
+            details={
+                "historical_periods": len(hist),
+                "forecast_periods": len(fcast),
+            },
+            failures=[{**f, "identity": f"historical.{f['identity']}"} for f in hist_check.failures()]
+            + [{**f, "identity": f"forecast.{f['identity']}"} for f in fcast_check.failures()],
+        )
 
         run.artifacts = {
             "dcf.csv": dcf_csv,
@@ -274,7 +404,10 @@ def orchestrate(run: Run):
             "ev": ev,
             "equity_value": equity,
             "wacc": w,
+            "beta": beta,
             "g": g,
+            "horizon": forecast_cfg.horizon,
+            "period": forecast_cfg.period,
         }
         run.status = "completed"
         _event(run, "Done", "Run completed")
@@ -2,6 +2,9 @@ from __future__ import annotations
 from typing import Any
 from flask import Flask, request, jsonify, Response
 from services.api.orchestrator import REGISTRY, start_run, ARTIFACTS_ROOT
+from services.resolver.cache import CACHE as RESOLVER_CACHE
+from services.mapper.registry import MAPPERS
+from services.resolver.core import candidate_to_dict, resolve_many
 
 import os
 import io
@@ -36,6 +39,11 @@ def _get_rate_limit() -> tuple[int, float]:
 
 _recent: dict[str, deque[float]] = defaultdict(lambda: deque(maxlen=100))
 
+# Upper bound on names per POST /resolve request
+RESOLVE_MAX_BATCH = int(os.environ.get('RESOLVE_MAX_BATCH', '5000'))
+# Upper bound on candidates per name ('limit')
+RESOLVE_MAX_LIMIT = int(os.environ.get('RESOLVE_MAX_LIMIT', '50'))
+
 # Optional WebSocket support
 if Sock is not None:
     sock = Sock(app)
@@ -78,8 +86,8 @@ def _check_rate_limit(ip: str):
 
 @app.before_request
 def _auth_and_rate_limit():
-    # Only enforce for API routes under /runs; skip static or root
-    if request.path.startswith('/runs'):
+    # Only enforce for API routes under /runs and /resolve; skip static or root
+    if request.path.startswith('/runs') or request.path == '/resolve':
         # Auth
         unauthorized = _check_api_key()
         if unauthorized is not None:
@@ -100,6 +108,28 @@ def post_runs():
     rid = start_run(name)
     return jsonify({'run_id': rid, 'status': 'queued'})
 
+@app.post('/resolve')
+def post_resolve():
+    payload = request.get_json(force=True, silent=True) or {}
+    names = payload.get('company_names')
+    if names is None and payload.get('company_name'):
+        names = [payload.get('company_name')]
+    if not isinstance(names, list) or not names or not all(isinstance(n, str) for n in names):
+        return jsonify({'error': 'company_name or company_names is required'}), 400
+    if len(names) > RESOLVE_MAX_BATCH:
+        return jsonify({'error': f'at most {RESOLVE_MAX_BATCH} names per request'}), 400
+    try:
+        limit = int(payload.get('limit', 5))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'limit must be an integer'}), 400
+    if not 1 <= limit <= RESOLVE_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {RESOLVE_MAX_LIMIT}'}), 400
+    results = resolve_many(names, limit=limit)
+    return jsonify({'results': [
+        {'query': n, 'candidates': [candidate_to_dict(c) for c in cands]}
+        for n, cands in zip(names, results)
+    ]})
+
 @app.get('/runs/<rid>')
 def get_run(rid: str):
     r = REGISTRY.get(rid)
@@ -129,6 +159,11 @@ def get_artifact(rid: str, name: str):
     else:
         mimetype = 'application/octet-stream'
     return Response(body, mimetype=mimetype)
+@app.get('/metrics')
+def get_metrics():
+    # JSON counters for scraping
+    return jsonify({'resolver_cache': RESOLVER_CACHE.stats(), 'mapper_registry': MAPPERS.stats()})
+
 # Optional: OpenAPI spec route (serves static JSON file)
 @app.get('/openapi.json')
 def get_openapi():
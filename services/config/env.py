@@ -15,10 +15,18 @@ def get_sec_config() -> SECConfig:
 @dataclass(frozen=True)
 class MarketConfig:
     alpha_vantage_key: str | None = None
+    price_store_path: str | None = None  # PriceStore directory; beta falls back to 1.0 when unset
+    beta_benchmark: str = "^SPX"
+    beta_window: int = 252  # trading days
 
 
 def get_market_config() -> MarketConfig:
-    return MarketConfig(alpha_vantage_key=os.getenv("ALPHAVANTAGE_API_KEY"))
+    return MarketConfig(
+        alpha_vantage_key=os.getenv("ALPHAVANTAGE_API_KEY"),
+        price_store_path=os.getenv("PRICE_STORE_PATH"),
+        beta_benchmark=os.getenv("BETA_BENCHMARK", "^SPX"),
+        beta_window=int(os.getenv("BETA_WINDOW_DAYS", "252")),
+    )
 
 
 @dataclass(frozen=True)
@@ -29,3 +37,76 @@ class FXConfig:
 def get_fx_config() -> FXConfig:
     return FXConfig()
 
+
+
+@dataclass(frozen=True)
+class ResolverConfig:
+    entity_store_path: str | None = None  # compiled entity store; seed entities when unset
+    cache_size: int = 4096
+    cache_ttl_sec: float = 3600.0
+    negative_ttl_sec: float = 300.0  # unresolvable names
+
+
+def get_resolver_config() -> ResolverConfig:
+    return ResolverConfig(
+        entity_store_path=os.getenv("ENTITY_STORE_PATH"),
+        cache_size=int(os.getenv("RESOLVER_CACHE_SIZE", "4096")),
+        cache_ttl_sec=float(os.getenv("RESOLVER_CACHE_TTL_SEC", "3600")),
+        negative_ttl_sec=float(os.getenv("RESOLVER_NEGATIVE_TTL_SEC", "300")),
+    )
+
+
+@dataclass(frozen=True)
+class HTTPConfig:
+    cache_dir: str = "./.http_cache"
+    timeout_sec: float = 30.0
+    max_retries: int = 3
+    backoff_base_sec: float = 0.5
+    sec_rate_per_sec: float = 10.0  # SEC fair-access limit
+
+
+def get_http_config() -> HTTPConfig:
+    return HTTPConfig(
+        cache_dir=os.getenv("HTTP_CACHE_DIR", "./.http_cache"),
+        timeout_sec=float(os.getenv("HTTP_TIMEOUT_SEC", "30")),
+        max_retries=int(os.getenv("HTTP_MAX_RETRIES", "3")),
+        backoff_base_sec=float(os.getenv("HTTP_BACKOFF_BASE_SEC", "0.5")),
+        sec_rate_per_sec=float(os.getenv("SEC_RATE_PER_SEC", "10")),
+    )
+
+
+@dataclass(frozen=True)
+class IngestConfig:
+    live: bool = False  # fetch SEC/market/FX during runs; stub dataset when off
+    per_host_concurrency: int = 4
+    history_store_path: str | None = None  # per-company mapped history, refreshed incrementally
+
+
+def get_ingest_config() -> IngestConfig:
+    return IngestConfig(
+        live=os.getenv("INGEST_LIVE", "0").lower() in {"1", "true", "yes"},
+        per_host_concurrency=int(os.getenv("INGEST_PER_HOST", "4")),
+        history_store_path=os.getenv("HISTORY_STORE_PATH") or None,
+    )
+
+
+@dataclass(frozen=True)
+class ForecastConfig:
+    horizon: int = 12  # periods projected before the terminal value
+    period: str = "Q"  # "Q" quarters or "A" fiscal years
+
+
+def get_forecast_config() -> ForecastConfig:
+    return ForecastConfig(
+        horizon=int(os.getenv("FORECAST_HORIZON", "12")),
+        period=os.getenv("FORECAST_PERIOD", "Q").upper(),
+    )
+
+
+@dataclass(frozen=True)
+class ArchiveConfig:
+    path: str | None = None  # raw payload archive; runs record no payloads when unset
+
+
+def get_archive_config() -> ArchiveConfig:
+    return ArchiveConfig(path=os.getenv("PAYLOAD_ARCHIVE_DIR") or None)
@@ -13,7 +13,11 @@ def assumptions_md(assumptions: Dict[str, Any], warnings: List[str] | None = Non
     return "\n".join(lines) + "\n"
 
 
-def validation_report_md(checks: Dict[str, bool], details: Dict[str, Any] | None = None) -> str:
+def validation_report_md(
+    checks: Dict[str, bool],
+    details: Dict[str, Any] | None = None,
+    failures: List[Dict[str, Any]] | None = None,
+) -> str:
     lines = ["# Validation Report", ""]
     for k, ok in checks.items():
         lines.append(f"- {k}: {'PASS' if ok else 'FAIL'}")
@@ -21,4 +25,11 @@ def validation_report_md(checks: Dict[str, bool], details: Dict[str, Any] | None
         lines.append("\n## Details")
         for k, v in details.items():
             lines.append(f"- {k}: {v}")
+    if failures:
+        lines.append("\n## Failing periods")
+        lines.append("")
+        lines.append("| identity | period | residual |")
+        lines.append("|---|---|---|")
+        for f in failures:
+            lines.append(f"| {f['identity']} | {f['period']} | {f['residual']:.6g} |")
     return "\n".join(lines) + "\n"
@@ -9,7 +9,7 @@ SCHEMAS = {
         "company_id","basis","currency","period_end","period_type","revenue","cogs","gross_profit","rnd","sma","gna","da","ebit","interest_net","pretax","tax","net_income","nci"
     ],
     "dcf": [
-        "period_end","ebit","tax_rate","nopat","da","capex","delta_nwc","fcf","discount_factor","pv_fcf","terminal_value","pv_terminal","ev","net_cash","equity_value","shares","value_per_share"
+        "period_end","ebit","tax_rate","nopat","da","capex","delta_nwc","fcf","discount_factor","pv_fcf","terminal_value","pv_terminal","ev","net_cash","equity_value","shares","value_per_share","period_type"
     ],
     "metadata": [
         "run_id","company_key","basis","currency","fiscal_year_end","generated_at","mapper_version","taxonomy_version","code_sha"
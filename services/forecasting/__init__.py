@@ -1,6 +1,8 @@
-"""Forecasting Engine (Phase 5): 12Q projections driven by assumptions.
+"""Forecasting Engine (Phase 5): quarterly/annual projections driven by assumptions.
 
 - assumptions.py: Scenario schema and validators
 - engine.py: Pure functions to project IS/BS/CF with accounting identities
+  (project_n for any horizon, project_12q as the 12-quarter default);
+  project_grid runs a batch of scenarios in one pass
 """
 
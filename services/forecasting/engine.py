@@ -1,9 +1,19 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, Any, List
+from array import array
+from dataclasses import dataclass, fields, replace
+from itertools import accumulate, product, repeat
+from operator import mul
+from typing import Dict, Any, Iterable, List, Sequence, Tuple
 from services.forecasting.assumptions import Scenario, validate_scenario
 
 
+# Line items of a projected period, in project_12q's row order
+LINES: Tuple[str, ...] = (
+    "revenue", "cogs", "gross_profit", "ebit", "tax", "net_income", "da", "capex",
+    "ar", "inventory", "ap", "delta_nwc", "cfo", "cfi", "cff", "delta_cash",
+)
+
+
 def project_12q(history_last_q: Dict[str, float], scenario: Scenario) -> List[Dict[str, Any]]:
     """Project 12 quarters given last historical quarter and scenario.
 
@@ -20,67 +30,170 @@ def project_12q(history_last_q: Dict[str, float], scenario: Scenario) -> List[Di
     - CFI = -Capex (MVP simplification)
     - ΔCash = CFO + CFI + CFF (CFF defaults to 0 in MVP)
     """
+    return project_n(history_last_q, scenario, horizon=12, period="Q")
+
+
+# Days per projected period, used to turn DSO/DIO/DPO into balance levels
+PERIOD_DAYS = {"Q": 90, "A": 365}
+
+
+def project_n(
+    history_last_q: Dict[str, float], scenario: Scenario, horizon: int = 12, period: str = "Q"
+) -> List[Dict[str, Any]]:
+    """Project `horizon` quarters (period="Q") or fiscal years (period="A").
+
+    Each line is computed for all periods at once: revenue is the
+    cumulative product of the growth factor, flows are fixed shares of
+    revenue, and working-capital levels follow from days over the period
+    length, so ΔNWC is just the difference between consecutive levels
+    (the first against the balances in `history_last_q`). Same rows and
+    identities as project_12q, which is project_n(..., 12, "Q").
+
+    Annual periods compound the quarterly growth: year 1 revenue is the
+    next four quarters summed, and each later year grows by (1+g)^4.
+    """
     validate_scenario(scenario)
+    if horizon < 1:
+        raise ValueError("horizon must be at least 1 period")
+    if period not in PERIOD_DAYS:
+        raise ValueError(f"period must be one of {sorted(PERIOD_DAYS)}")
+    days = PERIOD_DAYS[period]
+
+    rev0 = float(history_last_q.get("revenue", 0.0))
+    growth = 1.0 + scenario.revenue_growth_qoq
+    if period == "A":
+        first = rev0 * sum(growth ** k for k in range(1, 5))
+        growth = growth ** 4
+    else:
+        first = rev0 * growth
+    revenue = list(accumulate(repeat(growth, horizon - 1), mul, initial=first))
+
+    cogs = [r * (1.0 - scenario.target_gross_margin) for r in revenue]
+    ebit = [r * scenario.target_operating_margin for r in revenue]
+    da = [r * scenario.da_pct_revenue for r in revenue]
+    capex = [r * scenario.capex_pct_revenue for r in revenue]
+
+    ar = [(scenario.dso / days) * r for r in revenue]
+    inv = [(scenario.dio / days) * c if c else 0.0 for c in cogs]
+    ap = [(scenario.dpo / days) * c if c else 0.0 for c in cogs]
+    ar_prev = [float(history_last_q.get("ar", 0.0))] + ar[:-1]
+    inv_prev = [float(history_last_q.get("inventory", 0.0))] + inv[:-1]
+    ap_prev = [float(history_last_q.get("ap", 0.0))] + ap[:-1]
+    delta_nwc = [
+        (a1 - a0) + (i1 - i0) - (p1 - p0)
+        for a1, a0, i1, i0, p1, p0 in zip(ar, ar_prev, inv, inv_prev, ap, ap_prev)
+    ]
+
+    # Taxes on operating income; no interest for MVP so net income is NOPAT
+    tax = [max(0.0, e * scenario.tax_rate) for e in ebit]
+    nopat = [e - t for e, t in zip(ebit, tax)]
+
+    # Cash flow components (simplified MVP): CFI = -capex, CFF = 0
+    cfo = [n + d - w for n, d, w in zip(nopat, da, delta_nwc)]
+    cfi = [-c for c in capex]
+    cff = 0.0
+
+    gross_profit = [r - c for r, c in zip(revenue, cogs)]
+    delta_cash = [o + i + cff for o, i in zip(cfo, cfi)]
+    columns = (revenue, cogs, gross_profit, ebit, tax, nopat, da, capex, ar, inv, ap,
+               delta_nwc, cfo, cfi, [cff] * horizon, delta_cash)
+    return [dict(zip(LINES, values)) for values in zip(*columns)]
+
+
+@dataclass
+class ForecastGrid:
+    """Scenarios x quarters x lines, stored flat in one float64 array.
+
+    `values[(s * n_quarters + t) * len(LINES) + l]` is line `l` of quarter
+    `t + 1` under scenario `s`.
+    """
 
-    rows: List[Dict[str, Any]] = []
-
-    rev = float(history_last_q.get("revenue", 0.0))
-    ar = float(history_last_q.get("ar", 0.0))
-    inv = float(history_last_q.get("inventory", 0.0))
-    ap = float(history_last_q.get("ap", 0.0))
-
-    for t in range(1, 13):
-        # Revenue
-        rev = rev * (1.0 + scenario.revenue_growth_qoq)
-        gross_margin = scenario.target_gross_margin
-        op_margin = scenario.target_operating_margin
-        cogs = rev * (1.0 - gross_margin)
-        ebit = rev * op_margin
-
-        # D&A and capex
-        da = rev * scenario.da_pct_revenue
-        capex = rev * scenario.capex_pct_revenue
-
-        # Working capital levels from days
-        days = 90
-        ar_level = (scenario.dso / days) * rev
-        inv_level = (scenario.dio / days) * cogs if cogs else 0.0
-        ap_level = (scenario.dpo / days) * cogs if cogs else 0.0
-        delta_nwc = (ar_level - ar) + (inv_level - inv) - (ap_level - ap)
-
-        # Taxes on operating income
-        tax = max(0.0, ebit * scenario.tax_rate)
-        nopat = ebit - tax
-
-        # Cash flow components (simplified MVP)
-        cfo = nopat + da - delta_nwc
-        cfi = -capex
-        cff = 0.0
-        delta_cash = cfo + cfi + cff
-
-        row = {
-            "revenue": rev,
-            "cogs": cogs,
-            "gross_profit": rev - cogs,
-            "ebit": ebit,
-            "tax": tax,
-            "net_income": nopat,  # no interest for MVP
-            "da": da,
-            "capex": capex,
-            "ar": ar_level,
-            "inventory": inv_level,
-            "ap": ap_level,
-            "delta_nwc": delta_nwc,
-            "cfo": cfo,
-            "cfi": cfi,
-            "cff": cff,
-            "delta_cash": delta_cash,
-        }
-
-        rows.append(row)
-
-        # roll working capital forward for next period base
-        ar, inv, ap = ar_level, inv_level, ap_level
+    n_scenarios: int
+    n_quarters: int
+    values: array
+    lines: Tuple[str, ...] = LINES
 
-    return rows
+    def get(self, s: int, t: int, line: str) -> float:
+        return self.values[(s * self.n_quarters + t) * len(self.lines) + self.lines.index(line)]
 
+    def series(self, s: int, line: str) -> array:
+        """One line across quarters for scenario `s`."""
+        width = len(self.lines)
+        start = s * self.n_quarters * width + self.lines.index(line)
+        return self.values[start:start + self.n_quarters * width:width]
+
+    def rows(self, s: int) -> List[Dict[str, float]]:
+        """Scenario `s` as project_12q-style row dicts."""
+        width = len(self.lines)
+        base = s * self.n_quarters * width
+        return [
+            dict(zip(self.lines, self.values[base + t * width:base + (t + 1) * width]))
+            for t in range(self.n_quarters)
+        ]
+
+
+def scenario_grid(base: Scenario, **axes: Sequence[float]) -> List[Scenario]:
+    """Cartesian product of `base` with each named field swept over its values.
+
+    e.g. scenario_grid(s, revenue_growth_qoq=[0.01, 0.02], target_operating_margin=[0.15, 0.2])
+    """
+    names = {f.name for f in fields(Scenario)}
+    unknown = set(axes) - names
+    if unknown:
+        raise ValueError(f"unknown scenario fields: {sorted(unknown)}")
+    keys = list(axes)
+    return [replace(base, **dict(zip(keys, combo))) for combo in product(*(axes[k] for k in keys))]
+
+
+def project_grid(history_last_q: Dict[str, float], scenarios: Iterable[Scenario], quarters: int = 12) -> ForecastGrid:
+    """Project many scenarios at once from the same last quarter.
+
+    Each step advances every scenario together (parameter columns in,
+    line columns out), with the same arithmetic as project_12q, so
+    `grid.rows(s) == project_12q(last_q, scenarios[s])` for quarters=12.
+    """
+    scenarios = list(scenarios)
+    for sc in scenarios:
+        validate_scenario(sc)
+    n = len(scenarios)
+    g = [sc.revenue_growth_qoq for sc in scenarios]
+    gm = [sc.target_gross_margin for sc in scenarios]
+    om = [sc.target_operating_margin for sc in scenarios]
+    da_pct = [sc.da_pct_revenue for sc in scenarios]
+    capex_pct = [sc.capex_pct_revenue for sc in scenarios]
+    days = PERIOD_DAYS["Q"]
+    dso = [sc.dso / days for sc in scenarios]
+    dio = [sc.dio / days for sc in scenarios]
+    dpo = [sc.dpo / days for sc in scenarios]
+    tax_rate = [sc.tax_rate for sc in scenarios]
+
+    rev = [float(history_last_q.get("revenue", 0.0))] * n
+    ar = [float(history_last_q.get("ar", 0.0))] * n
+    inv = [float(history_last_q.get("inventory", 0.0))] * n
+    ap = [float(history_last_q.get("ap", 0.0))] * n
+
+    width = len(LINES)
+    values = array("d", bytes(8 * n * quarters * width))
+    for t in range(quarters):
+        rev = [r * (1.0 + x) for r, x in zip(rev, g)]
+        cogs = [r * (1.0 - x) for r, x in zip(rev, gm)]
+        ebit = [r * x for r, x in zip(rev, om)]
+        da = [r * x for r, x in zip(rev, da_pct)]
+        capex = [r * x for r, x in zip(rev, capex_pct)]
+        ar_level = [x * r for x, r in zip(dso, rev)]
+        inv_level = [x * c if c else 0.0 for x, c in zip(dio, cogs)]
+        ap_level = [x * c if c else 0.0 for x, c in zip(dpo, cogs)]
+        delta_nwc = [(a1 - a0) + (i1 - i0) - (p1 - p0) for a1, a0, i1, i0, p1, p0 in zip(ar_level, ar, inv_level, inv, ap_level, ap)]
+        tax = [max(0.0, e * x) for e, x in zip(ebit, tax_rate)]
+        nopat = [e - x for e, x in zip(ebit, tax)]
+        cfo = [p + d - w for p, d, w in zip(nopat, da, delta_nwc)]
+        cfi = [-c for c in capex]
+        cff = [0.0] * n
+        delta_cash = [o + i + f for o, i, f in zip(cfo, cfi, cff)]
+        gross = [r - c for r, c in zip(rev, cogs)]
+        cols = (rev, cogs, gross, ebit, tax, nopat, da, capex, ar_level, inv_level, ap_level,
+                delta_nwc, cfo, cfi, cff, delta_cash)
+        for line, col in enumerate(cols):
+            values[t * width + line::quarters * width] = array("d", col)
+        ar, inv, ap = ar_level, inv_level, ap_level
+    return ForecastGrid(n, quarters, values)
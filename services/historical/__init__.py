@@ -1,6 +1,10 @@
 """Historical assembly: period stitching and KPI computation.
 
 - timeseries.py: stitch periods (A/Q), normalize/derive fields
-- kpi.py: margins, DSO/DPO/DIO, capex %, cash conversion
+- frame.py: columnar HistoricalFrame (period axis + one array per line) with row adapters
+- store.py: per-company mapped history, refreshed incrementally by accession
+- kpi.py: margins, DSO/DPO/DIO, capex %, cash conversion (rows or frames)
+- validation.py: column-wise accounting identities with per-period violations
+- peers.py: peer medians/percentiles and ratios over frames columns
 """
 
@@ -0,0 +1,152 @@
+"""Columnar historical series: one array per line item on a shared period axis.
+
+`HistoricalFrame` holds
+- `days`: period-end dates as ordinal day numbers (int32)
+- `types`: period type per row ('A' or 'Q')
+- `columns`: {line: array('d')} for numeric fields, NaN where a period has no value
+- `objects`: {field: list} for anything else (accession numbers, currency, ...)
+
+`stitch` dedupes and sorts with one key per period instead of per-row dict
+copies and date parsing, and KPI enrichment (see kpi.py) adds columns in
+place. `from_rows`/`to_rows` convert to and from the row dicts used by
+`stitch_periods` and the exporters.
+"""
+
+from __future__ import annotations
+import math
+from array import array
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+_NAN = math.nan
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+class HistoricalFrame:
+    def __init__(
+        self,
+        days: Optional[array] = None,
+        types: Optional[List[str]] = None,
+        columns: Optional[Dict[str, array]] = None,
+        objects: Optional[Dict[str, List[Any]]] = None,
+    ):
+        self.days = days if days is not None else array("i")
+        self.types = types if types is not None else []
+        self.columns = columns if columns is not None else {}
+        self.objects = objects if objects is not None else {}
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def period_ends(self) -> List[str]:
+        return [date.fromordinal(d).isoformat() for d in self.days]
+
+    def column(self, name: str) -> array:
+        """Numeric column (all-NaN if the frame has no such line)."""
+        col = self.columns.get(name)
+        return col if col is not None else array("d", [_NAN]) * len(self)
+
+    def set_column(self, name: str, values: Iterable[float]) -> None:
+        col = array("d", values)
+        if len(col) != len(self):
+            raise ValueError(f"column {name!r} has {len(col)} values for {len(self)} periods")
+        self.columns[name] = col
+
+    # -- adapters ------------------------------------------------------
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, Any]]) -> "HistoricalFrame":
+        """Build from row dicts, normalizing period keys like `stitch_periods`.
+
+        Rows without a period end or with a type other than A/Q are dropped.
+        Numeric fields become float columns; other fields are kept as objects.
+        """
+        kept: List[Dict[str, Any]] = []
+        days = array("i")
+        types: List[str] = []
+        for r in rows:
+            pe = r.get("period_end") or r.get("periodEnd")
+            pt = str(r.get("period_type") or r.get("periodType") or r.get("type") or "").upper()
+            if not pe or pt not in {"A", "Q"}:
+                continue
+            days.append(date.fromisoformat(str(pe)[:10]).toordinal())
+            types.append(pt)
+            kept.append(r)
+        numeric: Dict[str, bool] = {}
+        for r in kept:
+            for k, v in r.items():
+                if k in ("period_end", "period_type", "periodEnd", "periodType", "type") or v is None:
+                    continue
+                numeric[k] = numeric.get(k, True) and _is_number(v)
+        columns: Dict[str, array] = {}
+        objects: Dict[str, List[Any]] = {}
+        for k, is_num in numeric.items():
+            if is_num:
+                columns[k] = array("d", (float(r[k]) if r.get(k) is not None else _NAN for r in kept))
+            else:
+                objects[k] = [r.get(k) for r in kept]
+        return cls(days, types, columns, objects)
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """Row dicts (period_end, period_type, then fields); NaN/None fields are omitted."""
+        ends = self.period_ends
+        rows: List[Dict[str, Any]] = []
+        for i in range(len(self)):
+            row: Dict[str, Any] = {"period_end": ends[i], "period_type": self.types[i]}
+            for k, col in self.objects.items():
+                if col[i] is not None:
+                    row[k] = col[i]
+            for k, col in self.columns.items():
+                v = col[i]
+                if v == v:
+                    row[k] = v
+            rows.append(row)
+        return rows
+
+    # -- reshaping -----------------------------------------------------
+    def take(self, idx: Sequence[int]) -> "HistoricalFrame":
+        """New frame with rows `idx` (in that order)."""
+        return HistoricalFrame(
+            array("i", (self.days[i] for i in idx)),
+            [self.types[i] for i in idx],
+            {k: array("d", (c[i] for i in idx)) for k, c in self.columns.items()},
+            {k: [c[i] for i in idx] for k, c in self.objects.items()},
+        )
+
+    @classmethod
+    def concat(cls, frames: Sequence["HistoricalFrame"]) -> "HistoricalFrame":
+        out = cls()
+        names = list(dict.fromkeys(k for f in frames for k in f.columns))
+        onames = list(dict.fromkeys(k for f in frames for k in f.objects))
+        for k in names:
+            out.columns[k] = array("d")
+        for k in onames:
+            out.objects[k] = []
+        for f in frames:
+            out.days.extend(f.days)
+            out.types.extend(f.types)
+            for k in names:
+                out.columns[k].extend(f.column(k))
+            for k in onames:
+                out.objects[k].extend(f.objects.get(k, [None] * len(f)))
+        return out
+
+    def _keys(self) -> List[int]:
+        # one sortable int per period: date, then A before Q
+        return [d * 2 + (t == "Q") for d, t in zip(self.days, self.types)]
+
+    def dedupe_sort(self) -> "HistoricalFrame":
+        """Keep the first row per (period_end, period_type), sorted by date then A before Q."""
+        keys = self._keys()
+        first: Dict[int, int] = {}
+        for i, k in enumerate(keys):
+            first.setdefault(k, i)
+        return self.take(sorted(first.values(), key=keys.__getitem__))
+
+    @classmethod
+    def stitch(cls, annual: "HistoricalFrame", quarterly: "HistoricalFrame") -> "HistoricalFrame":
+        """Columnar `stitch_periods`: annual rows win over duplicates, then sort."""
+        return cls.concat([annual, quarterly]).dedupe_sort()
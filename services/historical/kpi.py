@@ -1,5 +1,9 @@
 from __future__ import annotations
-from typing import Dict, Any, List
+import math
+from datetime import date
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Sequence
+
+from services.historical.frame import HistoricalFrame
 
 
 def safe_div(a: float, b: float) -> float:
@@ -55,3 +59,154 @@ def enrich_with_kpis(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         out.append({**r, **k})
     return out
 
+
+
+def _ratio(num, den, scale=None):
+    """num/den per period; NaN where either side is missing or den is 0."""
+    out = []
+    for i, (a, b) in enumerate(zip(num, den)):
+        if a != a or b != b or b == 0:
+            out.append(math.nan)
+        else:
+            out.append(a / b if scale is None else scale[i] * (a / b))
+    return out
+
+
+def add_kpis(frame: HistoricalFrame) -> HistoricalFrame:
+    """Columnar `enrich_with_kpis`: adds KPI columns to `frame` in place.
+
+    Where a KPI cannot be computed for a period, an existing column of the
+    same name keeps its value, as the row version's {**row, **kpis} does.
+    """
+    rev, cogs = frame.column("revenue"), frame.column("cogs")
+    days = [365.0 if t == "A" else 90.0 for t in frame.types]
+    kpis = {
+        "gross_margin": _ratio(frame.column("gross_profit"), rev),
+        "operating_margin": _ratio(frame.column("ebit"), rev),
+        "dso": _ratio(frame.column("ar"), rev, days),
+        "dio": _ratio(frame.column("inventory"), cogs, days),
+        "dpo": _ratio(frame.column("ap"), cogs, days),
+        "capex_pct_revenue": _ratio(frame.column("capex"), rev),
+    }
+    for name, values in kpis.items():
+        old = frame.columns.get(name)
+        if old is not None:
+            values = [v if v == v else o for v, o in zip(values, old)]
+        elif all(v != v for v in values):
+            continue
+        frame.set_column(name, values)
+    return frame
+
+
+TTM_SUM_FIELDS = ("revenue", "cogs", "gross_profit", "ebit", "da", "capex")
+TTM_MEAN_FIELDS = ("ar", "inventory", "ap")
+_MAX_QUARTER_GAP_DAYS = 100  # consecutive quarter ends are 89-92 days apart
+
+
+def _trailing(frame: HistoricalFrame, col: Sequence[float], window: int, mean: bool) -> List[float]:
+    """Sum (or mean) over the last `window` consecutive quarters, O(n).
+
+    Only Q rows get values; a missing value or a gap of more than one quarter
+    restarts the window, so a TTM figure never spans a hole in the history.
+    """
+    out = [math.nan] * len(frame)
+    days = frame.days
+    prev_day = None
+    run, total = 0, 0.0
+    q_rows: List[int] = []
+    for i, t in enumerate(frame.types):
+        if t != "Q":
+            continue
+        x = col[i]
+        if x != x or (prev_day is not None and days[i] - prev_day > _MAX_QUARTER_GAP_DAYS):
+            run, total = 0, 0.0
+        prev_day = days[i]
+        q_rows.append(i)
+        if x != x:
+            continue
+        run += 1
+        total += x
+        if run > window:
+            total -= col[q_rows[-window - 1]]
+        if run >= window:
+            out[i] = total / window if mean else total
+    return out
+
+
+def add_ttm(
+    frame: HistoricalFrame,
+    sums: Iterable[str] = TTM_SUM_FIELDS,
+    means: Iterable[str] = TTM_MEAN_FIELDS,
+    window: int = 4,
+) -> HistoricalFrame:
+    """Add trailing-window columns to `frame` in place.
+
+    `<field>_ttm` sums flows and `<field>_avg` averages balances over the last
+    `window` quarters; TTM ratios (gross/operating margin, capex %, DSO/DIO/DPO
+    on average balances) follow from those.
+    """
+    for f in sums:
+        if f in frame.columns:
+            frame.set_column(f"{f}_ttm", _trailing(frame, frame.columns[f], window, mean=False))
+    for f in means:
+        if f in frame.columns:
+            frame.set_column(f"{f}_avg", _trailing(frame, frame.columns[f], window, mean=True))
+    rev, cogs = frame.column("revenue_ttm"), frame.column("cogs_ttm")
+    year = [365.0] * len(frame)
+    ratios = {
+        "gross_margin_ttm": _ratio(frame.column("gross_profit_ttm"), rev),
+        "operating_margin_ttm": _ratio(frame.column("ebit_ttm"), rev),
+        "capex_pct_revenue_ttm": _ratio(frame.column("capex_ttm"), rev),
+        "dso_ttm": _ratio(frame.column("ar_avg"), rev, year),
+        "dio_ttm": _ratio(frame.column("inventory_avg"), cogs, year),
+        "dpo_ttm": _ratio(frame.column("ap_avg"), cogs, year),
+    }
+    for name, values in ratios.items():
+        if any(v == v for v in values):
+            frame.set_column(name, values)
+    return frame
+
+
+def latest_quarter(rows: Sequence[Dict[str, Any]], flows: Iterable[str] = TTM_SUM_FIELDS) -> Optional[Dict[str, Any]]:
+    """The newest quarter of stitched (ascending) rows, to seed a quarterly projection.
+
+    When the newest row is a fiscal year and its three earlier quarters are
+    present, the fourth quarter is derived from it: `flows` are the year
+    minus those quarters, balances are the year-end ones. Otherwise the
+    newest Q row is used, and an annual-only history gets a quarter of the
+    latest year's flows. None for no rows.
+    """
+    if not rows:
+        return None
+    last = rows[-1]
+    quarters = [r for r in rows if r.get("period_type") == "Q"]
+    if last.get("period_type") != "A":
+        return dict(last)
+    flows = [f for f in flows if f in last]
+    end = date.fromisoformat(str(last["period_end"])[:10]).toordinal()
+    # Q1-Q3 end 3, 6 and 9 months before the fiscal year end
+    earlier = [r for r in quarters if 0 < end - date.fromisoformat(str(r["period_end"])[:10]).toordinal() < 300]
+    if len(earlier) == 3 and all(isinstance(r.get("revenue"), (int, float)) for r in earlier):
+        q4 = {**last, "period_type": "Q"}
+        for f in flows:
+            if all(isinstance(r.get(f), (int, float)) for r in earlier):
+                q4[f] = last[f] - sum(r[f] for r in earlier)
+            else:
+                del q4[f]  # a full-year figure must not pass for a quarter
+        return q4
+    if quarters:
+        return dict(quarters[-1])
+    return {**last, "period_type": "Q", **{f: last[f] / 4.0 for f in flows if isinstance(last[f], (int, float))}}
+
+
+def kpi_batch(
+    frames: Mapping[str, HistoricalFrame],
+    ttm: bool = True,
+    window: int = 4,
+) -> Dict[str, HistoricalFrame]:
+    """Point-in-time KPIs (and TTM columns) for many companies' frames, in place."""
+    for frame in frames.values():
+        add_kpis(frame)
+        if ttm:
+            add_ttm(frame, window=window)
+    return dict(frames)
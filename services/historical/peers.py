@@ -0,0 +1,71 @@
+"""Peer benchmarks over cross-sectional frames (see ingestion/frames.py).
+
+Everything works on the CIK-sorted columns directly: ratios are a merge
+join of two sorted CIK arrays, and percentiles sort the value column once.
+"""
+
+from __future__ import annotations
+import math
+from array import array
+from typing import Dict, Iterable, Optional
+
+from services.ingestion.frames import FrameColumn
+
+
+def ratio(num: FrameColumn, den: FrameColumn, tag: Optional[str] = None) -> FrameColumn:
+    """Per-company num/den over CIKs present in both (zero denominators dropped)."""
+    ciks, vals = array("q"), array("d")
+    a, b = num.ciks, den.ciks
+    i = j = 0
+    while i < len(a) and j < len(b):
+        ca, cb = a[i], b[j]
+        if ca < cb:
+            i += 1
+        elif cb < ca:
+            j += 1
+        else:
+            d = den.values[j]
+            if d != 0:
+                ciks.append(ca)
+                vals.append(num.values[i] / d)
+            i += 1
+            j += 1
+    return FrameColumn(
+        taxonomy=num.taxonomy,
+        tag=tag or f"{num.tag}/{den.tag}",
+        unit="pure" if num.unit == den.unit else f"{num.unit}/{den.unit}",
+        period=num.period,
+        ciks=ciks,
+        values=vals,
+    )
+
+
+def _quantile(xs: array, q: float) -> float:
+    # linear interpolation between closest ranks (xs sorted, non-empty)
+    pos = (len(xs) - 1) * q
+    lo = int(math.floor(pos))
+    hi = min(lo + 1, len(xs) - 1)
+    return xs[lo] + (xs[hi] - xs[lo]) * (pos - lo)
+
+
+def peer_stats(col: FrameColumn, percentiles: Iterable[float] = (25, 50, 75)) -> Dict[str, float]:
+    """Count, mean, median and requested percentiles of a frame's finite values."""
+    xs = array("d", sorted(v for v in col.values if math.isfinite(v)))
+    out: Dict[str, float] = {"count": float(len(xs))}
+    if not xs:
+        return out
+    out["mean"] = math.fsum(xs) / len(xs)
+    out["median"] = _quantile(xs, 0.5)
+    for p in percentiles:
+        out[f"p{p:g}"] = _quantile(xs, float(p) / 100.0)
+    return out
+
+
+def percentile_rank(col: FrameColumn, cik: int) -> Optional[float]:
+    """Share of peers (0..100) with a value strictly below this company's."""
+    v = col.get(cik)
+    if v is None or not math.isfinite(v):
+        return None
+    finite = [x for x in col.values if math.isfinite(x)]
+    below = sum(1 for x in finite if x < v)
+    return 100.0 * below / len(finite)
@@ -0,0 +1,227 @@
+"""Per-company history store with accession-keyed incremental refresh.
+
+Each company is one JSON file, `<root>/<CIK##########>.json`, holding its
+mapped periods keyed "<period_end>/<A|Q>". Every period records the
+accession number and filing date of the latest filing that reported it
+(`FactTable.accn`/`filed`) and every accession seen for it
+(`FactTable.accns`); the file records a digest of the mapping rules used.
+
+`refresh()` compares a freshly extracted `FactTable` against that record.
+Only periods whose latest (accession, filed) pair changed are re-mapped:
+new periods, restatements from a 10-K/A, or comparatives repeated in a
+new filing. Unchanged periods are reused as stored. When the mapping
+rules (`Mapper.digest`), unit or requested tag set change, every period is
+re-mapped; a new mapping-file version with the same rules is not a change.
+
+`sync()` starts from the raw companyfacts body instead. If its version
+(ETag / Last-Modified, else a digest) matches the one stored, nothing is
+parsed at all; otherwise only the periods with a fact from an accession not
+yet seen for them are extracted and mapped. A warm sync after one new 10-Q therefore
+extracts and maps a handful of periods, not the whole history.
+"""
+
+from __future__ import annotations
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from services.historical.frame import HistoricalFrame
+from services.ingestion.sec_client import (
+    FactTable, extract_many, load_companyfacts_selective, normalize_cik, touched_ends,
+)
+from services.mapper.engine import Mapper
+
+
+@dataclass
+class RefreshStats:
+    periods_total: int = 0
+    periods_mapped: int = 0
+    new_accessions: int = 0
+    full_remap: bool = False
+    unchanged: bool = False  # source version matched; nothing was parsed
+
+
+@dataclass
+class CompanyHistory:
+    cik: str
+    unit: str = "USD"
+    taxonomy_version: Optional[str] = None
+    rules_digest: Optional[str] = None  # `Mapper.digest` of the rules the periods were mapped with
+    tags: List[str] = field(default_factory=list)  # fact tags the periods were mapped from
+    # "<period_end>/<type>" -> {"period_end", "period_type", "accn", "filed", "form", "accns", "lines": {canonical: value}}
+    periods: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    source_version: Optional[str] = None  # companyfacts version the periods reflect
+
+    @property
+    def accessions(self) -> Set[str]:
+        return {a for p in self.periods.values() for a in p.get("accns", ())}
+
+    def accessions_by_end(self) -> Dict[str, Set[str]]:
+        """Period end -> every accession seen for a period ending then."""
+        out: Dict[str, Set[str]] = {}
+        for p in self.periods.values():
+            out.setdefault(p["period_end"], set()).update(p.get("accns", ()))
+        return out
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Mapped rows (period_end, period_type, accn, lines), ascending by date."""
+        return [
+            {"period_end": p["period_end"], "period_type": p["period_type"], "accn": p.get("accn"), **p["lines"]}
+            for _, p in sorted(self.periods.items())
+        ]
+
+    def frame(self) -> HistoricalFrame:
+        return HistoricalFrame.from_rows(self.rows())
+
+
+# bumped when the file layout changes; older files are rebuilt in full
+FORMAT = 3
+
+
+def period_key(period_end: str, period_type: str) -> str:
+    return f"{period_end}/{period_type}"
+
+
+class HistoryStore:
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _path(self, cik: str | int) -> Path:
+        return self.root / f"{normalize_cik(cik)}.json"
+
+    def _lock(self, cik: str | int) -> threading.Lock:
+        with self._locks_guard:
+            return self._locks.setdefault(normalize_cik(cik), threading.Lock())
+
+    def load(self, cik: str | int) -> Optional[CompanyHistory]:
+        try:
+            data = json.loads(self._path(cik).read_text())
+        except (OSError, ValueError):
+            return None
+        if data.get("format") != FORMAT:
+            return None
+        return CompanyHistory(
+            cik=data["cik"],
+            unit=data.get("unit", "USD"),
+            taxonomy_version=data.get("taxonomy_version"),
+            rules_digest=data.get("rules_digest"),
+            tags=data.get("tags", []),
+            periods=data.get("periods", {}),
+            source_version=data.get("source_version"),
+        )
+
+    def save(self, hist: CompanyHistory) -> None:
+        path = self._path(hist.cik)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        body = json.dumps(
+            {
+                "format": FORMAT,
+                "cik": hist.cik,
+                "unit": hist.unit,
+                "taxonomy_version": hist.taxonomy_version,
+                "rules_digest": hist.rules_digest,
+                "tags": hist.tags,
+                "periods": hist.periods,
+                "source_version": hist.source_version,
+            }
+        )
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(body)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def _compatible(self, stored: Optional[CompanyHistory], mapper: Mapper, unit: str, tags: List[str]) -> bool:
+        return (
+            stored is not None
+            and stored.unit == unit
+            and stored.rules_digest == mapper.digest(unit)
+            and stored.tags == tags
+        )
+
+    def _merge(
+        self, cik: str | int, stored: Optional[CompanyHistory], table: FactTable, mapper: Mapper, unit: str, stats: RefreshStats
+    ) -> CompanyHistory:
+        tags = sorted(table.values)
+        if not self._compatible(stored, mapper, unit, tags):
+            stored = CompanyHistory(normalize_cik(cik), unit, mapper.taxonomy_version, mapper.digest(unit), tags)
+            stats.full_remap = True
+        stored.taxonomy_version = mapper.taxonomy_version
+        known = stored.accessions
+        stats.new_accessions = len({a for accns in table.accns for a in accns if a not in known})
+
+        changed: List[int] = []
+        for i, pe in enumerate(table.periods):
+            p = stored.periods.get(period_key(pe, table.period_type[i]))
+            if p is None or p.get("accn") != table.accn[i] or p.get("filed") != table.filed[i]:
+                changed.append(i)
+            else:
+                p["accns"] = sorted(set(p.get("accns", ())).union(table.accns[i]))
+        mapped = mapper.map_periods((table.period_facts(i) for i in changed), unit=unit)
+        for i, lines in zip(changed, mapped):
+            stored.periods[period_key(table.periods[i], table.period_type[i])] = {
+                "period_end": table.periods[i],
+                "period_type": table.period_type[i],
+                "accn": table.accn[i],
+                "filed": table.filed[i],
+                "form": table.form[i],
+                "accns": table.accns[i],
+                "lines": lines,
+            }
+        stats.periods_mapped = len(changed)
+        stats.periods_total = len(stored.periods)
+        return stored
+
+    def refresh(self, cik: str | int, table: FactTable, mapper: Mapper, unit: str = "USD") -> Tuple[CompanyHistory, RefreshStats]:
+        """Merge `table` into the stored history, mapping only changed periods."""
+        with self._lock(cik):
+            stats = RefreshStats()
+            stored = self._merge(cik, self.load(cik), table, mapper, unit, stats)
+            if stats.periods_mapped or stats.full_remap or stats.new_accessions:
+                self.save(stored)
+            return stored, stats
+
+    def sync(
+        self,
+        cik: str | int,
+        body: bytes,
+        tags: List[str],
+        mapper: Mapper,
+        taxonomy: str = "us-gaap",
+        unit: str = "USD",
+        version: Optional[str] = None,
+    ) -> Tuple[CompanyHistory, RefreshStats]:
+        """Bring the history up to date with a raw companyfacts `body`.
+
+        `version` identifies the body (the response's ETag or Last-Modified;
+        a sha256 of the body when None). A version already synced returns
+        the stored history untouched. Otherwise only periods with a fact
+        from an accession not yet seen for them are extracted, unless a
+        full remap is due.
+        """
+        version = version or hashlib.sha256(body).hexdigest()
+        with self._lock(cik):
+            stored = self.load(cik)
+            compatible = self._compatible(stored, mapper, unit, sorted(dict.fromkeys(tags)))
+            if compatible and stored.source_version == version:
+                return stored, RefreshStats(periods_total=len(stored.periods), unchanged=True)
+            payload = load_companyfacts_selective(io.BytesIO(body), taxonomy, tags, [unit])
+            ends = touched_ends(payload, taxonomy, tags, unit, stored.accessions_by_end()) if compatible else None
+            table = extract_many(payload, taxonomy, tags, unit, ends=ends)
+            stats = RefreshStats()
+            stored = self._merge(cik, stored if compatible else None, table, mapper, unit, stats)
+            stored.source_version = version
+            self.save(stored)
+            return stored, stats
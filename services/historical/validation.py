@@ -0,0 +1,133 @@
+"""Column-wise accounting-identity checks with per-period violations.
+
+Each identity is evaluated over whole columns and yields a per-row
+residual (NaN where the inputs are missing) and a violation mask, so
+reports can name the failing periods instead of a single PASS/FAIL.
+
+Identities:
+- cash_flow: CFO + CFI + CFF = cash - previous cash. The previous cash is
+  carried forward over rows without a cash balance, as in
+  `validate_accounting_identities`.
+- delta_cash: CFO + CFI + CFF = delta_cash (forecast rows carry delta_cash)
+- gross_profit: gross_profit = revenue - cogs
+"""
+
+from __future__ import annotations
+import math
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence
+
+from services.historical.frame import HistoricalFrame
+
+IDENTITIES = ("cash_flow", "delta_cash", "gross_profit")
+
+_NAN = math.nan
+
+
+@dataclass
+class IdentityCheck:
+    name: str
+    residual: array  # lhs - rhs per row; NaN where not checkable
+    violations: List[bool]  # |residual| > eps
+
+    @property
+    def checked(self) -> int:
+        return sum(1 for r in self.residual if r == r)
+
+    @property
+    def ok(self) -> bool:
+        return not any(self.violations)
+
+    def failing_rows(self) -> List[int]:
+        return [i for i, bad in enumerate(self.violations) if bad]
+
+
+@dataclass
+class ValidationResult:
+    labels: List[str]  # period label per row (period_end, or T+n for forecasts)
+    checks: Dict[str, IdentityCheck]
+
+    @property
+    def ok(self) -> bool:
+        return all(c.ok for c in self.checks.values())
+
+    def failures(self) -> List[Dict[str, Any]]:
+        """One entry per (identity, failing period), in row order."""
+        return [
+            {"identity": name, "period": self.labels[i], "residual": c.residual[i]}
+            for name, c in self.checks.items()
+            for i in c.failing_rows()
+        ]
+
+
+def _col(columns: Mapping[str, Sequence[float]], name: str, n: int) -> Sequence[float]:
+    col = columns.get(name)
+    return col if col is not None else [_NAN] * n
+
+
+def _carried_previous(cash: Sequence[float]) -> List[float]:
+    """Last known cash strictly before each row (NaN until one exists)."""
+    out, last = [], _NAN
+    for c in cash:
+        out.append(last)
+        if c == c:
+            last = c
+    return out
+
+
+def validate_columns(
+    columns: Mapping[str, Sequence[float]],
+    labels: Sequence[str],
+    eps: float = 1e-3,
+    identities: Iterable[str] = IDENTITIES,
+) -> ValidationResult:
+    """Check `identities` over {line: values} columns (NaN = missing)."""
+    n = len(labels)
+    cfo, cfi, cff = _col(columns, "cfo", n), _col(columns, "cfi", n), _col(columns, "cff", n)
+    flows = [a + b + c for a, b, c in zip(cfo, cfi, cff)]
+    checks: Dict[str, IdentityCheck] = {}
+    for name in identities:
+        if name == "cash_flow":
+            cash = _col(columns, "cash", n)
+            residual = [f - (c - p) for f, c, p in zip(flows, cash, _carried_previous(cash))]
+        elif name == "delta_cash":
+            residual = [f - d for f, d in zip(flows, _col(columns, "delta_cash", n))]
+        elif name == "gross_profit":
+            rev, cogs = _col(columns, "revenue", n), _col(columns, "cogs", n)
+            residual = [g - (r - c) for g, r, c in zip(_col(columns, "gross_profit", n), rev, cogs)]
+        else:
+            raise ValueError(f"unknown identity {name!r}")
+        res = array("d", residual)
+        checks[name] = IdentityCheck(name, res, [r == r and abs(r) > eps for r in res])
+    return ValidationResult(list(labels), checks)
+
+
+def validate_frame(frame: HistoricalFrame, eps: float = 1e-3, identities: Iterable[str] = IDENTITIES) -> ValidationResult:
+    return validate_columns(frame.columns, frame.period_ends, eps, identities)
+
+
+def validate_rows(
+    rows: Sequence[Dict[str, Any]],
+    eps: float = 1e-3,
+    identities: Iterable[str] = IDENTITIES,
+    labels: Optional[Sequence[str]] = None,
+) -> ValidationResult:
+    """Row-dict adapter; rows without period_end are labelled T+1, T+2, ..."""
+    identities = tuple(identities)
+    needed = {"cfo", "cfi", "cff", "cash", "delta_cash", "revenue", "cogs", "gross_profit"}
+    columns = {
+        k: [float(r[k]) if r.get(k) is not None else _NAN for r in rows]
+        for k in needed
+    }
+    if labels is None:
+        labels = [str(r.get("period_end") or f"T+{i + 1}") for i, r in enumerate(rows)]
+    return validate_columns(columns, labels, eps, identities)
+
+
+def validate_batch(
+    frames: Mapping[str, HistoricalFrame], eps: float = 1e-3, identities: Iterable[str] = IDENTITIES
+) -> Dict[str, ValidationResult]:
+    """`validate_frame` for many companies at once."""
+    identities = tuple(identities)
+    return {key: validate_frame(f, eps, identities) for key, f in frames.items()}
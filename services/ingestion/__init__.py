@@ -2,5 +2,15 @@
 
 Pure-Python URL builders, parsers, and polite rate-limit hooks.
 Tests use local JSON fixtures and do not hit the network.
+
+- jsonstream.py: byte-level selective JSON scanner (large companyfacts files)
+- fetcher.py: pooled, rate-limited, cached HTTP GET shared by all clients
+- singleflight.py: coalesces concurrent identical fetch/parse work
+- frames.py: cross-sectional frames (all filers) in a columnar peer store
+- prices.py: array-backed PriceSeries, Stooq CSV parser, append-only per-symbol store
+- fx_rates.py: dated FX store with pivot triangulation and column conversion
+- sources.py: fetch + parse entry points (companyfacts, submissions, frames, Stooq prices, FX)
+- archive.py: content-addressed, gzip-compressed raw payload archive (+ gc)
+- stage.py: concurrent per-run ingestion (asyncio, per-host limits) with a sync facade
 """
 
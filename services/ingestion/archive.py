@@ -0,0 +1,154 @@
+"""Content-addressed archive of raw ingestion payloads.
+
+Each payload is stored once, gzip-compressed, under the sha256 of its raw
+bytes: `<root>/objects/ab/abcdef....gz`. Runs reference payloads by digest
+in their `run.json` (`payloads`), so many runs that saw the same SEC/market/FX
+response share one blob, and any run can be replayed from exactly what it
+fetched. `open()` returns a streaming decompressor, so large companyfacts
+documents are never inflated in memory just to be re-parsed.
+
+`gc()` deletes blobs no `run.json` references (older than a grace period, so
+payloads archived by in-flight runs survive). A dedupe hit in `put()`
+refreshes the blob's mtime, and `gc()` moves a blob aside and re-checks
+its mtime before deleting it, so a blob claimed mid-collection is either
+restored or rewritten by `put()`:
+    python -m services.ingestion.archive gc <archive_dir> <artifacts_root>
+"""
+
+from __future__ import annotations
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set
+
+from services.config.env import get_archive_config
+
+
+class PayloadArchive:
+    def __init__(self, root: str | Path, level: int = 6):
+        self.root = Path(root)
+        self.level = level
+
+    def _path(self, digest: str) -> Path:
+        return self.root / "objects" / digest[:2] / f"{digest}.gz"
+
+    def put(self, data: bytes) -> str:
+        """Store `data` (no-op if already present); returns its sha256 hex digest."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._path(digest)
+        try:
+            os.utime(path)  # claim the existing blob so gc's grace period restarts
+            return digest
+        except FileNotFoundError:
+            pass
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".blob.", dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=self.level, mtime=0) as gz:
+                gz.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return digest
+
+    def __contains__(self, digest: str) -> bool:
+        return self._path(digest).exists()
+
+    def open(self, digest: str) -> BinaryIO:
+        """Binary stream of the original payload (decompressed as it is read)."""
+        path = self._path(digest)
+        if not path.exists():
+            raise KeyError(digest)
+        return gzip.open(path, "rb")
+
+    def get(self, digest: str) -> bytes:
+        with self.open(digest) as f:
+            return f.read()
+
+    def digests(self) -> Iterator[str]:
+        objects = self.root / "objects"
+        if objects.exists():
+            for p in objects.glob("*/*.gz"):
+                yield p.name[:-3]
+
+    def gc(self, referenced: Iterable[str], grace_sec: float = 3600.0) -> Dict[str, int]:
+        """Remove blobs not in `referenced` whose file is older than `grace_sec`."""
+        keep: Set[str] = set(referenced)
+        cutoff = time.time() - grace_sec
+        removed = kept = freed = 0
+        for digest in list(self.digests()):
+            path = self._path(digest)
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if digest in keep or st.st_mtime > cutoff:
+                kept += 1
+                continue
+            # a put() landing between the stat above and the delete either
+            # touched the blob (seen below after the move) or finds it gone
+            # and writes it again
+            doomed = path.with_name(path.name + ".del")
+            try:
+                os.rename(path, doomed)
+            except FileNotFoundError:
+                continue
+            if doomed.stat().st_mtime > cutoff:
+                os.replace(doomed, path)
+                kept += 1
+                continue
+            doomed.unlink(missing_ok=True)
+            removed += 1
+            freed += st.st_size
+        return {"removed": removed, "kept": kept, "bytes_freed": freed}
+
+
+def referenced_digests(artifacts_root: str | Path) -> Set[str]:
+    """Digests referenced by any persisted run (`<artifacts_root>/*/run.json`)."""
+    out: Set[str] = set()
+    for meta_p in Path(artifacts_root).glob("*/run.json"):
+        try:
+            meta = json.loads(meta_p.read_text())
+        except (OSError, ValueError):
+            continue
+        for ref in meta.get("payloads") or []:
+            if isinstance(ref, dict) and ref.get("sha256"):
+                out.add(ref["sha256"])
+    return out
+
+
+_DEFAULT: Optional[PayloadArchive] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_archive() -> Optional[PayloadArchive]:
+    """Process-wide archive at PAYLOAD_ARCHIVE_DIR, or None when archiving is off."""
+    global _DEFAULT
+    path = get_archive_config().path
+    if not path:
+        return None
+    with _DEFAULT_LOCK:
+        if _DEFAULT is None or _DEFAULT.root != Path(path):
+            _DEFAULT = PayloadArchive(path)
+        return _DEFAULT
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 3 or args[0] != "gc":
+        print("Usage: python -m services.ingestion.archive gc <archive_dir> <artifacts_root>")
+        sys.exit(2)
+    stats = PayloadArchive(args[1]).gc(referenced_digests(args[2]))
+    print(json.dumps(stats))
+
+
+if __name__ == "__main__":
+    main()
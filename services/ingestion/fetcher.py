@@ -0,0 +1,338 @@
+"""Shared HTTP fetch layer for SEC, market and FX endpoints.
+
+- keep-alive connection pool per (scheme, host, port), shared by all threads
+- token-bucket rate limit per source (SEC: 10 req/s fair-access limit)
+- on-disk response cache with per-source TTLs
+- conditional GET (ETag / Last-Modified) once a cached response goes stale
+- exponential backoff on 429/5xx and connection errors (honors Retry-After)
+
+Std-lib only (http.client); every request carries `SECConfig.user_agent`.
+"""
+
+from __future__ import annotations
+import gzip
+import hashlib
+import http.client
+import json
+import os
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit
+
+from services.config.env import get_http_config, get_sec_config
+from services.ingestion.singleflight import SingleFlight
+
+
+class FetchError(RuntimeError):
+    def __init__(self, url: str, status: Optional[int], message: str = ""):
+        super().__init__(f"GET {url} failed ({status}): {message}".rstrip(": "))
+        self.url = url
+        self.status = status
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, up to `burst` banked."""
+
+    def __init__(self, rate: float, burst: float = 1.0, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._clock = clock
+        self._sleep = sleep
+        self._last = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token, blocking until available; returns the time waited."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1.0 - 1e-9:  # float drift from clock deltas
+                    self._tokens -= 1.0
+                    return waited
+                wait = (1.0 - self._tokens) / self.rate
+            self._sleep(wait)
+            waited += wait
+
+
+@dataclass(frozen=True)
+class SourcePolicy:
+    name: str
+    rate: float  # requests per second
+    burst: float
+    ttl_sec: float  # cache freshness
+
+
+def default_policies() -> Dict[str, SourcePolicy]:
+    sec_rate = get_http_config().sec_rate_per_sec
+    return {
+        "sec": SourcePolicy("sec", rate=sec_rate, burst=sec_rate, ttl_sec=24 * 3600),
+        "market": SourcePolicy("market", rate=5.0, burst=5.0, ttl_sec=12 * 3600),
+        "fx": SourcePolicy("fx", rate=5.0, burst=5.0, ttl_sec=3600),
+        "default": SourcePolicy("default", rate=5.0, burst=5.0, ttl_sec=3600),
+    }
+
+
+_HOST_SOURCES = {
+    "data.sec.gov": "sec",
+    "www.sec.gov": "sec",
+    "efts.sec.gov": "sec",
+    "stooq.com": "market",
+    "www.alphavantage.co": "market",
+    "api.exchangerate.host": "fx",
+}
+
+
+def source_for_url(url: str) -> str:
+    return _HOST_SOURCES.get(urlsplit(url).hostname or "", "default")
+
+
+@dataclass
+class FetchResult:
+    url: str
+    status: int
+    body: bytes
+    headers: Dict[str, str] = field(default_factory=dict)
+    from_cache: bool = False  # body served without a full download (fresh hit or 304)
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class DiskCache:
+    """Response bodies plus a JSON sidecar (validators, fetch time) per URL."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _paths(self, url: str) -> Tuple[Path, Path]:
+        h = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        d = self.root / h[:2]
+        return d / f"{h}.body", d / f"{h}.json"
+
+    def get(self, url: str) -> Optional[Tuple[Dict[str, object], bytes]]:
+        body_p, meta_p = self._paths(url)
+        try:
+            meta = json.loads(meta_p.read_text())
+            return meta, body_p.read_bytes()
+        except (OSError, ValueError):
+            return None
+
+    def put(self, url: str, headers: Dict[str, str], body: Optional[bytes]) -> None:
+        """Store a response; with `body=None` only the fetch time/validators are refreshed."""
+        body_p, meta_p = self._paths(url)
+        body_p.parent.mkdir(parents=True, exist_ok=True)
+        if body is not None:
+            _atomic_write(body_p, body)
+        meta = {"url": url, "fetched_at": time.time(), "headers": headers}
+        _atomic_write(meta_p, json.dumps(meta).encode("utf-8"))
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port)."""
+
+    def __init__(self, timeout: float, max_idle: int = 8):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, scheme: str, host: str, port: int) -> http.client.HTTPConnection:
+        key = (scheme, host, port)
+        with self._lock:
+            conns = self._idle.get(key)
+            if conns:
+                return conns.pop()
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=self.timeout)
+
+    def release(self, scheme: str, host: str, port: int, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            conns = self._idle.setdefault((scheme, host, port), [])
+            if len(conns) < self.max_idle:
+                conns.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            for conns in self._idle.values():
+                for c in conns:
+                    c.close()
+            self._idle.clear()
+
+
+_RETRY_STATUS = {429, 500, 502, 503, 504}
+_REDIRECT_STATUS = {301, 302, 303, 307, 308}
+_VALIDATORS = ("etag", "last-modified", "content-type")
+
+
+class Fetcher:
+    """GET with pooling, per-source rate limits, disk cache and conditional requests."""
+
+    def __init__(
+        self,
+        cache_dir: str | Path | None = None,
+        policies: Optional[Dict[str, SourcePolicy]] = None,
+        user_agent: Optional[str] = None,
+        timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+        backoff_base: Optional[float] = None,
+    ):
+        cfg = get_http_config()
+        self.cache = DiskCache(cache_dir if cache_dir is not None else cfg.cache_dir)
+        self.policies = policies if policies is not None else default_policies()
+        self.user_agent = user_agent or get_sec_config().user_agent
+        self.max_retries = cfg.max_retries if max_retries is None else max_retries
+        self.backoff_base = cfg.backoff_base_sec if backoff_base is None else backoff_base
+        self.pool = ConnectionPool(cfg.timeout_sec if timeout is None else timeout)
+        self._buckets = {name: TokenBucket(p.rate, p.burst) for name, p in self.policies.items()}
+        self.stats = {"requests": 0, "fresh_hits": 0, "revalidated": 0, "downloads": 0, "retries": 0}
+        self._stats_lock = threading.Lock()
+        self._flights = SingleFlight()
+
+    def _count(self, key: str) -> None:
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _policy(self, source: str) -> SourcePolicy:
+        return self.policies.get(source) or self.policies["default"]
+
+    def get(self, url: str, source: Optional[str] = None, max_age: Optional[float] = None) -> FetchResult:
+        """Fetch `url`, serving from cache while fresh and revalidating when stale.
+
+        `source` picks the rate limit and TTL ("sec", "market", "fx"); by
+        default it is inferred from the host. `max_age` overrides the TTL.
+        Concurrent calls for the same URL share one request.
+        """
+        source = source or source_for_url(url)
+        return self._flights.do(("GET", url, source, max_age), lambda: self._get(url, source, max_age))
+
+    def _get(self, url: str, source: str, max_age: Optional[float]) -> FetchResult:
+        policy = self._policy(source)
+        ttl = policy.ttl_sec if max_age is None else max_age
+        cached = self.cache.get(url)
+        if cached is not None:
+            meta, body = cached
+            if time.time() - float(meta.get("fetched_at", 0)) < ttl:
+                self._count("fresh_hits")
+                return FetchResult(url, 200, body, dict(meta.get("headers", {})), from_cache=True)
+
+        headers = {"User-Agent": self.user_agent, "Accept-Encoding": "gzip"}
+        if cached is not None:
+            vh = cached[0].get("headers", {})
+            if vh.get("etag"):
+                headers["If-None-Match"] = vh["etag"]
+            if vh.get("last-modified"):
+                headers["If-Modified-Since"] = vh["last-modified"]
+
+        status, resp_headers, body, final_url = self._request(url, headers, source)
+        if status == 304 and cached is not None:
+            self._count("revalidated")
+            merged = {**cached[0].get("headers", {}), **{k: v for k, v in resp_headers.items() if k in _VALIDATORS}}
+            self.cache.put(url, merged, None)
+            return FetchResult(url, 200, cached[1], merged, from_cache=True)
+        if not 200 <= status < 300:
+            raise FetchError(final_url, status, body[:200].decode("utf-8", "replace"))
+        self._count("downloads")
+        keep = {k: v for k, v in resp_headers.items() if k in _VALIDATORS}
+        self.cache.put(url, keep, body)
+        return FetchResult(url, status, body, keep, from_cache=False)
+
+    def _request(self, url: str, headers: Dict[str, str], source: str) -> Tuple[int, Dict[str, str], bytes, str]:
+        bucket = self._buckets.get(source) or self._buckets["default"]
+        attempt = 0
+        redirects = 0
+        while True:
+            bucket.acquire()
+            self._count("requests")
+            try:
+                status, resp_headers, body = self._send(url, headers)
+            except (OSError, http.client.HTTPException) as e:
+                if attempt >= self.max_retries:
+                    raise FetchError(url, None, str(e)) from e
+                self._backoff(attempt, None)
+                attempt += 1
+                continue
+            if status in _REDIRECT_STATUS and "location" in resp_headers and redirects < 5:
+                url = urljoin(url, resp_headers["location"])
+                redirects += 1
+                continue
+            if status in _RETRY_STATUS and attempt < self.max_retries:
+                self._backoff(attempt, resp_headers.get("retry-after"))
+                attempt += 1
+                continue
+            return status, resp_headers, body, url
+
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> None:
+        self._count("retries")
+        delay = self.backoff_base * (2 ** attempt)
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        time.sleep(delay)
+
+    def _send(self, url: str, headers: Dict[str, str]) -> Tuple[int, Dict[str, str], bytes]:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "https"
+        port = parts.port or (443 if scheme == "https" else 80)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        conn = self.pool.acquire(scheme, parts.hostname or "", port)
+        try:
+            try:
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                # idle keep-alive connection closed by the server; retry once fresh
+                conn.close()
+                conn.request("GET", path, headers=headers)
+                resp = conn.getresponse()
+            body = resp.read()
+            resp_headers = {k.lower(): v for k, v in resp.getheaders()}
+        except BaseException:
+            conn.close()
+            raise
+        if resp.will_close:
+            conn.close()
+        else:
+            self.pool.release(scheme, parts.hostname or "", port, conn)
+        if resp_headers.get("content-encoding") == "gzip":
+            body = gzip.decompress(body)
+        return resp.status, resp_headers, body
+
+
+_DEFAULT: Optional[Fetcher] = None
+_DEFAULT_LOCK = threading.Lock()
+
+
+def get_fetcher() -> Fetcher:
+    """Process-wide fetcher, so every worker thread shares pools and rate limits."""
+    global _DEFAULT
+    if _DEFAULT is None:
+        with _DEFAULT_LOCK:
+            if _DEFAULT is None:
+                _DEFAULT = Fetcher()
+    return _DEFAULT
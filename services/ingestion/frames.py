@@ -0,0 +1,113 @@
+"""Cross-sectional XBRL frames (one tag/unit/period, all filers) in a columnar peer store.
+
+A frame is kept as two aligned arrays sorted by CIK: `ciks` (int64) and
+`values` (float64). On disk each frame is a single file
+`<root>/<taxonomy>/<tag>/<unit>/<period>.frame` holding a small header and
+the raw array bytes, so loading a whole cross-section is one read.
+"""
+
+from __future__ import annotations
+import os
+import struct
+import tempfile
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+_MAGIC = b"FRAFRM\x00\x01"
+_HEADER = struct.Struct("<8sI")
+
+
+@dataclass
+class FrameColumn:
+    taxonomy: str
+    tag: str
+    unit: str
+    period: str  # frames period, e.g. CY2023, CY2023Q1, CY2023Q4I
+    ciks: array  # 'q', ascending
+    values: array  # 'd', aligned with ciks
+
+    def __len__(self) -> int:
+        return len(self.ciks)
+
+    def get(self, cik: int) -> Optional[float]:
+        i = bisect_left(self.ciks, int(cik))
+        if i < len(self.ciks) and self.ciks[i] == int(cik):
+            return self.values[i]
+        return None
+
+
+def parse_frame(payload: Dict[str, Any]) -> FrameColumn:
+    """Parse a frames API payload into a `FrameColumn` (last value wins per CIK)."""
+    by_cik: Dict[int, float] = {}
+    for item in payload.get("data", []):
+        try:
+            by_cik[int(item["cik"])] = float(item["val"])
+        except Exception:
+            continue
+    ciks = sorted(by_cik)
+    return FrameColumn(
+        taxonomy=str(payload.get("taxonomy", "")),
+        tag=str(payload.get("tag", "")),
+        unit=str(payload.get("uom", "")),
+        period=str(payload.get("ccp", "")),
+        ciks=array("q", ciks),
+        values=array("d", (by_cik[c] for c in ciks)),
+    )
+
+
+class PeerStore:
+    """Directory of frame files, keyed by (taxonomy, tag, unit, period)."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, taxonomy: str, tag: str, unit: str, period: str) -> Path:
+        return self.root / taxonomy / tag / unit.replace("/", "_per_") / f"{period}.frame"
+
+    def put(self, frame: FrameColumn) -> Path:
+        path = self._path(frame.taxonomy, frame.tag, frame.unit, frame.period)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(_HEADER.pack(_MAGIC, len(frame.ciks)))
+                f.write(frame.ciks.tobytes())
+                f.write(frame.values.tobytes())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return path
+
+    def get(self, taxonomy: str, tag: str, unit: str, period: str) -> Optional[FrameColumn]:
+        path = self._path(taxonomy, tag, unit, period)
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            return None
+        magic, n = _HEADER.unpack_from(raw, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a frame file")
+        ciks, values = array("q"), array("d")
+        off = _HEADER.size
+        ciks.frombytes(raw[off:off + 8 * n])
+        values.frombytes(raw[off + 8 * n:off + 16 * n])
+        return FrameColumn(taxonomy, tag, unit, period, ciks, values)
+
+    def periods(self, taxonomy: str, tag: str, unit: str) -> List[str]:
+        d = self._path(taxonomy, tag, unit, "x").parent
+        if not d.exists():
+            return []
+        return sorted(p.stem for p in d.glob("*.frame"))
+
+    def ingest(self, taxonomy: str, tag: str, unit: str, period: str, fetcher=None) -> FrameColumn:
+        """Fetch one frames endpoint and store it."""
+        from services.ingestion.sources import frame  # sources builds on this module
+
+        col = frame(taxonomy, tag, unit, period, fetcher=fetcher)
+        self.put(col)
+        return col
@@ -17,6 +17,14 @@ def build_fx_latest_url(base: str = "USD", symbols: Optional[str] = None) -> str
     return url
 
 
+def build_fx_timeseries_url(start: str, end: str, base: str = "USD", symbols: Optional[str] = None) -> str:
+    cfg = get_fx_config()
+    url = f"{cfg.base_url}/timeseries?start_date={start}&end_date={end}&base={base}"
+    if symbols:
+        url += f"&symbols={symbols}"
+    return url
+
+
 @dataclass(frozen=True)
 class FXQuote:
     base: str
@@ -0,0 +1,234 @@
+"""Dated FX rates with pivot triangulation and whole-column conversion.
+
+Rates are held per (base, quote) pair as a `PriceSeries` (ordinal days +
+float64 rates) and looked up as-of: the last rate on or before the
+requested date, within `max_gap_days`. A missing pair is served from its
+inverse, or triangulated through the pivot currency (USD by default).
+
+`FXRates.rates()` resolves the conversion path once and then walks each
+leg's day array alongside the sorted query dates, so converting a column
+of N periods costs one merge pass instead of N lookups.
+
+Balances convert at the closing (period-end) rate; flows such as revenue
+or cash from operations accrue over the period and convert at the average
+rate over it (`average_rates`, `convert_rows(..., flows=...)`).
+"""
+
+from __future__ import annotations
+import math
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from services.ingestion.prices import PriceSeries, PriceStore, from_day, to_day
+
+_Leg = Tuple[PriceSeries, bool]  # (series, invert)
+
+
+def _pair_symbol(base: str, quote: str) -> str:
+    return f"{base}_{quote}"
+
+
+class FXRates:
+    def __init__(self, pivot: str = "USD", store: Optional[PriceStore] = None, max_gap_days: int = 7):
+        self.pivot = pivot.upper()
+        self.store = store
+        self.max_gap_days = max_gap_days
+        self._pairs: Dict[Tuple[str, str], PriceSeries] = {}
+
+    # -- loading -------------------------------------------------------
+    def _series(self, base: str, quote: str) -> Optional[PriceSeries]:
+        key = (base, quote)
+        s = self._pairs.get(key)
+        if s is None and self.store is not None:
+            loaded = self.store.load(_pair_symbol(base, quote))
+            if len(loaded):
+                self._pairs[key] = s = loaded
+        return s
+
+    def add(self, base: str, quote: str, date: str, rate: float) -> None:
+        """Record base->quote on `date` (replaces an existing rate for that day)."""
+        base, quote, rate = base.upper(), quote.upper(), float(rate)
+        if base == quote or not math.isfinite(rate) or rate <= 0:
+            return
+        s = self._series(base, quote)
+        if s is None:
+            s = self._pairs[(base, quote)] = PriceSeries(_pair_symbol(base, quote))
+        day = to_day(date)
+        if not s.days or day > s.days[-1]:
+            s.days.append(day)
+            s.close.append(rate)
+            return
+        i = bisect_left(s.days, day)
+        if s.days[i] == day:
+            s.close[i] = rate
+        else:
+            s.days.insert(i, day)
+            s.close.insert(i, rate)
+
+    def add_payload(self, payload: Dict[str, Any]) -> int:
+        """Load an exchangerate.host `latest` or `timeseries` payload; returns rates added."""
+        base = str(payload.get("base") or "")
+        rates = payload.get("rates") or {}
+        if not base or not isinstance(rates, dict):
+            return 0
+        if "date" in payload and all(not isinstance(v, dict) for v in rates.values()):
+            rates = {payload["date"]: rates}
+        n = 0
+        for date, row in rates.items():
+            if not isinstance(row, dict):
+                continue
+            for quote, val in row.items():
+                try:
+                    self.add(base, quote, date, float(val))
+                    n += 1
+                except (TypeError, ValueError):
+                    continue
+        return n
+
+    def save(self) -> int:
+        """Append days newer than each stored pair to the store (append-only); returns rows written."""
+        if self.store is None:
+            return 0
+        return sum(self.store.append(s) for s in self._pairs.values())
+
+    # -- lookup --------------------------------------------------------
+    def _leg(self, base: str, quote: str) -> Optional[_Leg]:
+        s = self._series(base, quote)
+        if s is not None:
+            return s, False
+        s = self._series(quote, base)
+        return (s, True) if s is not None else None
+
+    def path(self, base: str, quote: str) -> Optional[List[_Leg]]:
+        """Legs converting base -> quote: direct/inverse, else via the pivot."""
+        base, quote = base.upper(), quote.upper()
+        if base == quote:
+            return []
+        leg = self._leg(base, quote)
+        if leg is not None:
+            return [leg]
+        if self.pivot in (base, quote):
+            return None
+        a, b = self._leg(base, self.pivot), self._leg(self.pivot, quote)
+        return [a, b] if a is not None and b is not None else None
+
+    def rates(self, base: str, quote: str, dates: Sequence[str]) -> array:
+        """As-of base->quote rate for each date (NaN where unavailable)."""
+        days = [to_day(d) for d in dates]
+        out = array("d", [1.0]) * len(days)
+        legs = self.path(base, quote)
+        if legs is None:
+            return array("d", [math.nan]) * len(days)
+        order = sorted(range(len(days)), key=days.__getitem__)
+        for s, invert in legs:
+            p = 0
+            for k in order:
+                d = days[k]
+                while p < len(s.days) and s.days[p] <= d:
+                    p += 1
+                if p and d - s.days[p - 1] <= self.max_gap_days:
+                    r = s.close[p - 1]
+                    out[k] *= 1.0 / r if invert else r
+                else:
+                    out[k] = math.nan
+        return out
+
+    def average_rates(self, base: str, quote: str, starts: Sequence[str], ends: Sequence[str]) -> array:
+        """Mean base->quote rate over each [start, end] window (NaN where unavailable).
+
+        Averages the as-of rate on every day a leg was quoted inside the
+        window. A window is NaN when the quotes do not reach back to its
+        start (within `max_gap_days`) or some day has no rate.
+        """
+        legs = self.path(base, quote)
+        out = array("d", [math.nan]) * len(ends)
+        if legs is None:
+            return out
+        if not legs:
+            return array("d", [1.0]) * len(ends)
+        for k, (start, end) in enumerate(zip(starts, ends)):
+            lo, hi = to_day(start), to_day(end)
+            days = sorted({d for s, _ in legs for d in s.days[bisect_left(s.days, lo):bisect_right(s.days, hi)]})
+            if not days or days[0] - lo > self.max_gap_days:
+                continue
+            total = 0.0
+            for d in days:
+                r = 1.0
+                for s, invert in legs:
+                    p = bisect_right(s.days, d)
+                    if not p or d - s.days[p - 1] > self.max_gap_days:
+                        r = math.nan
+                        break
+                    r *= 1.0 / s.close[p - 1] if invert else s.close[p - 1]
+                total += r
+            out[k] = total / len(days)
+        return out
+
+    def rate(self, base: str, quote: str, date: str) -> Optional[float]:
+        r = self.rates(base, quote, [date])[0]
+        return None if math.isnan(r) else r
+
+    def convert(self, values: Iterable[float], dates: Sequence[str], from_ccy: str, to_ccy: str) -> array:
+        """Multiply a value column by the period-matched from->to rates."""
+        rs = self.rates(from_ccy, to_ccy, dates)
+        return array("d", (float(v) * r for v, r in zip(values, rs)))
+
+
+def convert_rows(
+    rows: List[Dict[str, Any]],
+    fields: Iterable[str],
+    from_ccy: str,
+    to_ccy: str,
+    fx: FXRates,
+    date_key: str = "period_end",
+    drop_missing: bool = False,
+    flows: Iterable[str] = (),
+) -> List[Dict[str, Any]]:
+    """Copy of `rows` with `fields` converted to `to_ccy`.
+
+    Fields are balances converted at each row's period-end rate, except
+    those also listed in `flows`, which convert at the average rate over
+    the row's period (from `period_start`, else the length of its
+    `period_type`).
+
+    Raises ValueError if any row has no usable rate, unless `drop_missing`,
+    in which case those rows are left out (e.g. filings older than the FX
+    history). Missing fields stay missing.
+    """
+    fields = list(fields)
+    flows = set(flows) & set(fields)
+    ends = [r[date_key] for r in rows]
+    rs = fx.rates(from_ccy, to_ccy, ends)
+    avg = array("d", [1.0]) * len(rows)
+    if flows:
+        avg = fx.average_rates(from_ccy, to_ccy, [_period_start(r, date_key) for r in rows], ends)
+    bad = [ends[k] for k in range(len(rows)) if math.isnan(rs[k]) or math.isnan(avg[k])]
+    if bad and not drop_missing:
+        raise ValueError(f"no {from_ccy}->{to_ccy} rate for {', '.join(bad)}")
+    out = []
+    for row, r, a in zip(rows, rs, avg):
+        if math.isnan(r) or math.isnan(a):
+            continue
+        new = dict(row)
+        for f in fields:
+            v = new.get(f)
+            if v is not None:
+                new[f] = v * (a if f in flows else r)
+        if "currency" in new:
+            new["currency"] = to_ccy
+        out.append(new)
+    return out
+
+
+_PERIOD_DAYS = {"Q": 91, "A": 365}
+
+
+def _period_start(row: Dict[str, Any], date_key: str) -> str:
+    # first day of the period ending at row[date_key]
+    if row.get("period_start"):
+        return str(row["period_start"])
+    days = _PERIOD_DAYS.get(str(row.get("period_type") or "").upper())
+    if days is None:
+        raise ValueError(f"row ending {row[date_key]} has no period_start or period_type")
+    return from_day(to_day(row[date_key]) - days + 1)
@@ -0,0 +1,157 @@
+"""Incremental, selective JSON scanning over a byte stream.
+
+Walks objects key by key from a file-like `.read()` source without decoding
+the whole document: unwanted values are skipped at the byte level (strings
+and nested containers are matched, never materialized) and wanted values
+are captured as raw bytes for `json.loads`. Only the bytes of the value
+currently being scanned are buffered.
+"""
+
+from __future__ import annotations
+import json
+import re
+from typing import Any, BinaryIO, Iterator, Optional
+
+# One skip step: plain bytes, whole strings and whole flat objects (no nested
+# containers, e.g. the fact records in a companyfacts series), up to and
+# including the next bracket that changes depth. Possessive quantifiers
+# (Python 3.11+) keep failed matches linear.
+_STR = rb'"(?:[^"\\]++|\\.)*+"'
+_FLAT_OBJ = rb'\{(?:[^"\[\]{}]++|' + _STR + rb')*+\}'
+_CONTAINER_STEP = re.compile(rb'(?:[^"\[\]{}]++|' + _STR + rb'|' + _FLAT_OBJ + rb')*+[\[\]{}]', re.S)
+_SCALAR_END = re.compile(rb"[,\]}\s]")
+_WS = b" \t\r\n"
+
+
+class JSONScanner:
+    def __init__(self, fp: BinaryIO, chunk_size: int = 1 << 16):
+        self._fp = fp
+        self._chunk = chunk_size
+        self._buf = b""
+        self._pos = 0
+        self._mark: Optional[int] = None
+        self._eof = False
+
+    def _fill(self) -> bool:
+        if self._eof:
+            return False
+        data = self._fp.read(self._chunk)
+        if not data:
+            self._eof = True
+            return False
+        keep = self._pos if self._mark is None else min(self._mark, self._pos)
+        self._buf = self._buf[keep:] + data
+        self._pos -= keep
+        if self._mark is not None:
+            self._mark -= keep
+        return True
+
+    def _need_more(self) -> None:
+        if not self._fill():
+            raise ValueError("unexpected end of JSON stream")
+
+    def peek(self) -> Optional[int]:
+        """Next non-whitespace byte (not consumed), or None at end of stream."""
+        while True:
+            buf = self._buf
+            while self._pos < len(buf) and buf[self._pos] in _WS:
+                self._pos += 1
+            if self._pos < len(buf):
+                return buf[self._pos]
+            if not self._fill():
+                return None
+
+    def _expect(self, ch: bytes) -> None:
+        if self.peek() != ch[0]:
+            raise ValueError(f"expected {ch!r} at stream offset {self._pos}")
+        self._pos += 1
+
+    def _skip_string(self) -> None:
+        # the opening quote is at _pos, which stays put until the closing
+        # quote is found, so refills never split an escape sequence
+        i = self._pos + 1
+        while True:
+            j = self._buf.find(b'"', i)
+            if j < 0:
+                off = len(self._buf) - self._pos
+                self._need_more()
+                i = self._pos + off
+                continue
+            k = j - 1
+            while self._buf[k] == 0x5C:  # backslash
+                k -= 1
+            if (j - 1 - k) % 2:
+                i = j + 1
+                continue
+            self._pos = j + 1
+            return
+
+    def _skip_container(self) -> None:
+        # the opening bracket is consumed first so a flat object can't be
+        # matched whole at depth 0; after that, no match means the step is
+        # cut by the buffer end (a string or flat object is still open, or
+        # no bracket yet), so refill and retry
+        self._pos += 1
+        depth = 1
+        while True:
+            m = _CONTAINER_STEP.match(self._buf, self._pos)
+            if m is None:
+                self._need_more()
+                continue
+            self._pos = m.end()
+            depth += 1 if self._buf[self._pos - 1] in b"[{" else -1
+            if depth == 0:
+                return
+
+    def _skip_scalar(self) -> None:
+        while True:
+            m = _SCALAR_END.search(self._buf, self._pos)
+            if m is not None:
+                self._pos = m.start()
+                return
+            self._pos = len(self._buf)
+            if not self._fill():
+                return
+
+    def skip_value(self) -> None:
+        c = self.peek()
+        if c is None:
+            raise ValueError("unexpected end of JSON stream")
+        if c == 0x22:
+            self._skip_string()
+        elif c in b"[{":
+            self._skip_container()
+        else:
+            self._skip_scalar()
+
+    def capture_value(self) -> bytes:
+        """Consume the next value and return its raw bytes."""
+        self.peek()
+        self._mark = self._pos
+        try:
+            self.skip_value()
+            return self._buf[self._mark:self._pos]
+        finally:
+            self._mark = None
+
+    def read_value(self) -> Any:
+        return json.loads(self.capture_value())
+
+    def members(self) -> Iterator[str]:
+        """Iterate the keys of the object at the cursor.
+
+        After each yielded key the caller must consume its value (with
+        `skip_value`, `capture_value`, `read_value` or a nested `members`).
+        """
+        self._expect(b"{")
+        while True:
+            c = self.peek()
+            if c == 0x7D:  # '}'
+                self._pos += 1
+                return
+            if c == 0x2C:  # ','
+                self._pos += 1
+                continue
+            key = self.read_value()
+            self._expect(b":")
+            yield key
@@ -13,12 +13,16 @@ Tests are offline using tiny JSON/CSV fixtures.
 STOOQ_BASE = "https://stooq.com/q/d/l/"  # CSV endpoint
 
 
-def build_stooq_daily_csv(symbol: str, exchange_hint: Optional[str] = None) -> str:
+def build_stooq_daily_csv(symbol: str, exchange_hint: Optional[str] = None, start: Optional[str] = None) -> str:
     # Stooq uses suffixes like AAPL.US, MSFT.US; NSE may vary. We accept a hint but don't validate.
     sym = symbol
     if exchange_hint and exchange_hint.upper() in {"US", "NASDAQ", "NYSE"} and "." not in sym:
         sym = f"{symbol}.US"
-    return f"{STOOQ_BASE}?s={sym}&i=d"
+    url = f"{STOOQ_BASE}?s={sym}&i=d"
+    if start:
+        # d1 limits the download to rows from this date on (YYYYMMDD)
+        url += f"&d1={start[:10].replace('-', '')}"
+    return url
 
 
 @dataclass(frozen=True)
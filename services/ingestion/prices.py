@@ -0,0 +1,206 @@
+"""Array-backed daily price series, Stooq CSV parsing and an append-only store.
+
+`PriceSeries` keeps two aligned arrays: `days` (proleptic Gregorian
+ordinals, int32, strictly ascending) and `close` (float64). Range and
+as-of lookups are binary searches on `days`.
+
+`PriceStore` keeps one file per symbol of fixed-size (day, close) records.
+Refreshing a symbol only requests and appends days after the last stored
+one.
+"""
+
+from __future__ import annotations
+import os
+import re
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from services.ingestion.market_client import PricePoint
+
+_RECORD = struct.Struct("<id")
+
+
+def to_day(d: str | date) -> int:
+    """ISO date (or `date`) -> ordinal day number."""
+    return (d if isinstance(d, date) else date.fromisoformat(str(d)[:10])).toordinal()
+
+
+def from_day(n: int) -> str:
+    return date.fromordinal(n).isoformat()
+
+
+class PriceSeries:
+    def __init__(self, symbol: str, days: Optional[array] = None, close: Optional[array] = None):
+        self.symbol = symbol
+        self.days = days if days is not None else array("i")
+        self.close = close if close is not None else array("d")
+        if len(self.days) != len(self.close):
+            raise ValueError("days and close must have the same length")
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def __iter__(self) -> Iterator[Tuple[str, float]]:
+        for d, c in zip(self.days, self.close):
+            yield from_day(d), c
+
+    @property
+    def first_date(self) -> Optional[str]:
+        return from_day(self.days[0]) if self.days else None
+
+    @property
+    def last_date(self) -> Optional[str]:
+        return from_day(self.days[-1]) if self.days else None
+
+    def append(self, d: str | date | int, close: float) -> None:
+        day = d if isinstance(d, int) else to_day(d)
+        if self.days and day <= self.days[-1]:
+            raise ValueError(f"{from_day(day)} is not after {self.last_date}")
+        self.days.append(day)
+        self.close.append(float(close))
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None) -> "PriceSeries":
+        """Sub-series with start <= date <= end (either bound optional)."""
+        lo = bisect_left(self.days, to_day(start)) if start else 0
+        hi = bisect_right(self.days, to_day(end)) if end else len(self.days)
+        return PriceSeries(self.symbol, self.days[lo:hi], self.close[lo:hi])
+
+    def asof(self, d: str) -> Optional[float]:
+        """Close on `d` or the last trading day before it."""
+        i = bisect_right(self.days, to_day(d))
+        return self.close[i - 1] if i else None
+
+    @classmethod
+    def from_points(cls, symbol: str, points: Dict[str, PricePoint]) -> "PriceSeries":
+        """Build from `parse_alpha_vantage_daily` output."""
+        s = cls(symbol)
+        for d in sorted(points):
+            s.append(d, points[d].close)
+        return s
+
+
+_DATE = re.compile(r"\d{4}-\d{2}-\d{2}$")
+
+
+def parse_stooq_csv(lines: Iterable[str], symbol: str, after: Optional[str] = None) -> PriceSeries:
+    """Stream Stooq daily CSV (Date,Open,High,Low,Close,Volume) into a PriceSeries.
+
+    Rows on or before `after`, malformed rows and "No data" bodies are
+    skipped. Input is expected ascending; out-of-order rows are sorted at
+    the end (last row wins per date).
+    """
+    floor = to_day(after) if after else None
+    series = PriceSeries(symbol)
+    days, close = series.days, series.close
+    ci = 4
+    unsorted = False
+    for line in lines:
+        parts = line.strip().split(",")
+        if len(parts) <= ci or not _DATE.match(parts[0]):
+            if parts and parts[0].strip().lower() == "date":
+                cols = [p.strip().lower() for p in parts]
+                ci = cols.index("close") if "close" in cols else ci
+            continue
+        try:
+            day, px = to_day(parts[0]), float(parts[ci])
+        except ValueError:
+            continue
+        if floor is not None and day <= floor:
+            continue
+        if days and day <= days[-1]:
+            unsorted = True
+        days.append(day)
+        close.append(px)
+    if unsorted:
+        merged = dict(zip(days, close))
+        order = sorted(merged)
+        series.days, series.close = array("i", order), array("d", (merged[d] for d in order))
+    return series
+
+
+class PriceStore:
+    """Directory of `<SYMBOL>.px` files of little-endian (int32 day, float64 close) records."""
+
+    def __init__(self, root: str | Path):
+        self.root = Path(root)
+
+    def _path(self, symbol: str) -> Path:
+        return self.root / f"{symbol.upper().replace('/', '_')}.px"
+
+    def symbols(self) -> List[str]:
+        return sorted(p.stem for p in self.root.glob("*.px")) if self.root.exists() else []
+
+    def rows(self, symbol: str) -> int:
+        """Number of stored records (from the file size; 0 when missing)."""
+        try:
+            return self._path(symbol).stat().st_size // _RECORD.size
+        except OSError:
+            return 0
+
+    def last_date(self, symbol: str, as_of: Optional[str] = None) -> Optional[str]:
+        """Last stored day (on or before `as_of` if given), read from the file tail.
+
+        With `as_of`, records are binary-searched in place; the series is
+        never loaded.
+        """
+        path = self._path(symbol)
+        try:
+            with path.open("rb") as f:
+                size = f.seek(0, os.SEEK_END)
+                n = size // _RECORD.size
+
+                def day_at(i: int) -> int:
+                    f.seek(i * _RECORD.size)
+                    return _RECORD.unpack(f.read(_RECORD.size))[0]
+
+                # first record after the cutoff
+                lo, hi = 0, n
+                if as_of is None:
+                    lo = n
+                else:
+                    cutoff = to_day(as_of)
+                    while lo < hi:
+                        mid = (lo + hi) // 2
+                        if day_at(mid) <= cutoff:
+                            lo = mid + 1
+                        else:
+                            hi = mid
+                if not lo:
+                    return None
+                day = day_at(lo - 1)
+        except OSError:
+            return None
+        return from_day(day)
+
+    def load(self, symbol: str) -> PriceSeries:
+        try:
+            raw = self._path(symbol).read_bytes()
+        except OSError:
+            return PriceSeries(symbol)
+        raw = raw[: len(raw) - len(raw) % _RECORD.size]  # ignore a torn trailing record
+        series = PriceSeries(symbol)
+        for day, px in _RECORD.iter_unpack(raw):
+            series.days.append(day)
+            series.close.append(px)
+        return series
+
+    def append(self, series: PriceSeries) -> int:
+        """Append the part of `series` newer than what is stored; returns rows written."""
+        last = self.last_date(series.symbol)
+        start = bisect_right(series.days, to_day(last)) if last else 0
+        if start >= len(series):
+            return 0
+        path = self._path(series.symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_size % _RECORD.size:
+            os.truncate(path, path.stat().st_size // _RECORD.size * _RECORD.size)
+        buf = bytearray()
+        for i in range(start, len(series)):
+            buf += _RECORD.pack(series.days[i], series.close[i])
+        with path.open("ab") as f:
+            f.write(buf)
+        return len(series) - start
@@ -1,9 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+from array import array
+from dataclasses import dataclass, field
+from datetime import date
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterable, List, Mapping, Optional, Set, Tuple
+import math
 import re
 
+from services.ingestion.jsonstream import JSONScanner
+
 SEC_BASE = "https://data.sec.gov/api"
+SEC_SUBMISSIONS_BASE = "https://data.sec.gov/submissions"
 
 
 def normalize_cik(cik: str | int) -> str:
@@ -23,6 +30,10 @@ def build_frames_url(taxonomy: str, tag: str, unit: str, period: str) -> str:
     return f"{SEC_BASE}{path}"
 
 
+def build_submissions_url(cik: str | int) -> str:
+    return f"{SEC_SUBMISSIONS_BASE}/{normalize_cik(cik)}.json"
+
+
 @dataclass(frozen=True)
 class FactPoint:
     end: str  # period end date ISO
@@ -64,3 +75,249 @@ def extract_facts_companyfacts(payload: Dict[str, Any], taxonomy: str, tag: str,
     out.sort(key=lambda p: (p.end or ""), reverse=True)
     return out
 
+
+
+@dataclass
+class FactTable:
+    """Columnar facts for several tags on a shared, ascending period axis.
+
+    A period is (period end, period type). The type comes from the span of
+    the duration facts: about three months is 'Q', about a year is 'A', and
+    other spans (6- and 9-month year-to-date values) are dropped, so a
+    10-Q's YTD figure never lands on the quarter. Instant facts (balances)
+    fill every period ending on their date; a date with only instants takes
+    its type from the filing that first reported it. The same end can
+    appear twice, once per type.
+
+    `values[tag][i]` is the fact for `periods[i]` / `period_type[i]` (NaN
+    when the tag has none). When a filing restates a period, the most
+    recently filed value wins. `accn`/`form`/`fp`/`filed` describe the
+    latest filing seen for each period, and `accns` lists (sorted) every
+    filing that reported one of its facts. `instants` lists the tags
+    reported as balances (point-in-time facts) rather than flows over a
+    period.
+    """
+
+    periods: List[str]
+    values: Dict[str, array]
+    accn: List[Optional[str]]
+    form: List[Optional[str]]
+    fp: List[Optional[str]]
+    filed: List[str]
+    period_type: List[str] = field(default_factory=list)
+    instants: List[str] = field(default_factory=list)
+    accns: List[List[str]] = field(default_factory=list)
+
+    def __len__(self) -> int:
+        return len(self.periods)
+
+    def period_facts(self, i: int) -> Dict[str, float]:
+        """{tag: value} for period `i`, skipping gaps (input to `Mapper.map_period`)."""
+        out: Dict[str, float] = {}
+        for tag, col in self.values.items():
+            v = col[i]
+            if v == v:  # not NaN
+                out[tag] = v
+        return out
+
+    def rows(self) -> List[Dict[str, Any]]:
+        """Row dicts with period_end/period_type plus tag values (input to `stitch_periods`)."""
+        return [
+            {
+                "period_end": pe,
+                "period_type": self.period_type[i],
+                "accn": self.accn[i],
+                **self.period_facts(i),
+            }
+            for i, pe in enumerate(self.periods)
+        ]
+
+
+def span_type(start: Optional[str], end: Optional[str]) -> Optional[str]:
+    """'Q' for a ~3-month duration, 'A' for a ~1-year one (52/53-week years included), else None."""
+    try:
+        days = (date.fromisoformat(end) - date.fromisoformat(start)).days
+    except (TypeError, ValueError):
+        return None
+    if 80 <= days <= 100:
+        return "Q"
+    if 350 <= days <= 380:
+        return "A"
+    return None
+
+
+def touched_ends(
+    payload: Dict[str, Any], taxonomy: str, tags: Iterable[str], unit: str, known: Mapping[str, Set[str]]
+) -> Set[str]:
+    """Period ends with a fact from a filing not yet seen for that end.
+
+    `known` maps a period end to the accessions already recorded for it
+    (`FactTable.accns`). Facts `extract_many` drops (year-to-date spans)
+    are ignored, so they never mark an end as touched.
+    """
+    tx = payload.get("facts", {}).get(taxonomy, {})
+    out: Set[str] = set()
+    for tag in dict.fromkeys(tags):
+        for item in (tx.get(tag) or {}).get("units", {}).get(unit, []):
+            end = item.get("end") or item.get("filed", "")
+            if end in out or item.get("accn") in known.get(end, ()):
+                continue
+            if item.get("start") and span_type(item["start"], end) is None:
+                continue
+            out.add(end)
+    return out
+
+
+def extract_many(
+    payload: Dict[str, Any], taxonomy: str, tags: Iterable[str], unit: str, ends: Optional[Set[str]] = None
+) -> FactTable:
+    """Extract several tags from companyfacts JSON into one `FactTable`.
+
+    Each tag's records are walked once to collect the shared period axis, and
+    values are then written straight into per-tag float arrays, with no
+    per-fact objects and no per-tag sort. With `ends`, only periods ending on
+    those dates are extracted (each with all of its facts, whichever filing
+    they came from).
+    """
+    tx = payload.get("facts", {}).get(taxonomy, {})
+    tags = list(dict.fromkeys(tags))
+    # per tag: (item, end, type) with type None for instants
+    series: Dict[str, List[Tuple[Dict[str, Any], str, Optional[str]]]] = {}
+    keys = set()
+    first_report: Dict[str, Tuple[str, Optional[str]]] = {}  # instant end -> (filed, fp) of earliest filing
+    for tag in tags:
+        kept = series[tag] = []
+        for item in (tx.get(tag) or {}).get("units", {}).get(unit, []):
+            try:
+                if math.isnan(float(item["val"])):  # NaN is a gap in the table
+                    continue
+            except Exception:
+                continue  # ignore non-numeric
+            end = item.get("end") or item.get("filed", "")
+            if ends is not None and end not in ends:
+                continue
+            if item.get("start"):
+                ptype = span_type(item["start"], end)
+                if ptype is None:
+                    continue  # year-to-date or other non-period span
+                keys.add((end, ptype))
+            else:
+                ptype = None
+                f = item.get("filed") or ""
+                if end not in first_report or f < first_report[end][0]:
+                    first_report[end] = (f, item.get("fp"))
+            kept.append((item, end, ptype))
+    types_at: Dict[str, List[str]] = {}
+    for end, ptype in keys:
+        types_at.setdefault(end, []).append(ptype)
+    for end, (_, fp_) in first_report.items():
+        if end not in types_at:
+            ptype = "A" if fp_ == "FY" else "Q"
+            keys.add((end, ptype))
+            types_at[end] = [ptype]
+    axis = sorted(keys)
+    pos = {key: i for i, key in enumerate(axis)}
+    n = len(axis)
+
+    accn: List[Optional[str]] = [None] * n
+    form: List[Optional[str]] = [None] * n
+    fp: List[Optional[str]] = [None] * n
+    filed = [""] * n
+    seen: List[Set[str]] = [set() for _ in range(n)]
+    values: Dict[str, array] = {}
+    for tag in tags:
+        col = array("d", [math.nan]) * n
+        col_filed = [None] * n
+        for item, end, ptype in series[tag]:
+            val = float(item["val"])
+            f = item.get("filed") or ""
+            for i in ([pos[(end, ptype)]] if ptype else [pos[(end, t)] for t in types_at[end]]):
+                if item.get("accn"):
+                    seen[i].add(item["accn"])
+                if col_filed[i] is not None and f < col_filed[i]:
+                    continue
+                col[i] = val
+                col_filed[i] = f
+                if f >= filed[i]:
+                    filed[i] = f
+                    accn[i], form[i], fp[i] = item.get("accn"), item.get("form"), item.get("fp")
+        values[tag] = col
+    return FactTable(
+        periods=[end for end, _ in axis], values=values, accn=accn, form=form, fp=fp, filed=filed,
+        period_type=[ptype for _, ptype in axis],
+        instants=[t for t in tags if series[t] and all(ptype is None for _, _, ptype in series[t])],
+        accns=[sorted(a) for a in seen],
+    )
+
+
+def load_companyfacts_selective(
+    source: BinaryIO | str | Path,
+    taxonomy: str,
+    tags: Iterable[str],
+    units: Optional[Iterable[str]] = None,
+    chunk_size: int = 1 << 16,
+) -> Dict[str, Any]:
+    """Stream a companyfacts document and keep only the requested series.
+
+    `source` is a path or a binary stream (open file, HTTP response). Returns
+    the companyfacts shape trimmed to `facts[taxonomy][tag]` for the wanted
+    tags (and `units`, when given) plus top-level scalars such as `cik` and
+    `entityName`, so `extract_facts_companyfacts` works on it unchanged.
+    Everything else is skipped without being decoded; reading stops at the
+    end of `facts`, or earlier once every requested tag has been captured.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fh:
+            return load_companyfacts_selective(fh, taxonomy, tags, units, chunk_size)
+    wanted = set(tags)
+    keep_units = set(units) if units is not None else None
+    out: Dict[str, Any] = {}
+    selected: Dict[str, Any] = {}
+    sc = JSONScanner(source, chunk_size)
+    for key in sc.members():
+        if key != "facts":
+            if sc.peek() in b"[{":
+                sc.skip_value()
+            else:
+                out[key] = sc.read_value()
+            continue
+        for tx in sc.members():
+            if tx != taxonomy:
+                sc.skip_value()
+                continue
+            for tag in sc.members():
+                if tag not in wanted:
+                    sc.skip_value()
+                    continue
+                fact = sc.read_value()
+                if keep_units is not None and isinstance(fact.get("units"), dict):
+                    fact["units"] = {u: v for u, v in fact["units"].items() if u in keep_units}
+                selected[tag] = fact
+                if len(selected) == len(wanted):
+                    break
+            break
+        break
+    out["facts"] = {taxonomy: selected}
+    return out
+
+
+def load_submissions_profile(source: BinaryIO | str | Path, chunk_size: int = 1 << 16) -> Dict[str, Any]:
+    """Company profile from a submissions document, skipping the (large) filing history.
+
+    Returns the top-level fields (name, tickers, exchanges, sic, fiscalYearEnd, ...)
+    plus `fiscal_year_end` as "MM-DD" when the document carries one.
+    """
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as fh:
+            return load_submissions_profile(fh, chunk_size)
+    out: Dict[str, Any] = {}
+    sc = JSONScanner(source, chunk_size)
+    for key in sc.members():
+        if key == "filings":
+            sc.skip_value()
+        else:
+            out[key] = sc.read_value()
+    fye = str(out.get("fiscalYearEnd") or "")
+    if len(fye) == 4 and fye.isdigit():
+        out["fiscal_year_end"] = f"{fye[:2]}-{fye[2:]}"
+    return out
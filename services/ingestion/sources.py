@@ -0,0 +1,187 @@
+"""Fetch + parse entry points used by the pipeline.
+
+Each function downloads through the shared `Fetcher` (disk cache, rate
+limits) and is coalesced per (source, company, tag set): concurrent runs
+for the same company wait on one in-flight download/parse instead of
+repeating it.
+
+When a payload archive is configured (PAYLOAD_ARCHIVE_DIR), every raw body
+is archived by digest, and callers inside `recording_payloads()` receive
+references to the payloads behind the results they got, including results
+shared from another caller's in-flight fetch.
+"""
+
+from __future__ import annotations
+import io
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+from services.ingestion.archive import get_archive
+from services.ingestion.fetcher import Fetcher, FetchResult, get_fetcher
+from services.ingestion.frames import FrameColumn, parse_frame
+from services.ingestion.fx_client import build_fx_timeseries_url
+from services.ingestion.fx_rates import FXRates
+from services.ingestion.market_client import build_stooq_daily_csv
+from services.ingestion.prices import PriceSeries, PriceStore, from_day, parse_stooq_csv, to_day
+from services.ingestion.sec_client import (
+    FactTable, build_company_facts_url, build_frames_url, build_submissions_url, extract_many,
+    load_companyfacts_selective, load_submissions_profile, normalize_cik,
+)
+from services.ingestion.singleflight import SingleFlight
+
+if TYPE_CHECKING:  # the history store lives downstream of ingestion
+    from services.historical.store import CompanyHistory, HistoryStore
+    from services.mapper.engine import Mapper
+
+FLIGHTS = SingleFlight()
+
+T = TypeVar("T")
+Fetch = Callable[[str, str], FetchResult]
+_PAYLOADS: ContextVar[Optional[List[Dict[str, Any]]]] = ContextVar("run_payloads", default=None)
+
+
+@contextmanager
+def recording_payloads() -> Iterator[List[Dict[str, Any]]]:
+    """Collect {source, url, sha256, bytes} for payloads behind calls made in this context.
+
+    The context is inherited by `asyncio.to_thread`, so this also covers
+    the ingestion stage's worker threads.
+    """
+    refs: List[Dict[str, Any]] = []
+    token = _PAYLOADS.set(refs)
+    try:
+        yield refs
+    finally:
+        _PAYLOADS.reset(token)
+
+
+def _coalesced(key: Tuple, fetcher: Optional[Fetcher], load: Callable[[Fetch], T]) -> T:
+    def run() -> Tuple[T, List[Dict[str, Any]]]:
+        refs: List[Dict[str, Any]] = []
+        archive = get_archive()
+
+        def fetch(url: str, source: str) -> FetchResult:
+            res = (fetcher or get_fetcher()).get(url, source=source)
+            if archive is not None and res.body is not None:
+                refs.append({"source": source, "url": url, "sha256": archive.put(res.body), "bytes": len(res.body)})
+            return res
+
+        return load(fetch), refs
+
+    value, refs = FLIGHTS.do(key, run)
+    sink = _PAYLOADS.get()
+    if sink is not None:
+        sink.extend(refs)
+    return value
+
+
+def company_facts(
+    cik: str | int,
+    tags: Iterable[str],
+    taxonomy: str = "us-gaap",
+    unit: str = "USD",
+    fetcher: Optional[Fetcher] = None,
+) -> FactTable:
+    """Companyfacts for `cik`, reduced to `tags` in one columnar table."""
+    tags = tuple(dict.fromkeys(tags))
+    key = ("sec", normalize_cik(cik), taxonomy, unit, frozenset(tags))
+
+    def load(fetch: Fetch) -> FactTable:
+        res = fetch(build_company_facts_url(cik), "sec")
+        payload = load_companyfacts_selective(io.BytesIO(res.body), taxonomy, tags, [unit])
+        return extract_many(payload, taxonomy, tags, unit)
+
+    return _coalesced(key, fetcher, load)
+
+
+def company_history(
+    cik: str | int,
+    tags: Iterable[str],
+    store: HistoryStore,
+    mapper: Mapper,
+    taxonomy: str = "us-gaap",
+    unit: str = "USD",
+    fetcher: Optional[Fetcher] = None,
+) -> CompanyHistory:
+    """Mapped history for `cik`, synced from companyfacts into `store`.
+
+    Skips parsing entirely when the body (or its ETag / Last-Modified) is
+    unchanged since the last sync, and otherwise extracts only the periods
+    touched by new filings.
+    """
+    tags = tuple(dict.fromkeys(tags))
+    key = ("sec-history", normalize_cik(cik), taxonomy, unit, frozenset(tags), str(store.root))
+
+    def load(fetch: Fetch) -> CompanyHistory:
+        res = fetch(build_company_facts_url(cik), "sec")
+        version = res.headers.get("etag") or res.headers.get("last-modified")
+        hist, _ = store.sync(cik, res.body, list(tags), mapper, taxonomy, unit, version=version)
+        return hist
+
+    return _coalesced(key, fetcher, load)
+
+
+def submissions(cik: str | int, fetcher: Optional[Fetcher] = None) -> Dict[str, Any]:
+    """Company profile (name, tickers, fiscal year end, ...) from SEC submissions."""
+
+    def load(fetch: Fetch) -> Dict[str, Any]:
+        return load_submissions_profile(io.BytesIO(fetch(build_submissions_url(cik), "sec").body))
+
+    return _coalesced(("sec-submissions", normalize_cik(cik)), fetcher, load)
+
+
+def frame(taxonomy: str, tag: str, unit: str, period: str, fetcher: Optional[Fetcher] = None) -> FrameColumn:
+    """One XBRL frames cross-section (all filers) as a CIK-sorted column."""
+    url = build_frames_url(taxonomy, tag, unit, period)
+
+    def load(fetch: Fetch) -> FrameColumn:
+        col = parse_frame(fetch(url, "sec").json())
+        # the payload echoes these, but keep the requested key for storage
+        col.taxonomy, col.tag, col.unit, col.period = taxonomy, tag, unit, period
+        return col
+
+    return _coalesced(("sec-frame", taxonomy, tag, unit, period), fetcher, load)
+
+
+def prices(
+    symbol: str,
+    exchange_hint: Optional[str] = None,
+    store: Optional[PriceStore] = None,
+    fetcher: Optional[Fetcher] = None,
+) -> PriceSeries:
+    """Daily closes for `symbol` from Stooq.
+
+    With a `store`, only days after the last stored one are requested and
+    appended, and the full stored series is returned.
+    """
+
+    def load(fetch: Fetch) -> PriceSeries:
+        last = store.last_date(symbol) if store is not None else None
+        start = from_day(to_day(last) + 1) if last else None
+        url = build_stooq_daily_csv(symbol, exchange_hint, start=start)
+        body = fetch(url, "market").body
+        fresh = parse_stooq_csv(io.StringIO(body.decode("utf-8", "replace")), symbol, after=last)
+        if store is None:
+            return fresh
+        store.append(fresh)
+        return store.load(symbol)
+
+    key = ("stooq", symbol.upper(), exchange_hint, str(store.root) if store is not None else None)
+    return _coalesced(key, fetcher, load)
+
+
+def fx_timeseries(
+    start: str,
+    end: str,
+    base: str = "USD",
+    symbols: Optional[str] = None,
+    fx: Optional[FXRates] = None,
+    fetcher: Optional[Fetcher] = None,
+) -> FXRates:
+    """Daily FX rates for [start, end] loaded into `fx` (a new FXRates if None)."""
+    fx = fx if fx is not None else FXRates()
+    url = build_fx_timeseries_url(start, end, base, symbols)
+    payload = _coalesced(("fx", url), fetcher, lambda fetch: fetch(url, "fx").json())
+    fx.add_payload(payload)
+    return fx
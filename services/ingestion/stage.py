@@ -0,0 +1,130 @@
+"""Run-level ingestion: fetch every source a run needs concurrently.
+
+The per-source loaders in `sources.py` are blocking (they share the
+process-wide `Fetcher`, so its token buckets rate-limit across runs).
+`ingest_async` runs them on worker threads under one asyncio loop, so wall
+time is roughly that of the slowest source. At most `per_host` requests
+are in flight per source across all runs in the process: the limit is a
+module-level thread semaphore per source, acquired on the worker thread,
+since each run gets its own event loop. `ingest` is the synchronous
+facade for the job worker threads.
+
+A failing source does not fail the stage: its error is recorded and the
+other results are kept.
+"""
+
+from __future__ import annotations
+import asyncio
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import TYPE_CHECKING, Any, Callable, Dict, Optional, Tuple
+
+from services.ingestion import sources
+from services.ingestion.fetcher import Fetcher
+from services.ingestion.fx_rates import FXRates
+from services.ingestion.prices import PriceSeries, PriceStore
+from services.ingestion.sec_client import FactTable
+
+if TYPE_CHECKING:
+    from services.historical.store import CompanyHistory, HistoryStore
+    from services.mapper.engine import Mapper
+
+
+@dataclass(frozen=True)
+class IngestRequest:
+    cik: Optional[str] = None
+    tags: Tuple[str, ...] = ()
+    unit: str = "USD"
+    taxonomy: str = "us-gaap"
+    ticker: Optional[str] = None
+    exchange_hint: Optional[str] = None
+    benchmark: Optional[str] = None
+    price_store: Optional[PriceStore] = None
+    fx_quote: Optional[str] = None  # fetch USD->fx_quote history when set
+    fx_years: int = 20  # companyfacts reach back to ~2009; older periods are dropped at conversion
+    history_store: Optional[HistoryStore] = None  # with `mapper`: sync mapped history instead of raw facts
+    mapper: Optional[Mapper] = None
+
+
+@dataclass
+class IngestResult:
+    facts: Optional[FactTable] = None
+    history: Optional[CompanyHistory] = None
+    profile: Optional[Dict[str, Any]] = None
+    prices: Optional[PriceSeries] = None
+    benchmark: Optional[PriceSeries] = None
+    fx: Optional[FXRates] = None
+    errors: Dict[str, str] = field(default_factory=dict)
+    timings: Dict[str, float] = field(default_factory=dict)
+    elapsed: float = 0.0
+
+
+# result attribute -> source (policy/host) it is fetched from
+_SOURCE = {"facts": "sec", "history": "sec", "profile": "sec", "prices": "market", "benchmark": "market", "fx": "fx"}
+
+
+def _jobs(req: IngestRequest, fetcher: Optional[Fetcher]) -> Dict[str, Callable[[], Any]]:
+    jobs: Dict[str, Callable[[], Any]] = {}
+    if req.cik:
+        if req.tags and req.history_store is not None and req.mapper is not None:
+            jobs["history"] = lambda: sources.company_history(
+                req.cik, req.tags, req.history_store, req.mapper, req.taxonomy, req.unit, fetcher=fetcher
+            )
+        elif req.tags:
+            jobs["facts"] = lambda: sources.company_facts(req.cik, req.tags, req.taxonomy, req.unit, fetcher=fetcher)
+        jobs["profile"] = lambda: sources.submissions(req.cik, fetcher=fetcher)
+    if req.ticker:
+        jobs["prices"] = lambda: sources.prices(req.ticker, req.exchange_hint, req.price_store, fetcher=fetcher)
+    if req.benchmark:
+        jobs["benchmark"] = lambda: sources.prices(req.benchmark, None, req.price_store, fetcher=fetcher)
+    if req.fx_quote and req.fx_quote.upper() != "USD":
+        end = date.today()
+        start = end - timedelta(days=365 * req.fx_years)
+        jobs["fx"] = lambda: sources.fx_timeseries(
+            start.isoformat(), end.isoformat(), "USD", req.fx_quote.upper(), fetcher=fetcher
+        )
+    return jobs
+
+
+_LIMITS: Dict[Tuple[str, int], threading.BoundedSemaphore] = {}
+_LIMITS_LOCK = threading.Lock()
+
+
+def _host_limit(source: str, per_host: int) -> threading.BoundedSemaphore:
+    """The process-wide in-flight limit for `source`, shared by every run."""
+    with _LIMITS_LOCK:
+        sem = _LIMITS.get((source, per_host))
+        if sem is None:
+            sem = _LIMITS[(source, per_host)] = threading.BoundedSemaphore(per_host)
+        return sem
+
+
+def _limited(sem: threading.BoundedSemaphore, fn: Callable[[], Any]) -> Any:
+    with sem:
+        return fn()
+
+
+async def ingest_async(req: IngestRequest, fetcher: Optional[Fetcher] = None, per_host: int = 4) -> IngestResult:
+    result = IngestResult()
+    t0 = time.perf_counter()
+
+    async def run(name: str, fn: Callable[[], Any]) -> None:
+        sem = _host_limit(_SOURCE[name], per_host)
+        start = time.perf_counter()
+        try:
+            setattr(result, name, await asyncio.to_thread(_limited, sem, fn))
+        except Exception as e:
+            result.errors[name] = f"{type(e).__name__}: {e}"
+        finally:
+            result.timings[name] = time.perf_counter() - start
+
+    await asyncio.gather(*(run(n, fn) for n, fn in _jobs(req, fetcher).items()))
+    result.elapsed = time.perf_counter() - t0
+    return result
+
+
+def ingest(req: IngestRequest, fetcher: Optional[Fetcher] = None, per_host: int = 4) -> IngestResult:
+    """Blocking wrapper around `ingest_async` (call from threads without a running loop)."""
+    return asyncio.run(ingest_async(req, fetcher, per_host))
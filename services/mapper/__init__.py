@@ -2,5 +2,6 @@
 
 - mapping_gaap.json / mapping_ifrs.json: rule tables (tag -> canonical)
 - engine.py: applies precedence-aware rules to structured facts
+- registry.py: process-wide compiled mappers, hot-reloaded when a mapping file changes
 """
 
@@ -1,7 +1,10 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Any
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Mapping, Optional, Any, Sequence, Tuple
+import hashlib
 import json
+import math
 from pathlib import Path
 
 
@@ -14,10 +17,17 @@ class MappingRule:
     units: Optional[List[str]] = None
 
 
+# (rule position in application order, canonical, sign) for each rule a tag triggers
+_Dispatch = Dict[str, Tuple[Tuple[int, str, int], ...]]
+
+
 @dataclass
 class Mapper:
     rules: List[MappingRule]
     aliases: Dict[str, str]
+    taxonomy_version: Optional[str] = None  # "version" of the mapping file
+    # per-unit dispatch tables, compiled on first use (rules are not expected to change afterwards)
+    _compiled: Dict[str, _Dispatch] = field(default_factory=dict, init=False, repr=False, compare=False)
 
     @staticmethod
     def from_json_path(path: str | Path) -> "Mapper":
@@ -34,30 +44,115 @@ class Mapper:
         ]
         # sort rules by precedence desc so higher precedence applied later (can overwrite)
         rules.sort(key=lambda r: r.precedence)
-        return Mapper(rules=rules, aliases=data.get("aliases", {}))
+        version = data.get("version")
+        return Mapper(rules=rules, aliases=data.get("aliases", {}), taxonomy_version=str(version) if version is not None else None)
 
     def resolve_alias(self, tag: str) -> str:
         return self.aliases.get(tag, tag)
 
+    def compile(self, unit: str = "USD") -> _Dispatch:
+        """tag -> rules that apply to it for `unit`, in rule application order."""
+        table = self._compiled.get(unit)
+        if table is None:
+            acc: Dict[str, List[Tuple[int, str, int]]] = {}
+            for pos, rule in enumerate(self.rules):
+                if rule.units and unit not in rule.units:
+                    continue
+                acc.setdefault(rule.tag, []).append((pos, rule.canonical, rule.sign))
+            table = {tag: tuple(hits) for tag, hits in acc.items()}
+            self._compiled[unit] = table
+        return table
+
+    def digest(self, unit: str = "USD") -> str:
+        """Fingerprint of what mapping does for `unit`: the compiled rules and the aliases.
+
+        Two mappers with the same digest map every period identically,
+        whatever their `taxonomy_version` says.
+        """
+        blob = json.dumps([sorted(self.compile(unit).items()), sorted(self.aliases.items())])
+        return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:16]
+
     def map_period(self, facts_by_tag: Dict[str, float], unit: str = "USD") -> Dict[str, float]:
         """Map a dict of {tag: value} into canonical lines for a single period.
         - Applies aliases
         - Applies sign and precedence (later rules overwrite earlier for same canonical)
         - Only applies rules whose units include the provided unit if units are specified
         - Adds derived fields when possible (e.g., gross_profit = revenue - cogs)
+
+        Cost is O(facts present): each tag is looked up in the compiled
+        per-unit dispatch table instead of scanning every rule.
         """
+        return self._apply(facts_by_tag, self.compile(unit))
+
+    def map_periods(self, periods: Iterable[Dict[str, float]], unit: str = "USD") -> List[Dict[str, float]]:
+        """`map_period` over many periods, compiling the unit's table once."""
+        table = self.compile(unit)
+        return [self._apply(facts, table) for facts in periods]
+
+    def _apply(self, facts_by_tag: Dict[str, float], table: _Dispatch) -> Dict[str, float]:
         # normalize keys via aliases
-        norm = {self.resolve_alias(k): v for k, v in facts_by_tag.items()}
+        aliases = self.aliases
+        norm = {aliases.get(k, k): v for k, v in facts_by_tag.items()}
 
+        hits: List[Tuple[int, str, float]] = []
+        for tag, v in norm.items():
+            for pos, canonical, sign in table.get(tag, ()):
+                hits.append((pos, canonical, sign * float(v)))
+        # replay in rule order so overwrites (and key order) match a full rule scan
+        hits.sort(key=lambda h: h[0])
         out: Dict[str, float] = {}
-        for rule in self.rules:
-            if rule.units and unit not in (rule.units or []):
-                continue
-            if rule.tag in norm:
-                out[rule.canonical] = rule.sign * float(norm[rule.tag])
+        for _, canonical, val in hits:
+            out[canonical] = val
 
         # Derived lines
         if "revenue" in out and "cogs" in out and "gross_profit" not in out:
             out["gross_profit"] = float(out["revenue"]) - float(out["cogs"])  # assume cogs is positive expense
         return out
 
+    def selection(self, tags: Sequence[str], unit: str = "USD") -> Dict[str, List[Tuple[int, int]]]:
+        """canonical -> [(column index into `tags`, sign)], highest priority first.
+
+        Priority follows map_period: the last applicable rule wins, and among
+        columns that alias to the same tag the later column wins. The first
+        non-missing entry of a chain is the period's value.
+        """
+        cols_by_tag: Dict[str, List[int]] = {}
+        for j, t in enumerate(tags):
+            cols_by_tag.setdefault(self.aliases.get(t, t), []).append(j)
+        sel: Dict[str, List[Tuple[int, int]]] = {}
+        for pos in range(len(self.rules) - 1, -1, -1):
+            rule = self.rules[pos]
+            if rule.units and unit not in rule.units:
+                continue
+            for j in reversed(cols_by_tag.get(rule.tag, ())):
+                sel.setdefault(rule.canonical, []).append((j, rule.sign))
+        return sel
+
+    def map_matrix(self, columns: Mapping[str, Sequence[float]], unit: str = "USD") -> Dict[str, array]:
+        """Map a tag x period grid (NaN = no fact) to a canonical line x period grid.
+
+        `columns` is {tag: values per period}, e.g. `FactTable.values`. Each
+        output line is filled by coalescing its selection chain column by
+        column, then gross_profit is derived where missing. Period for
+        period, `period_lines(result, i)` equals `map_period` of that
+        period's non-NaN facts.
+        """
+        tags = list(columns)
+        data = [columns[t] for t in tags]
+        n = len(data[0]) if data else 0
+        out: Dict[str, array] = {}
+        for canonical, chain in self.selection(tags, unit).items():
+            line = [math.nan] * n
+            for j, sign in chain:
+                line = [o if o == o else sign * float(v) for o, v in zip(line, data[j])]
+            out[canonical] = array("d", line)
+        rev, cogs = out.get("revenue"), out.get("cogs")
+        if rev is not None and cogs is not None:
+            gp = out.get("gross_profit") or array("d", [math.nan]) * n
+            out["gross_profit"] = array("d", (g if g == g else r - c for g, r, c in zip(gp, rev, cogs)))
+        return out
+
+
+def period_lines(mapped: Mapping[str, Sequence[float]], i: int) -> Dict[str, float]:
+    """{canonical: value} for period `i` of a `map_matrix` result (NaN lines skipped)."""
+    return {k: col[i] for k, col in mapped.items() if col[i] == col[i]}
@@ -0,0 +1,66 @@
+"""Process-wide cache of compiled mappers, reloaded when the mapping file changes.
+
+Each `get()` stats the file; the cached `Mapper` is reused while its
+(mtime, size) is unchanged. A changed file is parsed outside the lock and
+swapped in whole, so concurrent runs see either the old or the new mapper,
+never a partial one. If the new file fails to parse, the previous mapper
+stays in service and the error is recorded in `stats()`.
+"""
+
+from __future__ import annotations
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from .engine import Mapper
+
+GAAP_MAPPING_PATH = Path(__file__).with_name("mapping_gaap.json")
+IFRS_MAPPING_PATH = Path(__file__).with_name("mapping_ifrs.json")
+
+
+class MapperRegistry:
+    def __init__(self):
+        self._entries: Dict[Path, Tuple[Tuple[int, int], Mapper]] = {}
+        self._lock = threading.Lock()
+        self._stats = {"loads": 0, "reloads": 0, "hits": 0, "errors": 0}
+        self.last_error: Optional[str] = None
+
+    def get(self, path: str | Path = GAAP_MAPPING_PATH) -> Mapper:
+        key = Path(path).resolve()
+        st = key.stat()
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == stamp:
+                self._stats["hits"] += 1
+                return entry[1]
+        try:
+            mapper = Mapper.from_json_path(key)
+        except Exception as e:
+            with self._lock:
+                self._stats["errors"] += 1
+                self.last_error = f"{key}: {e}"
+                entry = self._entries.get(key)
+            if entry is None:
+                raise
+            return entry[1]
+        with self._lock:
+            self._stats["reloads" if key in self._entries else "loads"] += 1
+            self._entries[key] = (stamp, mapper)
+        return mapper
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {**self._stats, "cached": len(self._entries), "last_error": self.last_error}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+MAPPERS = MapperRegistry()
+
+
+def get_mapper(path: str | Path = GAAP_MAPPING_PATH) -> Mapper:
+    """Compiled mapper for `path` from the process-wide registry."""
+    return MAPPERS.get(path)
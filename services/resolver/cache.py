@@ -0,0 +1,87 @@
+"""In-process LRU cache in front of `resolve()`.
+
+Entries are keyed by (normalized query, limit) and tagged with the entity
+universe version they were computed against, so a swapped entity store
+invalidates them without an explicit flush. Unresolvable names are cached
+too (negative entries), with their own, shorter TTL.
+"""
+
+from __future__ import annotations
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, Tuple
+
+from services.config.env import get_resolver_config
+from .core import Candidate, _norm, resolve, universe_version
+
+
+class ResolverCache:
+    """Thread-safe LRU + TTL cache with hit/miss/eviction counters."""
+
+    def __init__(
+        self,
+        maxsize: int = 4096,
+        ttl: float = 3600.0,
+        negative_ttl: float = 300.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._data: "OrderedDict[Tuple[str, int], Tuple[float, str, List[Candidate]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def resolve(self, name: str, limit: int = 5) -> List[Candidate]:
+        """Cached equivalent of `services.resolver.core.resolve`."""
+        if not name.strip():
+            return []
+        key = (_norm(name.strip()), limit)
+        version = universe_version()
+        now = self._clock()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                expires, ver, result = entry
+                if expires > now and ver == version:
+                    self._data.move_to_end(key)
+                    self._stats["hits" if result else "negative_hits"] += 1
+                    return list(result)
+                del self._data[key]
+                self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+
+        result = resolve(name, limit=limit)
+        ttl = self.ttl if result else self.negative_ttl
+        with self._lock:
+            self._data[key] = (now + ttl, version, result)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats["evictions"] += 1
+        return list(result)
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            out: Dict[str, float] = dict(self._stats)
+            out["size"] = len(self._data)
+        lookups = out["hits"] + out["negative_hits"] + out["misses"]
+        out["hit_rate"] = (out["hits"] + out["negative_hits"]) / lookups if lookups else 0.0
+        return out
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            for k in self._stats:
+                self._stats[k] = 0
+
+
+_cfg = get_resolver_config()
+CACHE = ResolverCache(maxsize=_cfg.cache_size, ttl=_cfg.cache_ttl_sec, negative_ttl=_cfg.negative_ttl_sec)
+
+
+def resolve_cached(name: str, limit: int = 5) -> List[Candidate]:
+    """`resolve()` through the process-wide `CACHE`."""
+    return CACHE.resolve(name, limit=limit)
@@ -1,29 +1,103 @@
+"""Command-line resolver: prints candidates for one name, or streams a file of names to JSONL.
+
+Usage:
+    python -m services.resolver.cli "Apple"
+    python -m services.resolver.cli --bulk names.txt            # one name per line, JSONL out
+    python -m services.resolver.cli --bulk - < names.txt         # names from stdin
+    python -m services.resolver.cli --bulk book.csv --column company --workers 4
+"""
+
+import argparse
+import csv
 import json
 import sys
-from .core import resolve
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, Optional, TextIO
+
+from .core import candidate_to_dict, get_index, resolve, resolve_many
+
+_CHUNK = 500  # names per bulk batch (and per worker task)
+
+
+def _read_names(fh: TextIO, column: Optional[str]) -> Iterator[str]:
+    # not a generator: the CSV header is read and `column` checked on the call
+    if column:
+        reader = csv.DictReader(fh)
+        header = reader.fieldnames or []
+        if column not in header:
+            raise ValueError(f"no column {column!r} in the CSV header; available: {', '.join(header) or '(none)'}")
+        return (row.get(column) or "" for row in reader)
+    return (line.rstrip("\r\n") for line in fh)
+
+
+def _chunks(names: Iterable[str], size: int) -> Iterator[List[str]]:
+    it = iter(names)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _resolve_chunk(args) -> List[str]:
+    names, limit = args
+    return [
+        json.dumps({"query": n, "candidates": [candidate_to_dict(c) for c in cands]})
+        for n, cands in zip(names, resolve_many(names, limit=limit))
+    ]
+
+
+def run_bulk(src: TextIO, out: TextIO, limit: int = 5, column: Optional[str] = None, workers: int = 1) -> int:
+    """Stream names from `src` and write one JSON line per name to `out`.
+
+    Input order is preserved. With `workers > 1` chunks are resolved in a
+    process pool; the index is built before forking so workers share it.
+    Returns the number of names processed. Raises ValueError, before any
+    output, when `column` is not in the CSV header.
+    """
+    chunks = ((c, limit) for c in _chunks(_read_names(src, column), _CHUNK))
+    count = 0
+    if workers > 1:
+        get_index()
+        with Pool(workers) as pool:
+            for lines in pool.imap(_resolve_chunk, chunks):
+                out.write("".join(line + "\n" for line in lines))
+                count += len(lines)
+    else:
+        for lines in map(_resolve_chunk, chunks):
+            out.write("".join(line + "\n" for line in lines))
+            count += len(lines)
+    out.flush()
+    return count
 
 
 def main():
-    if len(sys.argv) < 2:
+    parser = argparse.ArgumentParser(prog="python -m services.resolver.cli")
+    parser.add_argument("name", nargs="*", help="company name to resolve")
+    parser.add_argument("--bulk", metavar="FILE", help="resolve names from FILE ('-' for stdin) and emit JSONL")
+    parser.add_argument("--column", help="CSV column holding the names (bulk mode)")
+    parser.add_argument("--limit", type=int, default=5, help="candidates per name")
+    parser.add_argument("--workers", type=int, default=1, help="worker processes for bulk mode")
+    args = parser.parse_args()
+
+    if args.bulk:
+        try:
+            if args.bulk == "-":
+                run_bulk(sys.stdin, sys.stdout, args.limit, args.column, args.workers)
+            else:
+                with open(args.bulk, newline="") as fh:
+                    run_bulk(fh, sys.stdout, args.limit, args.column, args.workers)
+        except ValueError as e:
+            parser.error(str(e))
+        return
+    if not args.name:
         print("Usage: python -m services.resolver.cli <company name>")
         sys.exit(2)
-    name = " ".join(sys.argv[1:])
-    cands = resolve(name)
-    print(json.dumps([
-        {
-            "name": c.entity.name,
-            "ticker": c.entity.ticker,
-            "exchange": c.entity.exchange,
-            "country": c.entity.country,
-            "cik": c.entity.cik,
-            "currency": c.entity.currency,
-            "score": round(c.score, 2),
-            "reason": c.reason,
-        }
-        for c in cands
-    ], indent=2))
+    name = " ".join(args.name)
+    cands = resolve(name, limit=args.limit)
+    print(json.dumps([candidate_to_dict(c) for c in cands], indent=2))
 
 
 if __name__ == "__main__":
     main()
-
@@ -1,9 +1,21 @@
+from array import array
+from collections import Counter
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from itertools import chain
+from operator import itemgetter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+import heapq
 import math
+import os
 import re
+import threading
+import time
 
-# Minimal seed dataset; can be swapped for provider/cached store later.
+from services.config.env import get_resolver_config
+
+from .postings import Blobs, Buckets, Postings, pack_blobs, pack_buckets, pack_bundle, pack_ints, pack_postings, unpack_bundle
+
+# Minimal seed dataset; used when no entity store is configured (see load_universe).
 @dataclass(frozen=True)
 class Entity:
     name: str
@@ -12,13 +24,14 @@ class Entity:
     country: str
     cik: Optional[str] = None
     currency: Optional[str] = None
+    fiscal_year_end: Optional[str] = None  # MM-DD
 
 
 SEED_ENTITIES: Tuple[Entity, ...] = (
-    Entity(name="Apple Inc.", ticker="AAPL", exchange="NASDAQ", country="US", cik="0000320193", currency="USD"),
-    Entity(name="Alphabet Inc.", ticker="GOOGL", exchange="NASDAQ", country="US", cik="0001652044", currency="USD"),
-    Entity(name="Microsoft Corporation", ticker="MSFT", exchange="NASDAQ", country="US", cik="0000789019", currency="USD"),
-    Entity(name="Infosys Limited", ticker="INFY", exchange="NSE", country="IN", cik=None, currency="INR"),
+    Entity(name="Apple Inc.", ticker="AAPL", exchange="NASDAQ", country="US", cik="0000320193", currency="USD", fiscal_year_end="09-30"),
+    Entity(name="Alphabet Inc.", ticker="GOOGL", exchange="NASDAQ", country="US", cik="0001652044", currency="USD", fiscal_year_end="12-31"),
+    Entity(name="Microsoft Corporation", ticker="MSFT", exchange="NASDAQ", country="US", cik="0000789019", currency="USD", fiscal_year_end="06-30"),
+    Entity(name="Infosys Limited", ticker="INFY", exchange="NSE", country="IN", cik=None, currency="INR", fiscal_year_end="03-31"),
 )
 
 ALIASES = {
@@ -54,6 +67,90 @@ def _lev(a: str, b: str) -> int:
     return prev[-1]
 
 
+def _lane_masks(names: Sequence[str], m: int) -> Dict[str, int]:
+    """Per-character match masks over `names`, which all have length `m`.
+
+    Name j occupies lane j, bits [j * (m + 1), j * (m + 1) + m); bit
+    j * (m + 1) + i is set in the mask for c where names[j][i] == c. The
+    top bit of each lane is a zero guard (see `_lev_lanes`).
+    """
+    present = set("".join(names))
+    guard = "\x00"
+    while guard in present:
+        guard = chr(ord(guard) + 1)
+    # int(..., 2) reads the most significant digit first, hence the reversal
+    text = "".join([b + guard for b in names])[::-1]
+    zeros = dict.fromkeys(map(ord, present | {guard}), "0")
+    return {c: int(text.translate({**zeros, ord(c): "1"}), 2) for c in present}
+
+
+def _lev_lanes(q: str, m: int, count: int, peq: Dict[str, int], max_dist: int) -> List[Tuple[int, int]]:
+    """(lane, distance) for each of `count` names of length `m` within `max_dist` of `q`.
+
+    Bit-parallel Levenshtein (Myers/Hyyrö) with the names as the patterns:
+    `peq` holds their match masks packed side by side (`_lane_masks`), and
+    the query is streamed through every lane at once, so the work per
+    query character is a dozen big-integer operations however many names
+    there are. The zero guard bit above each lane absorbs carries and
+    shifts, keeping the lanes independent.
+    """
+    n = len(q)
+    if count == 0 or abs(m - n) > max_dist:
+        return []
+    width = m + 1
+    lsb, filled = 1, 1
+    while filled < count:
+        lsb |= lsb << (filled * width)
+        filled *= 2
+    lsb &= (1 << (count * width)) - 1
+    full = lsb * ((1 << m) - 1)
+    # D[i][0] = i down each lane: every vertical delta starts at +1
+    vp, vn = full, 0
+    for c in q:
+        eq = peq.get(c, 0)
+        d0 = ((((eq & vp) + vp) ^ vp) | eq | vn) & full
+        hp = vn | (~(d0 | vp) & full)
+        hn = vp & d0
+        # D[0][j] = j: the top row steps up by one per query character
+        hp = ((hp << 1) & full) | lsb
+        hn = (hn << 1) & full
+        vp = hn | (~(d0 | hp) & full)
+        vn = hp & d0
+    # D[m][n] = D[0][n] + the vertical deltas of the last column
+    size = count * width
+    ups = format(vp, "b").zfill(size)[::-1]
+    downs = format(vn, "b").zfill(size)[::-1]
+    out: List[Tuple[int, int]] = []
+    for j in range(count):
+        lo = j * width
+        d = n + ups.count("1", lo, lo + m) - downs.count("1", lo, lo + m)
+        if d <= max_dist:
+            out.append((j, d))
+    return out
+
+
+def _lev_batch(q: str, names: Sequence[str], max_dist: int) -> List[int]:
+    """Levenshtein distance from `q` to each of `names`, bounded by `max_dist`.
+
+    Names are grouped by length and each group goes through `_lev_lanes`
+    in one pass. Distances above `max_dist` are reported as `max_dist + 1`.
+    """
+    out = [max_dist + 1] * len(names)
+    groups: Dict[int, List[int]] = {}
+    for k, b in enumerate(names):
+        groups.setdefault(len(b), []).append(k)
+    for m, ks in groups.items():
+        group = [names[k] for k in ks]
+        for j, d in _lev_lanes(q, m, len(ks), _lane_masks(group, m), max_dist):
+            out[ks[j]] = d
+    return out
+
+
+def _lev_within(a: str, b: str, max_dist: int) -> int:
+    """Bounded Levenshtein distance; returns `max_dist + 1` when exceeded."""
+    return _lev_batch(a, (b,), max_dist)[0]
+
+
 @dataclass(frozen=True)
 class Candidate:
     entity: Entity
@@ -61,8 +158,387 @@ class Candidate:
     reason: str
 
 
-def resolve(name: str, limit: int = 5) -> List[Candidate]:
-    """Resolve a free-text name to ranked candidates from SEED_ENTITIES.
+_FUZZY_BASE = 90.0  # fuzzy score = _FUZZY_BASE - distance
+_FUZZY_MAX_DIST = 10  # score >= 80 keeps small typos
+_GRAM = 3  # n-gram size for the inverted index
+_SEED_PROBES = 32  # best gram-overlap names scored first to tighten the distance bound
+_TICKER_SUBSTR = 82.0
+_NAME_SUBSTR = 81.0
+
+
+def _grams(s: str, q: int = _GRAM) -> List[str]:
+    # n-grams tagged with their occurrence count ("abc0", "abc1", ...) so that
+    # set overlap equals multiset overlap (a superstring of the query carries
+    # every tagged gram of it); grams have a fixed length, so the tag is
+    # unambiguous
+    seen: Dict[str, int] = {}
+    out: List[str] = []
+    for i in range(len(s) - q + 1):
+        g = s[i:i + q]
+        n = seen.get(g, 0)
+        seen[g] = n + 1
+        out.append(f"{g}{n}")
+    return out
+
+
+def compile_index(entities: Iterable[Entity]) -> bytes:
+    """Build the `EntityIndex` lookup tables for `entities` as one buffer.
+
+    The entity store embeds this at build time so that processes mapping the
+    store query the tables in place instead of rebuilding them.
+    """
+    by_ticker: Dict[str, List[int]] = {}
+    by_norm_ticker: Dict[str, List[int]] = {}
+    by_raw_name: Dict[str, List[int]] = {}
+    by_name: Dict[str, List[int]] = {}
+    # (exchange, ticker) dedupe key per entity, interned as small ints
+    dedupe: Dict[Tuple[str, str], int] = {}
+    dedupe_ids = array("I")
+    for i, e in enumerate(entities):
+        dedupe_ids.append(dedupe.setdefault((e.exchange, e.ticker), len(dedupe)))
+        by_ticker.setdefault(e.ticker.lower(), []).append(i)
+        by_norm_ticker.setdefault(_norm(e.ticker), []).append(i)
+        by_raw_name.setdefault(e.name, []).append(i)
+        by_name.setdefault(_norm(e.name), []).append(i)
+
+    # rank of each dedupe key under the (exchange, ticker) tie-break
+    order = array("I", bytes(4 * len(dedupe)))
+    for rank, d in enumerate(d for _, d in sorted(dedupe.items())):
+        order[d] = rank
+
+    # distinct normalized names ("keys"), numbered in the order the name
+    # table stores them; fuzzy/substring work is per key
+    by_len: Dict[int, List[int]] = {}
+    postings: Dict[str, List[int]] = {}
+    char_postings: Dict[str, List[int]] = {}
+    keys = sorted(by_name)
+    for ki, key in enumerate(keys):
+        by_len.setdefault(len(key), []).append(ki)
+        for g in _grams(key):
+            postings.setdefault(g, []).append(ki)
+        for g in _grams(key, 1):
+            char_postings.setdefault(g, []).append(ki)
+    # match masks of each length bucket for `_lev_lanes`, keyed char + length
+    lanes: Dict[str, bytes] = {}
+    for length, kis in by_len.items():
+        for c, mask in _lane_masks([keys[ki] for ki in kis], length).items():
+            lanes[f"{c}{length}"] = mask.to_bytes((mask.bit_length() + 7) // 8, "little")
+
+    return pack_bundle({
+        "ticker": pack_postings(by_ticker),
+        "norm_ticker": pack_postings(by_norm_ticker),
+        "raw_name": pack_postings(by_raw_name),
+        "name": pack_postings(by_name),
+        "dedupe": dedupe_ids.tobytes(),
+        "order": order.tobytes(),
+        "ticker_lens": pack_ints(sorted({len(t) for t in by_norm_ticker})),
+        "length": pack_buckets(by_len),
+        "grams": pack_postings(postings),
+        "chars": pack_postings(char_postings),
+        "lanes": pack_blobs(lanes),
+    })
+
+
+class EntityIndex:
+    """Lookup structures over an entity universe (see `compile_index`).
+
+    - exact hash maps for tickers, raw names, normalized names and aliases
+    - n-gram and character inverted indexes over the distinct normalized names
+    - length buckets for edit-distance candidates, with their names'
+      match masks packed for the bit-parallel distance kernel
+
+    An entity store carries these tables precompiled and they are read from
+    the mapped file in place; any other sequence is compiled in memory.
+
+    `search` returns the same candidates as a linear scan with the `resolve`
+    heuristic, but only scores names whose length leaves them within the
+    edit distance that can still reach the top `limit`.
+    """
+
+    def __init__(self, entities: Sequence[Entity], aliases: Dict[str, str]):
+        self.entities = entities
+        stored = getattr(entities, "index_tables", None)
+        tables = stored() if stored is not None else unpack_bundle(memoryview(compile_index(entities)))
+        self._by_ticker = Postings(tables["ticker"])
+        self._by_norm_ticker = Postings(tables["norm_ticker"])
+        self._by_raw_name = Postings(tables["raw_name"])
+        self._names = Postings(tables["name"])
+        self._dedupe = tables["dedupe"].cast("I")
+        self._order = tables["order"].cast("I")
+        self._ticker_lens = list(tables["ticker_lens"].cast("I"))
+        self._by_len = Buckets(tables["length"])
+        self._postings = Postings(tables["grams"])
+        self._char_postings = Postings(tables["chars"])
+        self._lanes = Blobs(tables["lanes"])
+
+        self._aliases: Dict[str, str] = {}
+        for k, v in aliases.items():
+            self._aliases.setdefault(_norm(k), v)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def search(self, qn: str, limit: int = 5) -> List[Tuple[int, float, str]]:
+        """Return (entity_id, score, reason) hits for a normalized query.
+
+        Hits are ordered as the heuristic stages emit them (ticker, alias,
+        exact name, fuzzy, substring; entity order within a stage). Ranking
+        them gives the same top `limit` as ranking every hit of a linear
+        scan: fuzzy names too far in length to reach the top are never
+        scored, and substring hits are only kept for the best-placed
+        entities that still need them.
+        """
+        exact: List[Tuple[int, float, str]] = []
+        for i in self._by_ticker.get(qn, ()):
+            exact.append((i, 100.0, "exact_ticker"))
+        target = self._aliases.get(qn)
+        if target is not None:
+            for i in self._by_raw_name.get(target, ()):
+                exact.append((i, 95.0, "alias"))
+        for i in self._names.get(qn, ()):
+            exact.append((i, 95.0, "exact_name"))
+
+        qgrams = _grams(qn)
+        overlap: Counter = Counter()
+        for g in qgrams:
+            overlap.update(self._postings.get(g, ()))
+
+        # limit-th best score over dedupe keys, used to bound the fuzzy search
+        best = _Best(limit)
+        for i, score, _ in exact:
+            best.note(self._dedupe[i], score)
+        tiers = self._substring_matches(qn, qgrams, overlap, best)
+        fuzzy = self._fuzzy_hits(qn, overlap, best, limit)
+        fuzzy.sort(key=itemgetter(0))
+        return exact + fuzzy + self._substring_hits(tiers, exact + fuzzy, limit)
+
+    def _substring_matches(
+        self, qn: str, qgrams: List[str], overlap: Counter, best: "_Best"
+    ) -> List[Tuple[float, str, Dict[int, int]]]:
+        # (score, reason, first matching entity per dedupe key) for each
+        # substring tier that can still reach the top `limit`
+        tiers: List[Tuple[float, str, Dict[int, int]]] = []
+        if best.kth() is not None and best.kth() > _TICKER_SUBSTR:
+            return tiers
+        ids: List[Iterable[int]] = []
+        if qn:
+            for n in self._ticker_lens:
+                if n > len(qn):
+                    break
+                for s in {qn[j:j + n] for j in range(len(qn) - n + 1)}:
+                    ids.append(self._by_norm_ticker.get(s, ()))
+        first = self._first_per_key(ids)
+        best.note_many(first, _TICKER_SUBSTR)
+        tiers.append((_TICKER_SUBSTR, "ticker_substr", first))
+        if best.kth() is not None and best.kth() > _NAME_SUBSTR:
+            return tiers
+
+        if qgrams:
+            # a superstring carries every (tagged) gram of the query
+            keys: Iterable[int] = [ki for ki, c in overlap.items() if c == len(qgrams)]
+        elif qn:
+            # too short for trigrams: intersect the character postings
+            # (smallest first) instead of scanning every name
+            lists = sorted((self._char_postings.get(g, ()) for g in _grams(qn, 1)), key=len)
+            keys = set(lists[0]).intersection(*lists[1:])
+        else:
+            keys = range(len(self._names))
+        if len(qn) > 1:
+            keys = [ki for ki in keys if qn in self._names.key(ki)]
+        # (a one-character query's postings are exactly its superstrings)
+        first = self._first_per_key([self._names.ids(ki) for ki in keys])
+        best.note_many(first, _NAME_SUBSTR)
+        tiers.append((_NAME_SUBSTR, "name_substr", first))
+        return tiers
+
+    def _first_per_key(self, ids: List[Iterable[int]]) -> Dict[int, int]:
+        # lowest entity id per dedupe key; later assignments win, so walk
+        # the ids from the highest down
+        dedupe = self._dedupe
+        return {dedupe[i]: i for i in sorted(chain.from_iterable(ids), reverse=True)}
+
+    def _substring_hits(
+        self, tiers: List[Tuple[float, str, Dict[int, int]]], earlier: List[Tuple[int, float, str]], limit: int
+    ) -> List[Tuple[int, float, str]]:
+        # A tier's hit only decides a dedupe key's candidate when nothing
+        # emitted before it scores as high, and only the `limit` minus
+        # (keys already scoring higher) best-ordered such keys can be returned.
+        prior: Dict[int, float] = {}
+        for i, score, _ in earlier:
+            d = self._dedupe[i]
+            if score > prior.get(d, -math.inf):
+                prior[d] = score
+        hits: List[Tuple[int, float, str]] = []
+        for score, reason, first in tiers:
+            above = sum(1 for s in prior.values() if s > score)
+            need = limit - above
+            if need > 0:
+                fresh = [(self._order[d], i) for d, i in first.items() if prior.get(d, -math.inf) < score]
+                hits.extend((i, score, reason) for _, i in heapq.nsmallest(need, fresh))
+            for d in first:
+                if score > prior.get(d, -math.inf):
+                    prior[d] = score
+        # entity order; the stable sort keeps ticker before name per entity
+        hits.sort(key=itemgetter(0))
+        return hits
+
+    def _fuzzy_hits(
+        self, qn: str, overlap: Counter, best: "_Best", limit: int
+    ) -> List[Tuple[int, float, str]]:
+        hits: List[Tuple[int, float, str]] = []
+
+        def bound() -> int:
+            # keys scoring below the limit-th best can never be returned, so
+            # only distances that would tie or beat it still matter
+            kth = best.kth()
+            if kth is None:
+                return _FUZZY_MAX_DIST
+            return min(_FUZZY_MAX_DIST, int(math.floor(_FUZZY_BASE - kth)))
+
+        def record(ki: int, dist: int) -> None:
+            s = _FUZZY_BASE - dist
+            for i in self._names.ids(ki):
+                hits.append((i, s, f"lev:{dist}"))
+                best.note(self._dedupe[i], s)
+
+        maxd = bound()
+        if maxd < 0:
+            return hits
+        n = len(qn)
+        # the best gram-overlap names first, so the bound is tight before
+        # the length buckets are scanned
+        seeds = [ki for ki, _ in overlap.most_common(_SEED_PROBES) if abs(len(self._names.key(ki)) - n) <= maxd]
+        for ki, dist in zip(seeds, _lev_batch(qn, [self._names.key(ki) for ki in seeds], maxd)):
+            if dist <= maxd:
+                record(ki, dist)
+        scored = set(seeds)
+        maxd = bound()
+
+        # then every name within the bound, one whole length bucket per
+        # kernel pass, nearest lengths first (a length gap of d costs at
+        # least d edits)
+        delta = 0
+        while delta <= maxd:
+            for length in sorted({n - delta, n + delta}):
+                kis = self._by_len.get(length, ())
+                peq = {c: int.from_bytes(self._lanes.get(f"{c}{length}", b""), "little") for c in set(qn)}
+                for j, dist in _lev_lanes(qn, length, len(kis), peq, maxd):
+                    if kis[j] not in scored:
+                        record(kis[j], dist)
+                maxd = bound()
+            delta += 1
+        return hits
+
+
+class _Best:
+    """Tracks the `limit`-th best score over dedupe keys as hits are noted."""
+
+    # Only the `limit` keys with the highest scores are tracked: a key that
+    # is not among them scores at most the limit-th best, which never drops.
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._top: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+
+    def note(self, key: int, score: float) -> None:
+        if self.limit <= 0:
+            return
+        if key in self._top:
+            if score <= self._top[key]:
+                return
+            self._top[key] = score
+            self._heap = [(s, k) for k, s in self._top.items()]
+            heapq.heapify(self._heap)
+        elif len(self._top) < self.limit:
+            self._top[key] = score
+            heapq.heappush(self._heap, (score, key))
+        elif score > self._heap[0][0]:
+            _, evicted = heapq.heapreplace(self._heap, (score, key))
+            del self._top[evicted]
+            self._top[key] = score
+
+    def note_many(self, keys: Iterable[int], score: float) -> None:
+        for key in keys:
+            kth = self.kth()
+            if kth is not None and kth >= score:
+                return  # no key can move into the top any more
+            self.note(key, score)
+
+    def kth(self) -> Optional[float]:
+        """The `limit`-th best score so far, or None while fewer keys have scores."""
+        if self.limit <= 0 or len(self._top) < self.limit:
+            return None
+        return self._heap[0][0]
+
+
+_INDEX: Optional[EntityIndex] = None
+_INDEX_LOCK = threading.Lock()
+_STORE_CHECK_SEC = 5.0  # how often to look for a swapped entity store file
+_next_store_check = 0.0
+
+
+def load_universe() -> Sequence[Entity]:
+    """Entity universe: the mapped entity store when configured, else SEED_ENTITIES."""
+    path = get_resolver_config().entity_store_path
+    if path and os.path.exists(path):
+        # imported here: entity_store builds on Entity from this module
+        from .entity_store import EntityStore
+        return EntityStore(path)
+    return SEED_ENTITIES
+
+
+def get_index() -> EntityIndex:
+    """Return the process-wide index, building it on first use.
+
+    When the universe is an entity store, a file swapped in by the nightly
+    refresh is picked up within `_STORE_CHECK_SEC`. The store carries its
+    lookup tables precompiled, so opening the new index only maps the file;
+    one caller does that and swaps it in while others keep serving from the
+    previous one.
+    """
+    global _INDEX, _next_store_check
+    idx = _INDEX
+    if idx is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = EntityIndex(load_universe(), ALIASES)
+            return _INDEX
+    changed = getattr(idx.entities, "changed", None)
+    if changed is not None and time.monotonic() >= _next_store_check:
+        _next_store_check = time.monotonic() + _STORE_CHECK_SEC
+        if changed() and _INDEX_LOCK.acquire(blocking=False):
+            try:
+                if _INDEX is idx:
+                    _INDEX = EntityIndex(load_universe(), ALIASES)
+            finally:
+                _INDEX_LOCK.release()
+    return _INDEX
+
+
+def universe_version(index: Optional[EntityIndex] = None) -> str:
+    """Data version of the universe behind `index` ("seed" for SEED_ENTITIES)."""
+    idx = index if index is not None else get_index()
+    return getattr(idx.entities, "version", "seed")
+
+
+def _rank(idx: EntityIndex, qn: str, limit: int) -> List[Candidate]:
+    # Deduplicate by (exchange, ticker) with max score; entities are only
+    # materialized for the candidates returned
+    best: Dict[int, Tuple[float, int, str]] = {}
+    for i, score, reason in idx.search(qn, limit):
+        key = idx._dedupe[i]
+        if key not in best or score > best[key][0]:
+            best[key] = (score, i, reason)
+
+    # Sort by score desc, then stable tiebreaker (exchange, ticker)
+    order = idx._order
+    out = sorted(best.items(), key=lambda kv: (-kv[1][0], order[kv[0]]))
+    return [Candidate(idx.entities[i], score, reason) for _, (score, i, reason) in out[:limit]]
+
+
+def resolve(name: str, limit: int = 5, index: Optional[EntityIndex] = None) -> List[Candidate]:
+    """Resolve a free-text name to ranked candidates from the entity universe.
 
     Ranking heuristic:
     - Exact ticker match (case-insensitive) => score 100
@@ -70,51 +546,48 @@ def resolve(name: str, limit: int = 5) -> List[Candidate]:
     - Fuzzy name (normalized) via Levenshtein => score 90 - distance
     - Otherwise small bonus for substring containment
     Deterministic tie-break by (exchange, ticker).
+
+    Candidates come from an `EntityIndex` (default: `get_index()`), so only a
+    handful of names are scored per query regardless of universe size.
     """
     q = name.strip()
     if not q:
         return []
-    qn = _norm(q)
-
-    ranked: List[Candidate] = []
-
-    # 1) Exact ticker match
-    for e in SEED_ENTITIES:
-        if e.ticker.lower() == qn:
-            ranked.append(Candidate(e, 100.0, "exact_ticker"))
-
-    # 2) Alias / exact name match
-    if qn in (_norm(k) for k in ALIASES.keys()):
-        target = ALIASES[[k for k in ALIASES.keys() if _norm(k) == qn][0]]
-        for e in SEED_ENTITIES:
-            if e.name == target:
-                ranked.append(Candidate(e, 95.0, "alias"))
-    for e in SEED_ENTITIES:
-        if _norm(e.name) == qn:
-            ranked.append(Candidate(e, 95.0, "exact_name"))
-
-    # 3) Fuzzy name
-    for e in SEED_ENTITIES:
-        dist = _lev(_norm(e.name), qn)
-        score = 90.0 - dist
-        if score >= 80:  # allow small typos
-            ranked.append(Candidate(e, score, f"lev:{dist}"))
-
-    # 4) Substring bonus
-    for e in SEED_ENTITIES:
-        if qn and _norm(e.ticker) in qn:
-            ranked.append(Candidate(e, 82.0, "ticker_substr"))
-        if qn in _norm(e.name):
-            ranked.append(Candidate(e, 81.0, "name_substr"))
-
-    # Deduplicate by entity with max score
-    best: dict[Tuple[str, str], Candidate] = {}
-    for c in ranked:
-        key = (c.entity.exchange, c.entity.ticker)
-        if key not in best or c.score > best[key].score:
-            best[key] = c
-
-    # Sort by score desc, then stable tiebreaker
-    out = sorted(best.values(), key=lambda c: (-c.score, c.entity.exchange, c.entity.ticker))
-    return out[:limit]
+    return _rank(index if index is not None else get_index(), _norm(q), limit)
+
+
+def resolve_many(
+    names: Iterable[str], limit: int = 5, index: Optional[EntityIndex] = None
+) -> List[List[Candidate]]:
+    """Resolve a batch of names; results are returned in input order.
+
+    Names are normalized once and queries that normalize to the same string
+    (e.g. "Apple", "APPLE ") are ranked once and share the result list.
+    """
+    idx = index if index is not None else get_index()
+    done: Dict[str, List[Candidate]] = {}
+    out: List[List[Candidate]] = []
+    for name in names:
+        q = name.strip()
+        if not q:
+            out.append([])
+            continue
+        qn = _norm(q)
+        if qn not in done:
+            done[qn] = _rank(idx, qn, limit)
+        out.append(list(done[qn]))
+    return out
+
 
+def candidate_to_dict(c: Candidate) -> Dict[str, Any]:
+    """JSON-friendly view of a candidate (CLI and API response shape)."""
+    return {
+        "name": c.entity.name,
+        "ticker": c.entity.ticker,
+        "exchange": c.entity.exchange,
+        "country": c.entity.country,
+        "cik": c.entity.cik,
+        "currency": c.entity.currency,
+        "score": round(c.score, 2),
+        "reason": c.reason,
+    }
@@ -0,0 +1,234 @@
+"""Compact on-disk entity store (Phase 1.1 `entity_store`).
+
+The nightly refresh compiles the entity universe into one read-only file that
+`services.resolver.core` memory-maps on first use. Worker processes share the
+page-cached copy and only materialize `Entity` objects for the rows they touch.
+The resolver's lookup tables are compiled into the same file, so opening an
+index over a store (or over a swapped-in store) does not rebuild anything.
+
+Layout (little-endian):
+- header: magic, format version, row count, column count, 16-byte data version,
+  index tables position and length
+- per column: offsets table position, blob position, blob length
+- per column: (count + 1) uint32 offsets into a UTF-8 string blob
+- index tables (`core.compile_index`, layout in `postings`), 8-byte aligned
+
+Offsets are read in place with `memoryview.cast`, so hosts must be little-endian.
+
+Optional fields are stored as empty strings and read back as None.
+
+Build from the command line:
+    python -m services.resolver.entity_store build entities.jsonl entities.bin
+"""
+
+from __future__ import annotations
+import csv
+import hashlib
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .core import Entity, compile_index
+from .postings import unpack_bundle
+
+MAGIC = b"FRAENT\x00\x01"
+FORMAT_VERSION = 4
+COLUMNS = ("name", "ticker", "exchange", "country", "cik", "currency", "fiscal_year_end")
+_OPTIONAL = {"cik", "currency", "fiscal_year_end"}
+_HEADER = struct.Struct("<8sIII16sQQ")
+_COLUMN = struct.Struct("<QQQ")
+
+
+def build_store(entities: Iterable[Entity], path: str | Path) -> str:
+    """Compile `entities` into a store file at `path`; returns the data version.
+
+    The file is written next to `path` and moved into place with `os.replace`,
+    so readers see either the old or the new file, never a partial one.
+    Stores that already mapped the old file keep reading it; open a new
+    `EntityStore` to pick up the swapped file (see `changed()`).
+    """
+    path = Path(path)
+    entities = list(entities)
+    blobs: Dict[str, bytearray] = {c: bytearray() for c in COLUMNS}
+    offsets: Dict[str, array] = {c: array("I", [0]) for c in COLUMNS}
+    count = 0
+    for e in entities:
+        for c in COLUMNS:
+            v = getattr(e, c)
+            blobs[c] += (v or "").encode("utf-8")
+            offsets[c].append(len(blobs[c]))
+        count += 1
+
+    digest = hashlib.sha256()
+    for c in COLUMNS:
+        digest.update(offsets[c].tobytes())
+        digest.update(blobs[c])
+    version = digest.digest()[:16]
+
+    pos = _HEADER.size + _COLUMN.size * len(COLUMNS)
+    table = []
+    for c in COLUMNS:
+        off_pos = pos
+        pos += len(offsets[c]) * offsets[c].itemsize
+        table.append((off_pos, pos, len(blobs[c])))
+        pos += len(blobs[c])
+    pad = -pos % 8
+    index = compile_index(entities)
+    index_pos = pos + pad
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", dir=path.parent)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, count, len(COLUMNS), version, index_pos, len(index)))
+            for entry in table:
+                f.write(_COLUMN.pack(*entry))
+            for c in COLUMNS:
+                f.write(offsets[c].tobytes())
+                f.write(blobs[c])
+            f.write(bytes(pad))
+            f.write(index)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return version.hex()
+
+
+class _Mapping:
+    # One mapped generation of the store file
+    def __init__(self, path: Path):
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, fmt, self.count, ncols, version, index_pos, index_len = _HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or fmt != FORMAT_VERSION or ncols != len(COLUMNS):
+            self.mm.close()
+            raise ValueError(f"{path} is not an entity store (format {FORMAT_VERSION}); rebuild it")
+        self.version = version.hex()
+        view = memoryview(self.mm)
+        self.index = view[index_pos:index_pos + index_len]
+        self.offsets: Dict[str, memoryview] = {}
+        self.blobs: Dict[str, memoryview] = {}
+        for k, c in enumerate(COLUMNS):
+            off_pos, blob_pos, blob_len = _COLUMN.unpack_from(self.mm, _HEADER.size + k * _COLUMN.size)
+            self.offsets[c] = view[off_pos:off_pos + 4 * (self.count + 1)].cast("I")
+            self.blobs[c] = view[blob_pos:blob_pos + blob_len]
+
+    def value(self, column: str, i: int) -> str:
+        off = self.offsets[column]
+        return str(self.blobs[column][off[i]:off[i + 1]], "utf-8")
+
+
+class EntityStore:
+    """Read-only, lazily memory-mapped view of a store file.
+
+    Behaves as a sequence of `Entity` (len, indexing, iteration); rows are
+    decoded on access. `column()` streams one field without building entities.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self._m: Optional[_Mapping] = None
+        self._lock = threading.Lock()
+
+    def _mapping(self) -> _Mapping:
+        m = self._m
+        if m is None:
+            with self._lock:
+                if self._m is None:
+                    self._m = _Mapping(self.path)
+                m = self._m
+        return m
+
+    @property
+    def version(self) -> str:
+        return self._mapping().version
+
+    def __len__(self) -> int:
+        return self._mapping().count
+
+    def __getitem__(self, i: int) -> Entity:
+        m = self._mapping()
+        if i < 0:
+            i += m.count
+        if not 0 <= i < m.count:
+            raise IndexError("entity index out of range")
+        vals = {c: m.value(c, i) for c in COLUMNS}
+        for c in _OPTIONAL:
+            vals[c] = vals[c] or None
+        return Entity(**vals)
+
+    def __iter__(self) -> Iterator[Entity]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def column(self, name: str) -> Iterator[str]:
+        m = self._mapping()
+        for i in range(m.count):
+            yield m.value(name, i)
+
+    def index_tables(self) -> Dict[str, memoryview]:
+        """The precompiled `EntityIndex` tables, as views into the mapped file."""
+        return unpack_bundle(self._mapping().index)
+
+    def changed(self) -> bool:
+        """True when the file on disk is no longer the mapped generation."""
+        if self._m is None:
+            return False
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return False
+        return (st.st_ino, st.st_mtime_ns, st.st_size) != self._m.stat_key
+
+
+def _entity_from_record(rec: Dict[str, Any]) -> Entity:
+    vals: Dict[str, Optional[str]] = {}
+    for c in COLUMNS:
+        v = rec.get(c)
+        v = "" if v is None else str(v).strip()
+        vals[c] = (v or None) if c in _OPTIONAL else v
+    cik = vals["cik"]
+    if cik and cik.isdigit():
+        vals["cik"] = cik.zfill(10)
+    return Entity(**vals)
+
+
+def load_records(path: str | Path) -> List[Entity]:
+    """Read entities from JSONL, CSV (Entity field names as columns) or the
+    SEC `company_tickers_exchange.json` shape ({"fields": [...], "data": [...]})."""
+    path = Path(path)
+    text = path.read_text()
+    if path.suffix == ".csv":
+        return [_entity_from_record(r) for r in csv.DictReader(text.splitlines())]
+    if path.suffix == ".json":
+        data = json.loads(text)
+        fields = [("name" if f == "title" else f) for f in data.get("fields", [])]
+        return [_entity_from_record({"country": "US", **dict(zip(fields, row))}) for row in data.get("data", [])]
+    return [_entity_from_record(json.loads(line)) for line in text.splitlines() if line.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    args = sys.argv[1:] if argv is None else argv
+    if len(args) != 3 or args[0] != "build":
+        print("Usage: python -m services.resolver.entity_store build <source.jsonl|csv|json> <store.bin>")
+        sys.exit(2)
+    ents = load_records(args[1])
+    version = build_store(ents, args[2])
+    print(json.dumps({"entities": len(ents), "path": args[2], "version": version}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""Flat lookup tables that `EntityIndex` queries in place.
+
+The `pack_*` functions serialize the index's hash maps, inverted indexes and
+length buckets into plain byte layouts; the views below read them straight
+from a buffer (a mapped entity store file, or bytes built in memory) without
+materializing Python containers, so opening an index over a mapped store is
+O(1) and every worker process shares the same page-cached tables.
+
+Layouts (little-endian, uint32 unless noted):
+- postings: key count n, (n + 1) key offsets, (n + 1) id offsets, ids, then
+  the UTF-8 key blob. Keys are sorted by their UTF-8 bytes (the same order as
+  `sorted()` on str), so a key's position is a stable id and lookups bisect.
+- blobs: the postings layout with a byte string per key in place of the
+  ids, and byte offsets in place of id offsets.
+- buckets: slot count n, (n + 1) id offsets, ids; slot k holds the ids for
+  the small non-negative int key k (e.g. a name length).
+- bundle: table count, then per table a 16-byte name, offset and length
+  (uint64), then the tables, each starting on an 8-byte boundary.
+"""
+
+from __future__ import annotations
+import struct
+from array import array
+from typing import Dict, Iterable, Sequence, Union
+
+_COUNT = struct.Struct("<I")
+_ENTRY = struct.Struct("<16sQQ")
+_ALIGN = 8
+
+Ids = Union[memoryview, Sequence[int]]
+
+
+def pack_postings(table: Dict[str, Iterable[int]]) -> bytes:
+    keys = sorted(table)
+    key_off = array("I", [0])
+    id_off = array("I", [0])
+    ids = array("I")
+    blob = bytearray()
+    for k in keys:
+        blob += k.encode("utf-8")
+        key_off.append(len(blob))
+        ids.extend(table[k])
+        id_off.append(len(ids))
+    return _COUNT.pack(len(keys)) + key_off.tobytes() + id_off.tobytes() + ids.tobytes() + bytes(blob)
+
+
+def pack_blobs(table: Dict[str, bytes]) -> bytes:
+    keys = sorted(table)
+    key_off = array("I", [0])
+    data_off = array("I", [0])
+    data = bytearray()
+    blob = bytearray()
+    for k in keys:
+        blob += k.encode("utf-8")
+        key_off.append(len(blob))
+        data += table[k]
+        data_off.append(len(data))
+    return _COUNT.pack(len(keys)) + key_off.tobytes() + data_off.tobytes() + bytes(data) + bytes(blob)
+
+
+def pack_buckets(table: Dict[int, Iterable[int]]) -> bytes:
+    slots = max(table, default=-1) + 1
+    off = array("I", [0])
+    ids = array("I")
+    for k in range(slots):
+        ids.extend(table.get(k, ()))
+        off.append(len(ids))
+    return _COUNT.pack(slots) + off.tobytes() + ids.tobytes()
+
+
+def pack_ints(values: Iterable[int]) -> bytes:
+    return array("I", values).tobytes()
+
+
+def pack_bundle(tables: Dict[str, bytes]) -> bytes:
+    out = bytearray(_COUNT.pack(len(tables)))
+    pos = _pad(_COUNT.size + _ENTRY.size * len(tables))
+    for name, data in tables.items():
+        out += _ENTRY.pack(name.encode("ascii"), pos, len(data))
+        pos = _pad(pos + len(data))
+    for data in tables.values():
+        out += bytes(_pad(len(out)) - len(out))
+        out += data
+    return bytes(out)
+
+
+def unpack_bundle(buf: memoryview) -> Dict[str, memoryview]:
+    (count,) = _COUNT.unpack_from(buf, 0)
+    out: Dict[str, memoryview] = {}
+    for k in range(count):
+        name, pos, length = _ENTRY.unpack_from(buf, _COUNT.size + k * _ENTRY.size)
+        out[name.rstrip(b"\x00").decode("ascii")] = buf[pos:pos + length]
+    return out
+
+
+def _pad(n: int) -> int:
+    return -(-n // _ALIGN) * _ALIGN
+
+
+class Postings:
+    """Sorted str keys, each with a list of ids (see `pack_postings`)."""
+
+    _ITEM = 4  # bytes per id
+
+    def __init__(self, buf: memoryview):
+        (n,) = _COUNT.unpack_from(buf, 0)
+        pos = _COUNT.size
+        self._key_off = buf[pos:pos + 4 * (n + 1)].cast("I")
+        pos += 4 * (n + 1)
+        self._id_off = buf[pos:pos + 4 * (n + 1)].cast("I")
+        pos += 4 * (n + 1)
+        self._ids = self._items(buf[pos:pos + self._ITEM * self._id_off[n]])
+        pos += self._ITEM * self._id_off[n]
+        self._blob = buf[pos:pos + self._key_off[n]]
+        self._n = n
+
+    def _items(self, raw: memoryview) -> memoryview:
+        return raw.cast("I")
+
+    def __len__(self) -> int:
+        return self._n
+
+    def key(self, i: int) -> str:
+        return str(self._blob[self._key_off[i]:self._key_off[i + 1]], "utf-8")
+
+    def ids(self, i: int) -> memoryview:
+        return self._ids[self._id_off[i]:self._id_off[i + 1]]
+
+    def find(self, key: str) -> int:
+        """Position of `key`, or -1."""
+        raw = key.encode("utf-8")
+        off, blob = self._key_off, self._blob
+        lo, hi = 0, self._n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if bytes(blob[off[mid]:off[mid + 1]]) < raw:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < self._n and blob[off[lo]:off[lo + 1]] == raw:
+            return lo
+        return -1
+
+    def get(self, key: str, default: Ids = ()) -> Ids:
+        i = self.find(key)
+        return default if i < 0 else self.ids(i)
+
+
+class Blobs(Postings):
+    """Sorted str keys, each with a byte string (see `pack_blobs`)."""
+
+    _ITEM = 1
+
+    def _items(self, raw: memoryview) -> memoryview:
+        return raw
+
+
+class Buckets:
+    """Ids grouped by a small int key (see `pack_buckets`)."""
+
+    def __init__(self, buf: memoryview):
+        (n,) = _COUNT.unpack_from(buf, 0)
+        pos = _COUNT.size
+        self._off = buf[pos:pos + 4 * (n + 1)].cast("I")
+        pos += 4 * (n + 1)
+        self._ids = buf[pos:pos + 4 * self._off[n]].cast("I")
+        self._n = n
+
+    def get(self, k: int, default: Ids = ()) -> Ids:
+        if not 0 <= k < self._n:
+            return default
+        return self._ids[self._off[k]:self._off[k + 1]]
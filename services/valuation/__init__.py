@@ -1,5 +1,7 @@
 """Valuation (Phase 6): FCFF, WACC, terminal value, and discounting utilities.
 
 Pure functions with minimal inputs for deterministic results and easy testing.
+montecarlo.py samples scenario assumptions and summarises EV percentiles
+with the mergeable quantile sketch in sketch.py.
 """
 
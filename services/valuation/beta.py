@@ -0,0 +1,202 @@
+"""Levered beta from daily closes (OLS slope of stock vs benchmark returns).
+
+Everything is built from running sums (Σx, Σy, Σxy, Σx²), so a rolling
+window costs O(1) per step. `beta_many` computes benchmark returns and
+their sums once and reuses them across all tickers that share the
+benchmark's trading days.
+"""
+
+from __future__ import annotations
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional, Tuple
+
+from services.ingestion.prices import PriceSeries, PriceStore, to_day
+
+
+def _slope(n: int, sx: float, sy: float, sxy: float, sxx: float) -> Optional[float]:
+    den = n * sxx - sx * sx
+    if n < 2 or den <= 0:
+        return None
+    return (n * sxy - sx * sy) / den
+
+
+def aligned_returns(stock: PriceSeries, bench: PriceSeries) -> Tuple[array, array, array]:
+    """Simple returns between consecutive days both series traded.
+
+    Returns (days, benchmark returns, stock returns), each dated by the
+    later day of the pair.
+    """
+    days, x, y = array("i"), array("d"), array("d")
+    i = j = 0
+    prev: Optional[Tuple[float, float]] = None
+    sd, bd = stock.days, bench.days
+    while i < len(sd) and j < len(bd):
+        if sd[i] < bd[j]:
+            i += 1
+        elif bd[j] < sd[i]:
+            j += 1
+        else:
+            cur = (bench.close[j], stock.close[i])
+            if prev is not None and prev[0] and prev[1]:
+                days.append(sd[i])
+                x.append(cur[0] / prev[0] - 1.0)
+                y.append(cur[1] / prev[1] - 1.0)
+            prev = cur
+            i += 1
+            j += 1
+    return days, x, y
+
+
+def rolling_beta(stock: PriceSeries, bench: PriceSeries, window: int) -> Tuple[array, array]:
+    """Beta over every trailing `window` of aligned returns, O(n) overall.
+
+    Returns (days, betas) where each beta covers the window ending on that day;
+    NaN where the benchmark has no variance.
+    """
+    days, x, y = aligned_returns(stock, bench)
+    out_days, out = array("i"), array("d")
+    if window < 2 or len(x) < window:
+        return out_days, out
+    sx = sy = sxy = sxx = 0.0
+    for k in range(len(x)):
+        sx += x[k]
+        sy += y[k]
+        sxy += x[k] * y[k]
+        sxx += x[k] * x[k]
+        if k >= window:
+            o = k - window
+            sx -= x[o]
+            sy -= y[o]
+            sxy -= x[o] * y[o]
+            sxx -= x[o] * x[o]
+        if k >= window - 1:
+            b = _slope(window, sx, sy, sxy, sxx)
+            out_days.append(days[k])
+            out.append(float("nan") if b is None else b)
+    return out_days, out
+
+
+def beta_many(
+    stocks: Dict[str, PriceSeries],
+    bench: PriceSeries,
+    window: int = 252,
+    as_of: Optional[str] = None,
+    min_obs: Optional[int] = None,
+) -> Dict[str, Optional[float]]:
+    """Beta of each series over the benchmark's last `window` returns up to `as_of`.
+
+    A stock missing a day of that grid loses the returns touching it; with
+    fewer than `min_obs` (default: `window`) returns left its beta is None.
+    """
+    min_obs = window if min_obs is None else min_obs
+    end = bisect_right(bench.days, to_day(as_of)) if as_of else len(bench.days)
+    start = max(0, end - window - 1)
+    grid = bench.days[start:end]
+    bpx = bench.close[start:end]
+    x = array("d", (bpx[k] / bpx[k - 1] - 1.0 if bpx[k - 1] else float("nan") for k in range(1, len(grid))))
+    full = [xk for xk in x if xk == xk]
+    bsx, bsxx = sum(full), sum(xk * xk for xk in full)
+
+    out: Dict[str, Optional[float]] = {}
+    for ticker, s in stocks.items():
+        # stock closes on the grid days (None where it did not trade)
+        px = []
+        p = bisect_left(s.days, grid[0]) if grid else 0
+        for d in grid:
+            while p < len(s.days) and s.days[p] < d:
+                p += 1
+            px.append(s.close[p] if p < len(s.days) and s.days[p] == d else None)
+        if all(v for v in px) and len(full) == len(x):
+            n, sx, sxx = len(x), bsx, bsxx
+            sy = sxy = 0.0
+            for k in range(n):
+                yk = px[k + 1] / px[k] - 1.0
+                sy += yk
+                sxy += x[k] * yk
+        else:
+            n = 0
+            sx = sy = sxy = sxx = 0.0
+            for k in range(len(x)):
+                a, b = px[k], px[k + 1]
+                if not a or not b or x[k] != x[k]:
+                    continue
+                yk = b / a - 1.0
+                n += 1
+                sx += x[k]
+                sy += yk
+                sxy += x[k] * yk
+                sxx += x[k] * x[k]
+        out[ticker] = _slope(n, sx, sy, sxy, sxx) if n >= max(2, min_obs) else None
+    return out
+
+
+class BetaCache:
+    """Thread-safe LRU of betas keyed by (ticker, benchmark, window, as-of day, ticker rows).
+
+    The ticker's stored row count is part of the key, so appending or
+    backfilling its prices (e.g. after a failed ingest cached a None)
+    computes a fresh beta instead of serving the old one.
+    """
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Tuple[str, str, int, str, int], Optional[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get_many(
+        self,
+        tickers: Iterable[str],
+        store: PriceStore,
+        benchmark: str,
+        window: int = 252,
+        as_of: Optional[str] = None,
+    ) -> Dict[str, Optional[float]]:
+        """Betas for `tickers` from series in `store`; misses are computed in one `beta_many` pass.
+
+        The cache key comes from a tail read of the benchmark file; the
+        series themselves are only loaded when some ticker misses.
+        """
+        # key on the last benchmark day actually used, so as_of on a weekend hits the Friday entry
+        day = store.last_date(benchmark, as_of)
+        if day is None:
+            return {t: None for t in tickers}
+        keys = {t: (t, benchmark, window, day, store.rows(t)) for t in tickers}
+        out: Dict[str, Optional[float]] = {}
+        missing = []
+        with self._lock:
+            for t, key in keys.items():
+                if key in self._data:
+                    self._data.move_to_end(key)
+                    out[t] = self._data[key]
+                    self._stats["hits"] += 1
+                else:
+                    missing.append(t)
+                    self._stats["misses"] += 1
+        if missing:
+            fresh = beta_many({t: store.load(t) for t in missing}, store.load(benchmark), window, day)
+            with self._lock:
+                for t, b in fresh.items():
+                    self._data[keys[t]] = b
+                    self._data.move_to_end(keys[t])
+                while len(self._data) > self.maxsize:
+                    self._data.popitem(last=False)
+            out.update(fresh)
+        return out
+
+    def get(self, ticker: str, store: PriceStore, benchmark: str, window: int = 252, as_of: Optional[str] = None) -> Optional[float]:
+        return self.get_many([ticker], store, benchmark, window, as_of)[ticker]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {**self._stats, "size": len(self._data)}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+BETA_CACHE = BetaCache()
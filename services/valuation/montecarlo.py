@@ -0,0 +1,213 @@
+"""Monte Carlo valuation: sample scenario assumptions, project, and value each path.
+
+Paths are generated in fixed-size chunks. Each chunk draws its inputs from
+its own RNG (seeded from the run seed and the chunk index), projects all
+of its scenarios together with `project_grid`, prices every path with the
+same FCFF / discounting / Gordon terminal steps the run pipeline uses, and
+reduces the enterprise values into a `QuantileSketch`. Only the sketches
+and a few running totals leave a chunk, so memory is bounded by the chunk
+size no matter how many paths are requested, and chunks can be spread
+over worker processes without changing the result.
+
+Draws that fail `validate_scenario`, or where WACC <= terminal growth,
+are dropped and counted in `rejected`.
+"""
+
+from __future__ import annotations
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, fields, replace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.forecasting.assumptions import Scenario, validate_scenario
+from services.forecasting.engine import LINES, project_grid
+from services.valuation.discount import discount_factors
+from services.valuation.fcff import FCFFInputs, fcff
+from services.valuation.sketch import QuantileSketch
+from services.valuation.terminal import TerminalInputs, gordon_pv
+
+
+@dataclass(frozen=True)
+class Fixed:
+    value: float
+
+    def draw(self, rnd: random.Random, n: int) -> List[float]:
+        return [float(self.value)] * n
+
+
+@dataclass(frozen=True)
+class Uniform:
+    lo: float
+    hi: float
+
+    def draw(self, rnd: random.Random, n: int) -> List[float]:
+        return [rnd.uniform(self.lo, self.hi) for _ in range(n)]
+
+
+@dataclass(frozen=True)
+class Normal:
+    """Normal draws clipped to [lo, hi]."""
+
+    mu: float
+    sigma: float
+    lo: float = -math.inf
+    hi: float = math.inf
+
+    def draw(self, rnd: random.Random, n: int) -> List[float]:
+        lo, hi = self.lo, self.hi
+        return [min(hi, max(lo, rnd.gauss(self.mu, self.sigma))) for _ in range(n)]
+
+
+@dataclass(frozen=True)
+class Triangular:
+    lo: float
+    mode: float
+    hi: float
+
+    def draw(self, rnd: random.Random, n: int) -> List[float]:
+        return [rnd.triangular(self.lo, self.hi, self.mode) for _ in range(n)]
+
+
+DISTRIBUTIONS = {"fixed": Fixed, "uniform": Uniform, "normal": Normal, "triangular": Triangular}
+
+
+def parse_dist(spec) -> object:
+    """Build a distribution from a number or a dict like {"dist": "normal", "mu": 0.02, "sigma": 0.01}."""
+    if isinstance(spec, (int, float)):
+        return Fixed(float(spec))
+    params = dict(spec)
+    kind = params.pop("dist", None)
+    if kind not in DISTRIBUTIONS:
+        raise ValueError(f"unknown distribution: {kind!r}")
+    return DISTRIBUTIONS[kind](**params)
+
+
+@dataclass(frozen=True)
+class MonteCarloSpec:
+    """What to sample. Scenario fields not listed in `dists` stay at `base`."""
+
+    base: Scenario
+    dists: Dict[str, object] = field(default_factory=dict)
+    wacc: object = Fixed(0.08)
+    terminal_growth: object = Fixed(0.03)
+
+    def __post_init__(self):
+        names = {f.name for f in fields(Scenario)}
+        unknown = set(self.dists) - names
+        if unknown:
+            raise ValueError(f"unknown scenario fields: {sorted(unknown)}")
+
+
+@dataclass
+class MonteCarloResult:
+    paths: int
+    rejected: int
+    mean: Optional[float]
+    sketch: QuantileSketch
+
+    def percentiles(self, ps: Sequence[float] = (5, 25, 50, 75, 95)) -> Dict[float, Optional[float]]:
+        """EV at each percentile (0..100)."""
+        return dict(zip(ps, self.sketch.quantiles([p / 100.0 for p in ps])))
+
+
+def path_ev(fcfs: Sequence[float], w: float, g: float, dfs: Optional[Sequence[float]] = None) -> float:
+    """EV of one path: discounted FCFF plus the Gordon terminal value at the last period."""
+    if dfs is None:
+        dfs = discount_factors(w, len(fcfs))
+    tv = gordon_pv(TerminalInputs(last_fcf=fcfs[-1] * (1 + g), wacc=w, g=g))
+    return sum(f * df for f, df in zip(fcfs, dfs)) + tv * dfs[-1]
+
+
+def _chunk_seed(seed: object, index: int) -> str:
+    return f"{seed}:{index}"
+
+
+def _run_chunk(args: Tuple[Dict[str, float], MonteCarloSpec, int, object, int, int, int]) -> Tuple[QuantileSketch, int, int, float]:
+    """Simulate one chunk; returns (sketch, accepted, rejected, sum of EVs)."""
+    last_q, spec, quarters, seed, index, n, k = args
+    rnd = random.Random(_chunk_seed(seed, index))
+    drawn = {name: spec.dists[name].draw(rnd, n) for name in sorted(spec.dists)}
+    waccs = spec.wacc.draw(rnd, n)
+    growths = spec.terminal_growth.draw(rnd, n)
+
+    scenarios: List[Scenario] = []
+    keep: List[int] = []
+    for i in range(n):
+        sc = replace(spec.base, **{name: vals[i] for name, vals in drawn.items()})
+        try:
+            validate_scenario(sc)
+        except ValueError:
+            continue
+        if waccs[i] <= growths[i]:
+            continue
+        scenarios.append(sc)
+        keep.append(i)
+
+    sketch = QuantileSketch(k=k, seed=_chunk_seed(seed, index) + ":sketch")
+    total = 0.0
+    if scenarios:
+        grid = project_grid(last_q, scenarios, quarters=quarters)
+        width = len(LINES)
+        ebit_at, da_at, capex_at, nwc_at = (LINES.index(x) for x in ("ebit", "da", "capex", "delta_nwc"))
+        values = grid.values
+        evs = []
+        dfs_cache: Dict[float, List[float]] = {}
+        for s, (i, sc) in enumerate(zip(keep, scenarios)):
+            base = s * quarters * width
+            fcfs = [
+                fcff(FCFFInputs(
+                    ebit=values[o + ebit_at], tax_rate=sc.tax_rate, da=values[o + da_at],
+                    capex=values[o + capex_at], delta_nwc=values[o + nwc_at],
+                ))
+                for o in range(base, base + quarters * width, width)
+            ]
+            w, g = waccs[i], growths[i]
+            dfs = dfs_cache.get(w)
+            if dfs is None:
+                dfs = dfs_cache[w] = discount_factors(w, quarters)
+            evs.append(path_ev(fcfs, w, g, dfs))
+        sketch.update_many(evs)
+        total = math.fsum(evs)
+    return sketch, len(scenarios), n - len(scenarios), total
+
+
+def simulate(
+    last_q: Dict[str, float],
+    spec: MonteCarloSpec,
+    paths: int = 100_000,
+    seed: object = 0,
+    chunk_size: int = 10_000,
+    processes: int = 1,
+    quarters: int = 12,
+    k: int = 200,
+) -> MonteCarloResult:
+    """Run `paths` valuations and summarise their EVs.
+
+    The result depends only on (inputs, paths, seed, chunk_size, k): chunks
+    are merged in index order whatever `processes` is.
+    """
+    if paths <= 0 or chunk_size <= 0:
+        raise ValueError("paths and chunk_size must be positive")
+    tasks = [
+        (last_q, spec, quarters, seed, index, min(chunk_size, paths - start), k)
+        for index, start in enumerate(range(0, paths, chunk_size))
+    ]
+    merged = QuantileSketch(k=k, seed=f"{seed}:merge")
+    accepted = rejected = 0
+    sums: List[float] = []
+    if processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            results = pool.map(_run_chunk, tasks)
+            for sketch, ok, bad, total in results:
+                merged.merge(sketch)
+                accepted, rejected = accepted + ok, rejected + bad
+                sums.append(total)
+    else:
+        for task in tasks:
+            sketch, ok, bad, total = _run_chunk(task)
+            merged.merge(sketch)
+            accepted, rejected = accepted + ok, rejected + bad
+            sums.append(total)
+    mean = math.fsum(sums) / accepted if accepted else None
+    return MonteCarloResult(paths=accepted, rejected=rejected, mean=mean, sketch=merged)
@@ -0,0 +1,136 @@
+"""Mergeable streaming quantile sketch (KLL compactors).
+
+Keeps a stack of buffers where an item at level h stands for 2**h
+original values. When a level fills up it is sorted and every other item
+is promoted one level, so memory stays around O(k log n) while rank error
+stays small (about 1% at the default k=200). Two sketches merge by
+concatenating levels and compacting, which lets Monte Carlo chunks be
+summarised independently (or in other processes) and combined afterwards.
+
+Compaction picks odd or even items with the sketch's own seeded RNG, so
+the same inputs fed in the same order give the same quantiles.
+"""
+
+from __future__ import annotations
+import math
+import random
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+class QuantileSketch:
+    def __init__(self, k: int = 200, seed: object = None):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._levels: List[List[float]] = [[]]
+        self._size = 0
+        self._rnd = random.Random(seed)
+        self._limit = self._max_size()
+
+    def _capacity(self, h: int) -> int:
+        depth = len(self._levels) - h - 1
+        return int(math.ceil(self.k * (2.0 / 3.0) ** depth)) + 1
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(h) for h in range(len(self._levels)))
+
+    def _compress(self) -> None:
+        while self._size >= self._limit:
+            for h, level in enumerate(self._levels):
+                if len(level) >= self._capacity(h):
+                    if h + 1 == len(self._levels):
+                        self._levels.append([])
+                        self._limit = self._max_size()
+                    level.sort()
+                    keep = level.pop() if len(level) % 2 else None
+                    offset = 1 if self._rnd.random() < 0.5 else 0
+                    self._levels[h + 1].extend(level[offset::2])
+                    self._size -= len(level) - len(level) // 2
+                    level.clear()
+                    if keep is not None:
+                        level.append(keep)
+                    break
+
+    def update(self, value: float) -> None:
+        self.update_many((value,))
+
+    def update_many(self, values: Iterable[float]) -> None:
+        level0 = self._levels[0]
+        for v in values:
+            v = float(v)
+            if v != v:
+                continue  # NaN carries no rank
+            level0.append(v)
+            self.count += 1
+            self._size += 1
+            if v < self.min:
+                self.min = v
+            if v > self.max:
+                self.max = v
+            if self._size >= self._limit:
+                self._compress()
+                level0 = self._levels[0]
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        """Fold `other` into this sketch (in place) and return self."""
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        self._limit = self._max_size()
+        for h, level in enumerate(other._levels):
+            self._levels[h].extend(level)
+        self._size += other._size
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self) -> Tuple[List[Tuple[float, int]], int]:
+        items = [(v, 1 << h) for h, level in enumerate(self._levels) for v in level]
+        items.sort()
+        return items, sum(w for _, w in items)
+
+    def quantile(self, q: float) -> Optional[float]:
+        return self.quantiles((q,))[0]
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Approximate q-quantiles (0..1); exact while nothing has been compacted.
+
+        q=0 and q=1 return the tracked minimum and maximum.
+        """
+        if not self.count:
+            return [None for _ in qs]
+        items, total = self._weighted()
+        out: List[Optional[float]] = []
+        for q in qs:
+            if not 0.0 <= q <= 1.0:
+                raise ValueError("quantile must be within [0, 1]")
+            if q == 0.0:
+                out.append(self.min)
+                continue
+            if q == 1.0:
+                out.append(self.max)
+                continue
+            target = q * total
+            seen = 0
+            for v, w in items:
+                seen += w
+                if seen >= target:
+                    out.append(v)
+                    break
+            else:
+                out.append(self.max)
+        return out
+
+    def rank(self, value: float) -> float:
+        """Approximate fraction of values <= `value`."""
+        items, total = self._weighted()
+        if not total:
+            return 0.0
+        return sum(w for v, w in items if v <= value) / total
+
+    def __len__(self) -> int:
+        return self.count
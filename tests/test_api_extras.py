@@ -46,6 +46,32 @@ class TestAPIExtras(unittest.TestCase):
         rv2 = self.client.get('/runs/not-exist', headers={'X-API-Key': 'secret'})
         self.assertEqual(rv2.status_code, 404)
 
+    def test_resolve_batch(self):
+        rv = self.client.post('/resolve', json={'company_names': ['Apple', 'msft', '']})
+        self.assertEqual(rv.status_code, 200)
+        results = rv.get_json()['results']
+        self.assertEqual([r['query'] for r in results], ['Apple', 'msft', ''])
+        self.assertEqual(results[0]['candidates'][0]['ticker'], 'AAPL')
+        self.assertEqual(results[1]['candidates'][0]['reason'], 'exact_ticker')
+        self.assertEqual(results[2]['candidates'], [])
+        # single-name form from the execution plan contract
+        rv1 = self.client.post('/resolve', json={'company_name': 'Google', 'limit': 1})
+        self.assertEqual(len(rv1.get_json()['results'][0]['candidates']), 1)
+        rv2 = self.client.post('/resolve', json={})
+        self.assertEqual(rv2.status_code, 400)
+        for bad in (0, -1, 10**9, 'many'):
+            rv3 = self.client.post('/resolve', json={'company_name': 'Google', 'limit': bad})
+            self.assertEqual(rv3.status_code, 400, bad)
+
+    def test_metrics(self):
+        rv = self.client.get('/metrics')
+        self.assertEqual(rv.status_code, 200)
+        stats = rv.get_json()['resolver_cache']
+        for k in ('hits', 'misses', 'evictions', 'hit_rate'):
+            self.assertIn(k, stats)
+        for k in ('loads', 'reloads', 'errors'):
+            self.assertIn(k, rv.get_json()['mapper_registry'])
+
 if __name__ == '__main__':
     unittest.main()
 
@@ -0,0 +1,150 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from services.ingestion import sources
+from services.ingestion.archive import PayloadArchive, referenced_digests
+from services.ingestion.fetcher import FetchResult
+
+
+class _Fetcher:
+    def __init__(self, body, delay=0.0):
+        self.body = body
+        self.delay = delay
+        self.calls = 0
+
+    def get(self, url, source=None, max_age=None):
+        self.calls += 1
+        time.sleep(self.delay)
+        return FetchResult(url, 200, self.body)
+
+
+_FACTS = json.dumps({"facts": {"us-gaap": {"Revenues": {"units": {"USD": [
+    {"end": "2023-12-31", "val": 100.0, "fp": "FY", "filed": "2024-02-01"},
+]}}}}}).encode()
+
+
+class TestPayloadArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name)
+        self.archive = PayloadArchive(self.root / "archive")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_dedupes_and_streams_back(self):
+        data = b'{"facts": {}}' * 10000
+        d1 = self.archive.put(data)
+        d2 = self.archive.put(data)
+        self.assertEqual(d1, d2)
+        self.assertEqual(list(self.archive.digests()), [d1])
+        blob = self.archive._path(d1)
+        self.assertLess(blob.stat().st_size, len(data) // 10)
+        with self.archive.open(d1) as f:
+            self.assertEqual(f.read(13), b'{"facts": {}}')
+        self.assertEqual(self.archive.get(d1), data)
+        self.assertIn(d1, self.archive)
+        with self.assertRaises(KeyError):
+            self.archive.open("0" * 64)
+
+    def test_gc_keeps_referenced_and_recent(self):
+        keep = self.archive.put(b"keep")
+        drop = self.archive.put(b"drop")
+        fresh = self.archive.put(b"fresh")
+        old = time.time() - 7200
+        for d in (keep, drop):
+            os.utime(self.archive._path(d), (old, old))
+        runs = self.root / "runs"
+        (runs / "r_1").mkdir(parents=True)
+        (runs / "r_1" / "run.json").write_text(json.dumps({"payloads": [{"sha256": keep, "url": "u"}]}))
+        (runs / "r_2").mkdir()
+        (runs / "r_2" / "run.json").write_text("{not json")
+        self.assertEqual(referenced_digests(runs), {keep})
+        stats = self.archive.gc(referenced_digests(runs))
+        self.assertEqual((stats["removed"], stats["kept"]), (1, 2))
+        self.assertEqual(set(self.archive.digests()), {keep, fresh})
+
+    def test_dedupe_hit_survives_gc(self):
+        digest = self.archive.put(b"shared")
+        old = time.time() - 7200
+        os.utime(self.archive._path(digest), (old, old))
+        self.archive.put(b"shared")  # an in-flight run dedupes into the old blob
+        self.assertEqual(self.archive.gc(set())["removed"], 0)
+        self.assertEqual(self.archive.get(digest), b"shared")
+
+    def test_put_interleaved_with_gc(self):
+        digest = self.archive.put(b"shared")
+        path = self.archive._path(digest)
+        real_rename = os.rename
+        old = time.time() - 7200
+
+        def put_after_move(src, dst):
+            real_rename(src, dst)
+            self.archive.put(b"shared")  # lands after gc moved the blob aside
+
+        os.utime(path, (old, old))
+        with mock.patch("services.ingestion.archive.os.rename", side_effect=put_after_move):
+            stats = self.archive.gc(set())
+        self.assertEqual(stats["removed"], 1)  # the moved-aside copy went...
+        self.assertEqual(self.archive.get(digest), b"shared")  # ...but put() wrote it back
+
+        def touch_after_move(src, dst):
+            os.utime(src)  # put() claims the blob just before gc moves it
+            real_rename(src, dst)
+
+        os.utime(path, (old, old))
+        with mock.patch("services.ingestion.archive.os.rename", side_effect=touch_after_move):
+            stats = self.archive.gc(set())
+        self.assertEqual((stats["removed"], stats["kept"]), (0, 1))
+        self.assertEqual(self.archive.get(digest), b"shared")
+        self.assertEqual(list(self.root.glob("archive/objects/*/*.del")), [])
+
+    def test_runs_record_payloads_including_coalesced_waiters(self):
+        fetcher = _Fetcher(_FACTS, delay=0.1)
+        got = []
+        start = threading.Barrier(3)
+
+        def run():
+            start.wait()
+            with sources.recording_payloads() as refs:
+                sources.company_facts("320193", ["Revenues"], fetcher=fetcher)
+            got.append(refs)
+
+        with mock.patch("services.ingestion.sources.get_archive", return_value=self.archive):
+            threads = [threading.Thread(target=run) for _ in range(3)]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+            with sources.recording_payloads() as later:
+                sources.company_facts("320193", ["Revenues"], fetcher=fetcher)
+        self.assertEqual(fetcher.calls, 2)  # three coalesced runs, then one more
+        for refs in got + [later]:
+            self.assertEqual(len(refs), 1)
+            self.assertEqual(self.archive.get(refs[0]["sha256"]), _FACTS)
+            self.assertEqual(refs[0]["source"], "sec")
+        self.assertEqual(len(list(self.archive.digests())), 1)
+
+    def test_recording_reaches_ingest_stage_threads(self):
+        from services.ingestion.stage import IngestRequest, ingest
+
+        with mock.patch("services.ingestion.sources.get_archive", return_value=self.archive):
+            with sources.recording_payloads() as refs:
+                ingest(IngestRequest(cik="320193", tags=("Revenues",)), fetcher=_Fetcher(_FACTS))
+        self.assertEqual(sorted(r["url"].rsplit("/", 2)[-2] for r in refs), ["companyfacts", "submissions"])
+
+    def test_no_archive_no_refs(self):
+        with mock.patch("services.ingestion.sources.get_archive", return_value=None):
+            with sources.recording_payloads() as refs:
+                sources.company_facts("320193", ["Revenues"], fetcher=_Fetcher(_FACTS))
+        self.assertEqual(refs, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
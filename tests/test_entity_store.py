@@ -0,0 +1,107 @@
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+from pathlib import Path
+
+import services.resolver.core as core
+from services.resolver.core import SEED_ENTITIES, ALIASES, Entity, EntityIndex, resolve
+from services.resolver.entity_store import EntityStore, build_store, load_records
+
+
+class TestEntityStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "entities.bin"
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip(self):
+        version = build_store(SEED_ENTITIES, self.path)
+        store = EntityStore(self.path)
+        self.assertEqual(len(store), len(SEED_ENTITIES))
+        self.assertEqual(list(store), list(SEED_ENTITIES))
+        self.assertEqual(store[-1].cik, None)
+        self.assertEqual(store.version, version)
+        self.assertEqual(list(store.column("ticker")), [e.ticker for e in SEED_ENTITIES])
+        with self.assertRaises(IndexError):
+            store[len(SEED_ENTITIES)]
+
+    def test_resolve_over_store(self):
+        build_store(SEED_ENTITIES, self.path)
+        idx = EntityIndex(EntityStore(self.path), ALIASES)
+        for q in ("Google", "Gooogle", "msft", "Infosys"):
+            self.assertEqual(resolve(q, index=idx), resolve(q))
+
+    def test_index_tables_read_in_place(self):
+        ents = [e for i, e in enumerate(SEED_ENTITIES * 3) if i != 5] + [Entity(name="Apple Inc.", ticker="APLE", exchange="NYSE", country="US")]
+        build_store(ents, self.path)
+        in_memory = EntityIndex(ents, ALIASES)
+        # opening an index over the store must not recompile its tables
+        with mock.patch.object(core, "compile_index", side_effect=AssertionError("recompiled")):
+            idx = EntityIndex(EntityStore(self.path), ALIASES)
+        for q in ("Google", "Gooogle", "msft", "apple", "aple", "Infosys", "a", "inc", "zzz"):
+            self.assertEqual(resolve(q, limit=10, index=idx), resolve(q, limit=10, index=in_memory))
+
+    def test_old_format_rejected(self):
+        build_store(SEED_ENTITIES, self.path)
+        raw = bytearray(self.path.read_bytes())
+        raw[8:12] = (1).to_bytes(4, "little")
+        self.path.write_bytes(bytes(raw))
+        with self.assertRaises(ValueError):
+            len(EntityStore(self.path))
+
+    def test_atomic_swap(self):
+        v1 = build_store(SEED_ENTITIES[:2], self.path)
+        store = EntityStore(self.path)
+        self.assertEqual(len(store), 2)
+        self.assertFalse(store.changed())
+        v2 = build_store(SEED_ENTITIES, self.path)
+        self.assertNotEqual(v1, v2)
+        self.assertTrue(store.changed())
+        # the open store keeps serving the generation it mapped
+        self.assertEqual(len(store), 2)
+        self.assertEqual(len(EntityStore(self.path)), len(SEED_ENTITIES))
+        self.assertEqual([p.name for p in Path(self.tmp.name).iterdir()], ["entities.bin"])
+
+    def test_load_records(self):
+        src = Path(self.tmp.name) / "src.jsonl"
+        src.write_text(json.dumps({"name": "Apple Inc.", "ticker": "AAPL", "exchange": "NASDAQ", "country": "US", "cik": 320193}) + "\n")
+        ents = load_records(src)
+        self.assertEqual(ents[0].cik, "0000320193")
+        self.assertIsNone(ents[0].currency)
+        sec = Path(self.tmp.name) / "company_tickers_exchange.json"
+        sec.write_text(json.dumps({"fields": ["cik", "name", "ticker", "exchange"], "data": [[789019, "MICROSOFT CORP", "MSFT", "Nasdaq"]]}))
+        self.assertEqual(load_records(sec)[0], Entity(name="MICROSOFT CORP", ticker="MSFT", exchange="Nasdaq", country="US", cik="0000789019"))
+
+
+class TestStoreBackedIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp.name) / "entities.bin"
+        self._saved = (core._INDEX, os.environ.get("ENTITY_STORE_PATH"))
+        os.environ["ENTITY_STORE_PATH"] = str(self.path)
+        core._INDEX = None
+
+    def tearDown(self):
+        core._INDEX, env = self._saved
+        if env is None:
+            os.environ.pop("ENTITY_STORE_PATH", None)
+        else:
+            os.environ["ENTITY_STORE_PATH"] = env
+        self.tmp.cleanup()
+
+    def test_reload_after_swap(self):
+        build_store(SEED_ENTITIES[:1], self.path)
+        self.assertEqual(resolve("msft")[0].entity.ticker, "AAPL")  # only Apple loaded
+        v1 = core.universe_version()
+        build_store(SEED_ENTITIES, self.path)
+        core._next_store_check = 0.0
+        self.assertEqual(resolve("msft")[0].entity.ticker, "MSFT")
+        self.assertNotEqual(core.universe_version(), v1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,6 +27,8 @@ class TestExports(unittest.TestCase):
         }]
         txt = write_dcf(rows)
         self.assertIn("period_end,ebit,tax_rate", txt.splitlines()[0])
+        recs = list(csv.DictReader(io.StringIO(write_dcf([{"period_end": f"T+{i}", "period_type": "A"} for i in range(1, 11)]))))
+        self.assertEqual([r["period_type"] for r in recs], ["A"] * 10)
 
     def test_metadata_csv(self):
         txt = write_metadata([{"run_id":"r1","company_key":"AAPL/NASDAQ","basis":"US-GAAP","currency":"USD","fiscal_year_end":"09-30","generated_at":"2025-01-01T00:00:00Z","mapper_version":"0.1","taxonomy_version":"2024.0","code_sha":"abc123"}])
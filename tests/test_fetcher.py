@@ -0,0 +1,149 @@
+import gzip
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from services.ingestion.fetcher import FetchError, Fetcher, SourcePolicy, TokenBucket
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    hits = {}
+    ports = set()
+    agents = []
+    flaky = {"left": 0}
+    delay = 0.0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body=b"", headers=None):
+        self.send_response(status)
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        cls = type(self)
+        cls.hits[self.path] = cls.hits.get(self.path, 0) + 1
+        cls.ports.add(self.client_address[1])
+        cls.agents.append(self.headers.get("User-Agent"))
+        time.sleep(cls.delay)
+        path = self.path.split("?")[0]
+        if path == "/facts":
+            if self.headers.get("If-None-Match") == '"v1"':
+                return self._send(304, headers={"ETag": '"v1"'})
+            return self._send(200, b'{"cik": 320193}', {"ETag": '"v1"', "Content-Type": "application/json"})
+        if path == "/gz":
+            return self._send(200, gzip.compress(b"zipped"), {"Content-Encoding": "gzip"})
+        if path == "/flaky":
+            if cls.flaky["left"] > 0:
+                cls.flaky["left"] -= 1
+                return self._send(503, b"busy", {"Retry-After": "0"})
+            return self._send(200, b"ok")
+        if path == "/moved":
+            return self._send(301, headers={"Location": "/facts"})
+        return self._send(404, b"nope")
+
+
+class TestFetcher(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        cls.thread = threading.Thread(target=cls.server.serve_forever, daemon=True)
+        cls.thread.start()
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        _Handler.hits.clear()
+        _Handler.ports.clear()
+        _Handler.agents.clear()
+        _Handler.delay = 0.0
+        self.tmp = tempfile.TemporaryDirectory()
+        policies = {
+            "default": SourcePolicy("default", rate=1000, burst=1000, ttl_sec=60),
+            "stale": SourcePolicy("stale", rate=1000, burst=1000, ttl_sec=0),
+        }
+        self.f = Fetcher(cache_dir=self.tmp.name, policies=policies, user_agent="FRA-test/0.1 (t@example.com)", backoff_base=0.0)
+
+    def tearDown(self):
+        self.f.pool.close()
+        self.tmp.cleanup()
+
+    def test_cache_and_conditional_get(self):
+        r1 = self.f.get(self.base + "/facts")
+        self.assertFalse(r1.from_cache)
+        self.assertEqual(r1.json(), {"cik": 320193})
+        r2 = self.f.get(self.base + "/facts")
+        self.assertTrue(r2.from_cache)
+        self.assertEqual(_Handler.hits["/facts"], 1)
+        # stale under a zero TTL: revalidated with If-None-Match, body from disk
+        r3 = self.f.get(self.base + "/facts", source="stale")
+        self.assertTrue(r3.from_cache)
+        self.assertEqual(r3.body, r1.body)
+        self.assertEqual(_Handler.hits["/facts"], 2)
+        self.assertEqual(self.f.stats["revalidated"], 1)
+        self.assertEqual(set(_Handler.agents), {"FRA-test/0.1 (t@example.com)"})
+
+    def test_keep_alive_reuses_connection(self):
+        for p in ("/gz", "/facts", "/flaky"):
+            self.f.get(self.base + p, max_age=0)
+        self.assertEqual(len(_Handler.ports), 1)
+
+    def test_gzip_redirect_and_errors(self):
+        self.assertEqual(self.f.get(self.base + "/gz").body, b"zipped")
+        self.assertEqual(self.f.get(self.base + "/moved").json(), {"cik": 320193})
+        with self.assertRaises(FetchError) as ctx:
+            self.f.get(self.base + "/missing")
+        self.assertEqual(ctx.exception.status, 404)
+
+    def test_retry_on_503(self):
+        _Handler.flaky["left"] = 2
+        self.assertEqual(self.f.get(self.base + "/flaky").body, b"ok")
+        self.assertEqual(self.f.stats["retries"], 2)
+
+    def test_warm_run_faster_than_cold(self):
+        _Handler.delay = 0.05
+        urls = [f"{self.base}/facts?cik={i}" for i in range(5)]
+        t0 = time.perf_counter()
+        for u in urls:
+            self.f.get(u)
+        cold = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        for u in urls:
+            self.f.get(u)
+        warm = time.perf_counter() - t0
+        self.assertGreater(cold, 3 * warm)
+
+
+class TestTokenBucket(unittest.TestCase):
+    def test_rate_is_shared_across_threads(self):
+        now = [0.0]
+        bucket = TokenBucket(rate=10, burst=1, clock=lambda: now[0], sleep=lambda s: now.__setitem__(0, now[0] + s))
+        for _ in range(11):
+            bucket.acquire()
+        self.assertAlmostEqual(now[0], 1.0)
+
+    def test_real_threads(self):
+        bucket = TokenBucket(rate=50, burst=1)
+        t0 = time.perf_counter()
+        ts = [threading.Thread(target=lambda: [bucket.acquire() for _ in range(5)]) for _ in range(4)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        # 20 tokens at 50/s with one banked: at least ~0.38s
+        self.assertGreater(time.perf_counter() - t0, 0.3)
+
+
+if __name__ == "__main__":
+    unittest.main()
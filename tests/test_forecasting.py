@@ -1,6 +1,8 @@
+import random
 import unittest
+from dataclasses import replace
 from services.forecasting.assumptions import Scenario, validate_scenario
-from services.forecasting.engine import project_12q
+from services.forecasting.engine import project_12q, project_grid, project_n, scenario_grid
 
 class TestForecasting(unittest.TestCase):
     def test_validate_scenario(self):
@@ -35,6 +37,78 @@ class TestForecasting(unittest.TestCase):
             # Identity CFO + CFI + CFF == delta_cash
             self.assertAlmostEqual(r["cfo"] + r["cfi"] + r["cff"], r["delta_cash"], places=6)
 
+
+class TestProjectN(unittest.TestCase):
+    s = Scenario(0.02, 0.6, 0.2, 45, 60, 50, 0.05, 0.03, 0.25)
+    hist = {"revenue": 1000.0, "ar": 100.0, "inventory": 80.0, "ap": 70.0}
+
+    def test_quarterly_extends_project_12q(self):
+        rows = project_n(self.hist, self.s, horizon=40)
+        self.assertEqual(len(rows), 40)
+        self.assertEqual(rows[:12], project_12q(self.hist, self.s))
+        self.assertAlmostEqual(rows[39]["revenue"], 1000.0 * 1.02 ** 40, places=6)
+        for r in rows:
+            self.assertAlmostEqual(r["cfo"] + r["cfi"] + r["cff"], r["delta_cash"], places=6)
+        # steady growth: ΔNWC after the first period is the growth in levels
+        self.assertAlmostEqual(rows[20]["delta_nwc"], (rows[20]["ar"] - rows[19]["ar"]) + (rows[20]["inventory"] - rows[19]["inventory"]) - (rows[20]["ap"] - rows[19]["ap"]), places=9)
+
+    def test_annual_sums_quarters(self):
+        years = project_n(self.hist, self.s, horizon=10, period="A")
+        quarters = project_n(self.hist, self.s, horizon=40)
+        self.assertEqual(len(years), 10)
+        for y, row in enumerate(years):
+            for line in ("revenue", "cogs", "ebit", "tax", "da", "capex"):
+                self.assertAlmostEqual(row[line], sum(q[line] for q in quarters[4 * y:4 * y + 4]), places=6)
+        # balances use 365-day years
+        self.assertAlmostEqual(years[0]["ar"], 45 / 365 * years[0]["revenue"], places=9)
+        self.assertAlmostEqual(years[0]["delta_nwc"], (years[0]["ar"] - 100.0) + (years[0]["inventory"] - 80.0) - (years[0]["ap"] - 70.0), places=9)
+
+    def test_rejects_bad_horizon(self):
+        with self.assertRaises(ValueError):
+            project_n(self.hist, self.s, horizon=0)
+        with self.assertRaises(ValueError):
+            project_n(self.hist, self.s, period="M")
+
+
+class TestProjectGrid(unittest.TestCase):
+    def _random_scenario(self, rnd):
+        return Scenario(
+            revenue_growth_qoq=rnd.uniform(-0.1, 0.1),
+            target_gross_margin=rnd.uniform(0.0, 0.95),
+            target_operating_margin=rnd.uniform(0.0, 0.6),
+            dso=rnd.uniform(0, 120), dio=rnd.uniform(0, 120), dpo=rnd.uniform(0, 120),
+            capex_pct_revenue=rnd.uniform(0, 0.2),
+            da_pct_revenue=rnd.uniform(0, 0.1),
+            tax_rate=rnd.uniform(0, 0.5),
+        )
+
+    def test_matches_project_12q_exactly(self):
+        rnd = random.Random(7)
+        hist = {"revenue": 1234.5, "ar": 150.0, "inventory": 90.0, "ap": 70.0}
+        scenarios = [self._random_scenario(rnd) for _ in range(25)]
+        grid = project_grid(hist, scenarios)
+        self.assertEqual((grid.n_scenarios, grid.n_quarters), (25, 12))
+        for s, sc in enumerate(scenarios):
+            self.assertEqual(grid.rows(s), project_12q(hist, sc))
+        # zero revenue takes the zero-cogs branch for inventory/payables
+        empty = project_grid({"ar": 10.0}, scenarios[:3])
+        for s, sc in enumerate(scenarios[:3]):
+            self.assertEqual(empty.rows(s), project_12q({"ar": 10.0}, sc))
+
+    def test_series_and_get(self):
+        base = Scenario(0.02, 0.6, 0.2, 45, 60, 50, 0.05, 0.03, 0.25)
+        scenarios = scenario_grid(base, revenue_growth_qoq=[0.0, 0.05], target_operating_margin=[0.1, 0.3])
+        self.assertEqual(len(scenarios), 4)
+        grid = project_grid({"revenue": 1000.0}, scenarios, quarters=8)
+        rows = project_12q({"revenue": 1000.0}, scenarios[3])
+        self.assertEqual(list(grid.series(3, "ebit")), [r["ebit"] for r in rows[:8]])
+        self.assertEqual(grid.get(0, 7, "revenue"), 1000.0)
+        with self.assertRaises(ValueError):
+            scenario_grid(base, wacc=[0.08])
+        with self.assertRaises(ValueError):
+            project_grid({}, [replace(base, tax_rate=2.0)])
+
+
 if __name__ == '__main__':
     unittest.main()
 
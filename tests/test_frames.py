@@ -0,0 +1,69 @@
+import json
+import tempfile
+import unittest
+
+from services.historical.peers import peer_stats, percentile_rank, ratio
+from services.ingestion.fetcher import FetchResult
+from services.ingestion.frames import PeerStore, parse_frame
+
+
+def _payload(tag, rows, period="CY2023"):
+    return {
+        "taxonomy": "us-gaap", "tag": tag, "ccp": period, "uom": "USD", "pts": len(rows),
+        "data": [{"accn": f"a{c}", "cik": c, "entityName": f"Co {c}", "end": "2023-12-31", "val": v}
+                 for c, v in rows],
+    }
+
+
+class _FakeFetcher:
+    def __init__(self, payload):
+        self.body = json.dumps(payload).encode()
+        self.urls = []
+
+    def get(self, url, source=None, max_age=None):
+        self.urls.append(url)
+        return FetchResult(url, 200, self.body)
+
+
+class TestFrames(unittest.TestCase):
+    def test_parse_sorts_by_cik(self):
+        col = parse_frame(_payload("Revenues", [(30, 3.0), (10, 1.0), (20, 2.0), (40, "bad")]))
+        self.assertEqual(list(col.ciks), [10, 20, 30])
+        self.assertEqual(list(col.values), [1.0, 2.0, 3.0])
+        self.assertEqual((col.tag, col.unit, col.period), ("Revenues", "USD", "CY2023"))
+        self.assertEqual(col.get(20), 2.0)
+        self.assertIsNone(col.get(25))
+
+    def test_store_roundtrip_and_ingest(self):
+        with tempfile.TemporaryDirectory() as d:
+            store = PeerStore(d)
+            self.assertIsNone(store.get("us-gaap", "Revenues", "USD", "CY2023"))
+            fetcher = _FakeFetcher(_payload("Revenues", [(i, float(i) * 10) for i in range(1, 501)]))
+            col = store.ingest("us-gaap", "Revenues", "USD", "CY2023", fetcher=fetcher)
+            self.assertTrue(fetcher.urls[0].endswith("/xbrl/frames/us-gaap/Revenues/USD/CY2023"))
+            back = store.get("us-gaap", "Revenues", "USD", "CY2023")
+            self.assertEqual(back.ciks, col.ciks)
+            self.assertEqual(back.values, col.values)
+            self.assertEqual(store.periods("us-gaap", "Revenues", "USD"), ["CY2023"])
+
+    def test_peer_stats_and_ratio(self):
+        rev = parse_frame(_payload("Revenues", [(1, 100.0), (2, 200.0), (3, 0.0), (4, 400.0)]))
+        gp = parse_frame(_payload("GrossProfit", [(1, 40.0), (2, 50.0), (3, 10.0), (5, 1.0)]))
+        gm = ratio(gp, rev, tag="gross_margin")
+        self.assertEqual(list(gm.ciks), [1, 2])  # 3 has zero revenue, 4/5 missing a side
+        self.assertEqual(list(gm.values), [0.4, 0.25])
+        self.assertEqual(gm.unit, "pure")
+
+        s = peer_stats(rev)
+        self.assertEqual(s["count"], 4.0)
+        self.assertAlmostEqual(s["median"], 150.0)
+        self.assertAlmostEqual(s["p25"], 75.0)
+        self.assertAlmostEqual(s["p75"], 250.0)
+        self.assertAlmostEqual(s["mean"], 175.0)
+        self.assertEqual(percentile_rank(rev, 4), 75.0)
+        self.assertIsNone(percentile_rank(rev, 99))
+        self.assertEqual(peer_stats(parse_frame({"data": []})), {"count": 0.0})
+
+
+if __name__ == "__main__":
+    unittest.main()
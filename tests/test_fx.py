@@ -1,5 +1,9 @@
+import math
+import tempfile
 import unittest
-from services.ingestion.fx_client import build_fx_latest_url, parse_fx_latest
+from services.ingestion.fx_client import build_fx_latest_url, build_fx_timeseries_url, parse_fx_latest
+from services.ingestion.fx_rates import FXRates, convert_rows
+from services.ingestion.prices import PriceStore
 
 class TestFX(unittest.TestCase):
     def test_build_url(self):
@@ -14,6 +18,83 @@ class TestFX(unittest.TestCase):
         self.assertEqual(q.quote, "INR")
         self.assertAlmostEqual(q.rate, 83.0)
 
+_TS = {
+    "base": "USD",
+    "rates": {
+        "2023-12-29": {"INR": 83.2, "EUR": 0.90},
+        "2024-03-28": {"INR": 83.4, "EUR": 0.92},
+        "2024-06-28": {"INR": 83.5},
+    },
+}
+
+
+class TestFXRates(unittest.TestCase):
+    def test_timeseries_url(self):
+        url = build_fx_timeseries_url("2024-01-01", "2024-03-31", base="USD", symbols="INR")
+        self.assertIn("/timeseries?start_date=2024-01-01&end_date=2024-03-31&base=USD&symbols=INR", url)
+
+    def test_direct_inverse_and_triangulated(self):
+        fx = FXRates()
+        self.assertEqual(fx.add_payload(_TS), 5)
+        self.assertEqual(fx.add_payload({"base": "USD", "date": "2024-07-01", "rates": {"INR": 83.6}}), 1)
+        self.assertAlmostEqual(fx.rate("USD", "INR", "2024-03-31"), 83.4)  # weekend -> Thursday
+        self.assertAlmostEqual(fx.rate("INR", "USD", "2023-12-31"), 1 / 83.2)
+        self.assertAlmostEqual(fx.rate("INR", "EUR", "2024-03-31"), 0.92 / 83.4)
+        self.assertAlmostEqual(fx.rate("EUR", "EUR", "2024-03-31"), 1.0)
+        self.assertIsNone(fx.rate("INR", "EUR", "2024-06-30"))  # EUR leg too stale
+        self.assertIsNone(fx.rate("USD", "INR", "2023-01-01"))
+        self.assertIsNone(fx.rate("USD", "JPY", "2024-03-31"))
+
+    def test_column_conversion_matches_scalar(self):
+        fx = FXRates()
+        fx.add_payload(_TS)
+        dates = ["2024-06-30", "2023-12-31", "2024-03-31"]  # unsorted on purpose
+        vals = [835.0, 832.0, 834.0]
+        out = fx.convert(vals, dates, "INR", "USD")
+        for v, d, o in zip(vals, dates, out):
+            self.assertAlmostEqual(o, v * fx.rate("INR", "USD", d))
+        self.assertTrue(math.isnan(fx.convert([1.0], ["2020-01-01"], "INR", "USD")[0]))
+
+        rows = [{"period_end": d, "revenue": v, "currency": "INR"} for d, v in zip(dates, vals)]
+        conv = convert_rows(rows, ["revenue", "ebit"], "INR", "USD", fx)
+        self.assertEqual([r["currency"] for r in conv], ["USD"] * 3)
+        self.assertAlmostEqual(conv[1]["revenue"], 10.0)
+        self.assertNotIn("ebit", conv[0])
+        self.assertEqual(rows[0]["currency"], "INR")
+        with self.assertRaises(ValueError):
+            convert_rows([{"period_end": "2020-01-01", "revenue": 1.0}], ["revenue"], "INR", "USD", fx)
+
+    def test_flows_at_average_rate_balances_at_close(self):
+        fx = FXRates()
+        # USD->INR climbs from 80 to 86 over the quarter
+        fx.add_payload({"base": "USD", "rates": {
+            "2024-01-01": {"INR": 80.0}, "2024-02-01": {"INR": 82.0}, "2024-02-05": {"INR": 82.0},
+            "2024-03-01": {"INR": 84.0}, "2024-03-29": {"INR": 86.0},
+        }})
+        fx.max_gap_days = 40
+        avg = fx.average_rates("USD", "INR", ["2024-01-01"], ["2024-03-31"])[0]
+        self.assertAlmostEqual(avg, (80.0 + 82.0 + 82.0 + 84.0 + 86.0) / 5)
+        self.assertTrue(math.isnan(fx.average_rates("USD", "INR", ["2023-10-01"], ["2023-12-31"])[0]))
+
+        rows = [{"period_end": "2024-03-31", "period_type": "Q", "revenue": 8280.0, "ar": 8600.0}]
+        conv = convert_rows(rows, ["revenue", "ar"], "INR", "USD", fx, flows=["revenue"])[0]
+        inr_avg = fx.average_rates("INR", "USD", ["2024-01-01"], ["2024-03-31"])[0]
+        self.assertAlmostEqual(conv["revenue"], 8280.0 * inr_avg)
+        self.assertAlmostEqual(conv["ar"], 100.0)  # closing rate 86
+        self.assertNotAlmostEqual(conv["revenue"], 8280.0 / 86.0)
+        # a quarter that starts before the FX history cannot be averaged
+        early = [{"period_end": "2024-01-31", "period_type": "Q", "revenue": 1.0}]
+        self.assertEqual(convert_rows(early, ["revenue"], "INR", "USD", fx, drop_missing=True, flows=["revenue"]), [])
+
+    def test_store_roundtrip(self):
+        with tempfile.TemporaryDirectory() as d:
+            fx = FXRates(store=PriceStore(d))
+            fx.add_payload(_TS)
+            self.assertEqual(fx.save(), 5)
+            self.assertEqual(fx.save(), 0)
+            again = FXRates(store=PriceStore(d))
+            self.assertAlmostEqual(again.rate("INR", "EUR", "2024-03-28"), 0.92 / 83.4)
+
 if __name__ == "__main__":
     unittest.main()
 
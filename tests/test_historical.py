@@ -1,6 +1,39 @@
+import json
+import random
+import tempfile
 import unittest
+from dataclasses import replace
+from datetime import date, timedelta
+from unittest import mock
+from services.historical.store import HistoryStore, period_key
+from services.historical.validation import validate_batch, validate_frame, validate_rows
+from services.exports.reports import validation_report_md
+from services.ingestion.sec_client import extract_many
+from services.mapper.engine import Mapper
 from services.historical.timeseries import stitch_periods, validate_accounting_identities
-from services.historical.kpi import enrich_with_kpis
+from services.historical.kpi import add_kpis, add_ttm, enrich_with_kpis, kpi_batch, latest_quarter
+from services.historical.frame import HistoricalFrame
+
+
+def _random_rows(rng, ptype, n):
+    rows = []
+    for _ in range(n):
+        y, q = rng.randint(2015, 2024), rng.randint(1, 4)
+        r = {"period_end": f"{y}-{3 * q:02d}-{28 if q == 1 else 30}", "period_type": ptype if rng.random() > 0.05 else "x"}
+        for k in ("revenue", "cogs", "gross_profit", "ebit", "ar", "inventory", "ap", "capex"):
+            roll = rng.random()
+            if roll < 0.7:
+                r[k] = rng.choice([rng.uniform(-50, 1000), rng.randint(0, 500)])
+            elif roll < 0.8:
+                r[k] = 0
+            elif roll < 0.9:
+                r[k] = None
+        if rng.random() < 0.3:
+            r["accn"] = f"000-{rng.randint(0, 99)}"
+        if rng.random() < 0.1:
+            r["dso"] = 12.5  # pre-existing KPI column
+        rows.append(r)
+    return rows
 
 
 class TestHistorical(unittest.TestCase):
@@ -40,6 +73,290 @@ class TestHistorical(unittest.TestCase):
         self.assertTrue(validate_accounting_identities(rows))
 
 
+class TestHistoricalFrame(unittest.TestCase):
+    @staticmethod
+    def _clean(rows):
+        return [{k: v for k, v in r.items() if v is not None} for r in rows]
+
+    def test_matches_row_pipeline(self):
+        rng = random.Random(5)
+        for _ in range(30):
+            annual = _random_rows(rng, "A", rng.randint(0, 15))
+            quarterly = _random_rows(rng, "Q", rng.randint(0, 40))
+            expected = enrich_with_kpis(stitch_periods(annual, quarterly))
+            frame = HistoricalFrame.stitch(HistoricalFrame.from_rows(annual), HistoricalFrame.from_rows(quarterly))
+            got = add_kpis(frame).to_rows()
+            self.assertEqual(got, self._clean(expected))
+
+    def test_adapters_and_columns(self):
+        rows = [
+            {"period_end": "2023-12-31", "period_type": "a", "revenue": 10, "accn": "x"},
+            {"period_end": "2023-09-30", "period_type": "Q", "revenue": None},
+            {"period_end": None, "period_type": "Q", "revenue": 1},
+        ]
+        f = HistoricalFrame.from_rows(rows)
+        self.assertEqual(len(f), 2)
+        self.assertEqual(f.period_ends, ["2023-12-31", "2023-09-30"])
+        self.assertEqual(f.types, ["A", "Q"])
+        self.assertEqual(f.objects["accn"], ["x", None])
+        self.assertTrue(f.column("revenue")[1] != f.column("revenue")[1])
+        self.assertEqual(f.dedupe_sort().period_ends, ["2023-09-30", "2023-12-31"])
+        with self.assertRaises(ValueError):
+            f.set_column("bad", [1.0])
+        self.assertEqual(HistoricalFrame.from_rows([]).to_rows(), [])
+
+
+_TAGS = ["RevenueFromContractWithCustomerExcludingAssessedTax", "CostOfRevenue", "OperatingIncomeLoss"]
+
+
+def _filing_items(k, end, filed, scale=1.0):
+    accn = f"0000320193-{k:05d}"
+    return {tag: {"end": end, "val": (100.0 + k) * (i + 1) * scale, "accn": accn, "fp": "Q2", "form": "10-Q", "filed": filed}
+            for i, tag in enumerate(_TAGS)}
+
+
+def _payload(filings):
+    facts = {tag: {"units": {"USD": []}} for tag in _TAGS}
+    for items in filings:
+        for tag, item in items.items():
+            facts[tag]["units"]["USD"].append(item)
+    return {"facts": {"us-gaap": facts}}
+
+
+class TestKpiBatch(unittest.TestCase):
+    def test_batch_matches_row_kpis(self):
+        rng = random.Random(9)
+        companies = {f"C{i}": _random_rows(rng, rng.choice("AQ"), 30) for i in range(40)}
+        frames = {c: HistoricalFrame.from_rows(rows).dedupe_sort() for c, rows in companies.items()}
+        kpi_batch(frames, ttm=False)
+        for c, rows in companies.items():
+            expected = enrich_with_kpis(stitch_periods(rows, []))
+            expected = [{k: v for k, v in r.items() if v is not None} for r in expected]
+            self.assertEqual(frames[c].to_rows(), expected)
+
+    def test_latest_quarter_after_annual_filing(self):
+        quarters = [{"period_end": pe, "period_type": "Q", "revenue": 100.0 + k, "capex": 5.0, "ar": 40.0 + k}
+                    for k, pe in enumerate(["2024-03-31", "2024-06-30", "2024-09-30"])]
+        fy = {"period_end": "2024-12-31", "period_type": "A", "revenue": 420.0, "capex": 22.0, "ar": 50.0}
+        rows = stitch_periods([fy], quarters)
+        self.assertEqual(rows[-1]["period_type"], "A")
+        q4 = latest_quarter(rows)
+        self.assertEqual((q4["period_end"], q4["period_type"]), ("2024-12-31", "Q"))
+        self.assertAlmostEqual(q4["revenue"], 420.0 - 303.0)
+        self.assertAlmostEqual(q4["capex"], 7.0)
+        self.assertEqual(q4["ar"], 50.0)
+        # without Q1-Q3 the newest quarter seeds; annual-only histories use a quarter of the year
+        self.assertEqual(latest_quarter(rows[1:]), rows[2])
+        self.assertAlmostEqual(latest_quarter([fy])["revenue"], 105.0)
+        self.assertIsNone(latest_quarter([]))
+
+    def test_ttm_matches_naive_windows(self):
+        rng = random.Random(4)
+        d = date(2010, 3, 31)
+        rows = []
+        for k in range(60):
+            if k == 30:
+                continue  # missing quarter
+            r = {"period_end": (d + timedelta(days=91 * k)).isoformat(), "period_type": "Q",
+                 "revenue": rng.uniform(50, 150), "cogs": rng.uniform(10, 40), "ar": rng.uniform(5, 30)}
+            if k == 45:
+                del r["revenue"]
+            rows.append(r)
+        rows.append({"period_end": "2012-12-31", "period_type": "A", "revenue": 400.0})
+        frame = add_ttm(add_kpis(HistoricalFrame.stitch(HistoricalFrame.from_rows(rows[-1:]), HistoricalFrame.from_rows(rows[:-1]))))
+        out = frame.to_rows()
+        q = [r for r in out if r["period_type"] == "Q"]
+        for k, r in enumerate(q):
+            win = q[k - 3:k + 1] if k >= 3 else []
+            consecutive = len(win) == 4 and all(
+                date.fromisoformat(b["period_end"]).toordinal() - date.fromisoformat(a["period_end"]).toordinal() <= 100
+                for a, b in zip(win, win[1:])
+            )
+            if consecutive and all("revenue" in w for w in win):
+                self.assertAlmostEqual(r["revenue_ttm"], sum(w["revenue"] for w in win), places=9)
+                self.assertAlmostEqual(r["ar_avg"], sum(w["ar"] for w in win) / 4, places=9)
+                self.assertAlmostEqual(r["dso_ttm"], 365 * r["ar_avg"] / r["revenue_ttm"], places=9)
+            else:
+                self.assertNotIn("revenue_ttm", r)
+        annual = [r for r in out if r["period_type"] == "A"][0]
+        self.assertNotIn("revenue_ttm", annual)
+        self.assertEqual(sum("revenue_ttm" in r for r in q), 59 - 3 - 3 - 4)
+
+
+class TestIdentityValidation(unittest.TestCase):
+    def _cash_rows(self, rng, n):
+        rows, cash = [], 100.0
+        for k in range(n):
+            r = {"period_end": f"{2000 + k}-12-31", "period_type": "A"}
+            flows = [rng.uniform(-20, 40) for _ in range(3)]
+            if rng.random() < 0.8:
+                r["cfo"], r["cfi"], r["cff"] = flows
+                cash += sum(flows) + (rng.choice([0.0, 0.0, 0.0, 5.0]))
+            if rng.random() < 0.8:
+                r["cash"] = cash
+            rows.append(r)
+        return rows
+
+    def test_cash_flow_mask_matches_row_validator(self):
+        rng = random.Random(2)
+        for _ in range(50):
+            rows = self._cash_rows(rng, rng.randint(0, 12))
+            res = validate_rows(rows)
+            self.assertEqual(res.checks["cash_flow"].ok, validate_accounting_identities(rows))
+
+    def test_reports_failing_periods(self):
+        rows = [
+            {"period_end": "2023-03-31", "period_type": "Q", "cash": 100, "revenue": 10, "cogs": 4, "gross_profit": 6},
+            {"period_end": "2023-06-30", "period_type": "Q", "cfo": 30, "cfi": -5, "cff": -5},
+            {"period_end": "2023-09-30", "period_type": "Q", "cash": 121, "cfo": 30, "cfi": -5, "cff": -5,
+             "revenue": 10, "cogs": 4, "gross_profit": 7},
+        ]
+        res = validate_rows(rows)
+        self.assertFalse(res.ok)
+        self.assertEqual(res.checks["cash_flow"].failing_rows(), [2])
+        self.assertAlmostEqual(res.checks["cash_flow"].residual[2], -1.0)
+        self.assertEqual(res.checks["cash_flow"].checked, 1)
+        self.assertEqual(res.checks["delta_cash"].checked, 0)
+        self.assertEqual([(f["identity"], f["period"]) for f in res.failures()],
+                         [("cash_flow", "2023-09-30"), ("gross_profit", "2023-09-30")])
+        frame_res = validate_frame(HistoricalFrame.from_rows(rows))
+        self.assertEqual(frame_res.failures(), res.failures())
+        batch = validate_batch({"A": HistoricalFrame.from_rows(rows), "B": HistoricalFrame.from_rows(rows[:1])})
+        self.assertEqual((batch["A"].ok, batch["B"].ok), (False, True))
+        md = validation_report_md({"historical": res.ok}, failures=res.failures())
+        self.assertIn("| gross_profit | 2023-09-30 | 1 |", md)
+
+    def test_forecast_rows_labelled(self):
+        rows = [{"cfo": 1.0, "cfi": 1.0, "cff": 1.0, "delta_cash": 3.0}, {"cfo": 1.0, "cfi": 1.0, "cff": 1.0, "delta_cash": 2.0}]
+        res = validate_rows(rows)
+        self.assertEqual(res.failures()[0]["period"], "T+2")
+        with self.assertRaises(ValueError):
+            validate_rows(rows, identities=("nope",))
+
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.mapper = Mapper.from_json_path("services/mapper/mapping_gaap.json")
+        d = date(2009, 3, 31)
+        self.filings = []
+        for k in range(60):
+            end = (d + timedelta(days=91 * k)).isoformat()
+            filed = (d + timedelta(days=91 * k + 40)).isoformat()
+            self.filings.append(_filing_items(k, end, filed))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _table(self, filings):
+        return extract_many(_payload(filings), "us-gaap", _TAGS, "USD")
+
+    def test_warm_refresh_maps_only_new_filing(self):
+        store = HistoryStore(self.tmp.name)
+        hist, stats = store.refresh("320193", self._table(self.filings), self.mapper)
+        self.assertEqual((stats.periods_mapped, stats.new_accessions, stats.full_remap), (60, 60, True))
+        _, stats = store.refresh(320193, self._table(self.filings), self.mapper)
+        self.assertEqual((stats.periods_mapped, stats.new_accessions), (0, 0))
+
+        # a new 10-Q, plus an amendment restating the period a year earlier
+        last_end = date.fromisoformat(self.filings[-1]["CostOfRevenue"]["end"])
+        new = _filing_items(60, (last_end + timedelta(days=91)).isoformat(), "2024-06-01")
+        amend = _filing_items(61, self.filings[-4]["CostOfRevenue"]["end"], "2024-06-02", scale=2.0)
+        filings = self.filings + [new, amend]
+        hist, stats = store.refresh("320193", self._table(filings), self.mapper)
+        self.assertEqual((stats.periods_mapped, stats.new_accessions, stats.full_remap), (2, 2, False))
+        self.assertEqual(len(hist.periods), 61)
+
+        rebuilt, _ = HistoryStore(self.tmp.name + "/fresh").refresh("320193", self._table(filings), self.mapper)
+        self.assertEqual(hist.rows(), rebuilt.rows())
+        self.assertEqual(store.load("320193").rows(), rebuilt.rows())
+        amended = hist.periods[period_key(amend["CostOfRevenue"]["end"], "Q")]
+        self.assertEqual(amended["accn"], "0000320193-00061")
+        self.assertAlmostEqual(amended["lines"]["revenue"], 322.0)
+        self.assertEqual(len(hist.frame()), 61)
+
+    def test_sync_skips_unchanged_body_and_extracts_only_new_periods(self):
+        store = HistoryStore(self.tmp.name)
+        body = json.dumps(_payload(self.filings)).encode()
+        hist, stats = store.sync("320193", body, _TAGS, self.mapper)
+        self.assertEqual((stats.periods_mapped, stats.full_remap, stats.unchanged), (60, True, False))
+        _, stats = store.sync("320193", body, _TAGS, self.mapper)
+        self.assertTrue(stats.unchanged)
+        self.assertEqual(stats.periods_mapped, 0)
+        _, stats = store.sync("320193", b"not even json", _TAGS, self.mapper, version=hist.source_version)
+        self.assertTrue(stats.unchanged)  # matching ETag: the body is never parsed
+
+        last_end = date.fromisoformat(self.filings[-1]["CostOfRevenue"]["end"])
+        new = _filing_items(60, (last_end + timedelta(days=91)).isoformat(), "2024-06-01")
+        amend = _filing_items(61, self.filings[-4]["CostOfRevenue"]["end"], "2024-06-02", scale=2.0)
+        body = json.dumps(_payload(self.filings + [new, amend])).encode()
+        hist, stats = store.sync("320193", body, _TAGS, self.mapper, version='"v2"')
+        self.assertEqual((stats.periods_mapped, stats.new_accessions, stats.full_remap), (2, 2, False))
+        self.assertEqual(stats.periods_total, 61)
+        self.assertEqual(store.load("320193").source_version, '"v2"')
+        rebuilt, _ = HistoryStore(self.tmp.name + "/fresh").sync("320193", body, _TAGS, self.mapper)
+        self.assertEqual(hist.rows(), rebuilt.rows())
+
+    def test_period_type_follows_span(self):
+        rev, ar = _TAGS[0], "AccountsReceivableNetCurrent"
+        payload = {"facts": {"us-gaap": {
+            rev: {"units": {"USD": [
+                {"start": "2023-01-01", "end": "2023-12-31", "val": 1000, "accn": "k", "fp": "FY", "form": "10-K", "filed": "2024-02-01"},
+                {"start": "2024-01-01", "end": "2024-03-31", "val": 260, "accn": "q1", "fp": "Q1", "form": "10-Q", "filed": "2024-05-01"},
+            ]}},
+            ar: {"units": {"USD": [
+                {"end": "2023-12-31", "val": 50, "accn": "k", "fp": "FY", "form": "10-K", "filed": "2024-02-01"},
+                {"end": "2023-12-31", "val": 50, "accn": "q1", "fp": "Q1", "form": "10-Q", "filed": "2024-05-01"},
+            ]}},
+        }}}
+        hist, _ = HistoryStore(self.tmp.name).sync("1", json.dumps(payload).encode(), [rev, ar], self.mapper)
+        self.assertEqual([(r["period_end"], r["period_type"]) for r in hist.rows()], [("2023-12-31", "A"), ("2024-03-31", "Q")])
+
+    def test_old_format_is_rebuilt(self):
+        store = HistoryStore(self.tmp.name)
+        store.refresh("320193", self._table(self.filings[:4]), self.mapper)
+        path = store._path("320193")
+        data = json.loads(path.read_text())
+        del data["format"]
+        path.write_text(json.dumps(data))
+        _, stats = store.refresh("320193", self._table(self.filings[:4]), self.mapper)
+        self.assertEqual((stats.periods_mapped, stats.full_remap), (4, True))
+
+    def test_rule_change_remaps_everything(self):
+        store = HistoryStore(self.tmp.name)
+        store.refresh("320193", self._table(self.filings[:8]), self.mapper)
+        # a new version label over the same rules maps every period the same way
+        relabelled = Mapper(rules=self.mapper.rules, aliases=self.mapper.aliases, taxonomy_version="2025.0")
+        hist, stats = store.refresh("320193", self._table(self.filings[:8]), relabelled)
+        self.assertEqual((stats.periods_mapped, stats.full_remap), (0, False))
+        self.assertEqual(hist.taxonomy_version, "2025.0")
+        flipped = [replace(r, sign=-r.sign) if r.tag == _TAGS[0] else r for r in self.mapper.rules]
+        changed = Mapper(rules=flipped, aliases=self.mapper.aliases, taxonomy_version="2025.0")
+        hist, stats = store.refresh("320193", self._table(self.filings[:8]), changed)
+        self.assertEqual((stats.periods_mapped, stats.full_remap), (8, True))
+        self.assertEqual(hist.rules_digest, changed.digest())
+        self.assertIsNone(store.load("999"))
+
+    def test_sync_skips_filings_already_seen_for_a_period(self):
+        # every 10-Q repeats the previous quarter as a comparative, so each
+        # period but the last was reported by two filings and only the later
+        # one is its latest
+        ends = [f["CostOfRevenue"]["end"] for f in self.filings]
+        filed = [f["CostOfRevenue"]["filed"] for f in self.filings]
+        filings = self.filings + [_filing_items(k, ends[k - 1], filed[k]) for k in range(1, 60)]
+        store = HistoryStore(self.tmp.name)
+        hist, _ = store.sync("320193", json.dumps(_payload(filings)).encode(), _TAGS, self.mapper)
+        self.assertEqual(hist.periods[period_key(ends[0], "Q")]["accns"], ["0000320193-00000", "0000320193-00001"])
+
+        next_end = (date.fromisoformat(ends[-1]) + timedelta(days=91)).isoformat()
+        filings += [_filing_items(60, next_end, "2024-06-01"), _filing_items(60, ends[-1], "2024-06-01")]
+        with mock.patch("services.historical.store.extract_many", wraps=extract_many) as spy:
+            hist, stats = store.sync("320193", json.dumps(_payload(filings)).encode(), _TAGS, self.mapper, version='"v2"')
+        self.assertEqual(spy.call_args.kwargs["ends"], {ends[-1], next_end})
+        self.assertEqual((stats.periods_mapped, stats.new_accessions, stats.full_remap), (2, 1, False))
+        rebuilt, _ = HistoryStore(self.tmp.name + "/fresh").sync("320193", json.dumps(_payload(filings)).encode(), _TAGS, self.mapper)
+        self.assertEqual(hist.rows(), rebuilt.rows())
+
 if __name__ == "__main__":
     unittest.main()
 
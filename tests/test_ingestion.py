@@ -1,9 +1,17 @@
+import io
+import tempfile
 import unittest
 import json
 from services.ingestion.sec_client import (
-    normalize_cik, build_company_facts_url, build_frames_url, extract_facts_companyfacts
+    normalize_cik, build_company_facts_url, build_frames_url, extract_facts_companyfacts,
+    load_companyfacts_selective, load_submissions_profile, extract_many,
 )
+from services.mapper.engine import Mapper
+from services.historical.timeseries import stitch_periods
 from services.ingestion.market_client import build_stooq_daily_csv, parse_alpha_vantage_daily
+from services.ingestion.prices import PriceSeries, PriceStore, parse_stooq_csv
+from services.ingestion import sources
+from services.ingestion.fetcher import FetchResult
 
 
 class TestSECClient(unittest.TestCase):
@@ -43,6 +51,110 @@ class TestSECClient(unittest.TestCase):
         self.assertAlmostEqual(facts[0].val, 100.0)
 
 
+    def test_load_companyfacts_selective(self):
+        def series(n, base):
+            return [{"end": f"20{10 + i}-12-31", "val": base + i, "accn": f"a-{i}", "fp": "FY", "form": "10-K"} for i in range(n)]
+        payload = {
+            "cik": 320193,
+            "entityName": "Apple \"Inc.\" {weird} [name]",
+            "facts": {
+                "dei": {"EntityCommonStockSharesOutstanding": {"units": {"shares": series(5, 1)}}},
+                "us-gaap": {
+                    "AccountsPayableCurrent": {"label": "AP }", "units": {"USD": series(10, 5)}},
+                    "Revenues": {"label": "Revenues", "description": "a \\ b", "units": {"USD": series(12, 100), "EUR": series(2, 7)}},
+                    "CostOfRevenue": {"units": {"USD": series(12, 40)}},
+                    "NetIncomeLoss": {"units": {"USD": series(3, 9)}},
+                },
+            },
+        }
+        raw = json.dumps(payload).encode()
+        for chunk in (1, 5, 64, 1 << 16):
+            out = load_companyfacts_selective(io.BytesIO(raw), "us-gaap", ["Revenues", "CostOfRevenue"], units=["USD"], chunk_size=chunk)
+            self.assertEqual(out["cik"], 320193)
+            self.assertEqual(out["entityName"], payload["entityName"])
+            self.assertEqual(set(out["facts"]["us-gaap"]), {"Revenues", "CostOfRevenue"})
+            self.assertEqual(list(out["facts"]["us-gaap"]["Revenues"]["units"]), ["USD"])
+            for tag in ("Revenues", "CostOfRevenue"):
+                self.assertEqual(
+                    extract_facts_companyfacts(out, "us-gaap", tag, "USD"),
+                    extract_facts_companyfacts(payload, "us-gaap", tag, "USD"),
+                )
+        missing = load_companyfacts_selective(io.BytesIO(raw), "ifrs-full", ["Revenue"])
+        self.assertEqual(missing["facts"], {"ifrs-full": {}})
+
+    def test_selective_skips_empty_and_flat_containers(self):
+        docs = [
+            {"cik": 1, "meta": {}, "facts": {"us-gaap": {"T": 1}}},
+            {"cik": 1, "meta": [], "facts": {"us-gaap": {"T": 1}}},
+            {"cik": 1, "meta": {"a": 1}, "list": [1, {"b": 2}], "facts": {"us-gaap": {"T": 1}}},
+            {"cik": 1, "facts": {"dei": {}, "x": [], "y": {"a": 1}, "us-gaap": {"T": 1}}},
+            {"cik": 1, "facts": {"us-gaap": {"A": {}, "B": [], "C": {"a": 1}, "T": 1, "D": {"u": "}"}}}},
+        ]
+        for doc in docs:
+            raw = json.dumps(doc).encode()
+            for chunk in (1, 3, 1 << 16):
+                out = load_companyfacts_selective(io.BytesIO(raw), "us-gaap", ["T"], chunk_size=chunk)
+                self.assertEqual(out, {"cik": 1, "facts": {"us-gaap": {"T": 1}}}, (doc, chunk))
+        for filings in ({}, [], {"a": 1}):
+            raw = json.dumps({"name": "X", "filings": filings, "addresses": {}, "fiscalYearEnd": "0930"}).encode()
+            prof = load_submissions_profile(io.BytesIO(raw), chunk_size=2)
+            self.assertEqual(prof, {"name": "X", "addresses": {}, "fiscalYearEnd": "0930", "fiscal_year_end": "09-30"})
+
+
+    def test_extract_many(self):
+        payload = {"facts": {"us-gaap": {
+            "RevenueFromContractWithCustomerExcludingAssessedTax": {"units": {"USD": [
+                {"end": "2023-12-31", "val": 1000, "accn": "a-2", "fp": "FY", "form": "10-K", "filed": "2024-02-01"},
+                {"end": "2023-09-30", "val": 240, "accn": "a-1", "fp": "Q3", "form": "10-Q", "filed": "2023-11-01"},
+                {"end": "2023-09-30", "val": 250, "accn": "a-3", "fp": "Q3", "form": "10-Q/A", "filed": "2023-12-01"},
+                {"end": "2023-06-30", "val": "NaN"},
+            ]}},
+            "CostOfRevenue": {"units": {"USD": [
+                {"end": "2023-12-31", "val": 400, "accn": "a-2", "fp": "FY", "form": "10-K", "filed": "2024-02-01"},
+            ]}},
+        }}}
+        tags = ["RevenueFromContractWithCustomerExcludingAssessedTax", "CostOfRevenue", "Missing"]
+        t = extract_many(payload, "us-gaap", tags, "USD")
+        self.assertEqual(t.periods, ["2023-09-30", "2023-12-31"])
+        rev = t.values["RevenueFromContractWithCustomerExcludingAssessedTax"]
+        self.assertEqual(list(rev), [250.0, 1000.0])  # amendment filed later wins
+        self.assertNotEqual(t.values["CostOfRevenue"][0], t.values["CostOfRevenue"][0])  # NaN gap
+        self.assertEqual((t.accn[0], t.form[0]), ("a-3", "10-Q/A"))
+        self.assertEqual(t.period_facts(0), {"RevenueFromContractWithCustomerExcludingAssessedTax": 250.0})
+        mapper = Mapper.from_json_path("services/mapper/mapping_gaap.json")
+        self.assertAlmostEqual(mapper.map_period(t.period_facts(1))["gross_profit"], 600.0)
+        rows = stitch_periods([r for r in t.rows() if r["period_type"] == "A"], [r for r in t.rows() if r["period_type"] == "Q"])
+        self.assertEqual([(r["period_end"], r["period_type"]) for r in rows], [("2023-09-30", "Q"), ("2023-12-31", "A")])
+        # single-tag parity with extract_facts_companyfacts
+        pts = extract_facts_companyfacts(payload, "us-gaap", "CostOfRevenue", "USD")
+        self.assertEqual([(p.end, p.val) for p in pts], [("2023-12-31", 400.0)])
+
+    def test_extract_many_keys_durations_on_span(self):
+        rev = "RevenueFromContractWithCustomerExcludingAssessedTax"
+        payload = {"facts": {"us-gaap": {
+            rev: {"units": {"USD": [
+                {"start": "2023-01-01", "end": "2023-12-31", "val": 1000, "accn": "k", "fp": "FY", "form": "10-K", "filed": "2024-02-01"},
+                {"start": "2023-07-01", "end": "2023-09-30", "val": 100, "accn": "q3", "fp": "Q3", "form": "10-Q", "filed": "2023-11-01"},
+                {"start": "2023-01-01", "end": "2023-09-30", "val": 290, "accn": "q3", "fp": "Q3", "form": "10-Q", "filed": "2023-11-01"},
+                {"start": "2023-01-01", "end": "2023-06-30", "val": 190, "accn": "q2", "fp": "Q2", "form": "10-Q", "filed": "2023-08-01"},
+            ]}},
+            "AccountsReceivableNetCurrent": {"units": {"USD": [
+                {"end": "2023-12-31", "val": 50, "accn": "k", "fp": "FY", "form": "10-K", "filed": "2024-02-01"},
+                # the next 10-Q repeats the year-end balance as a comparative
+                {"end": "2023-12-31", "val": 50, "accn": "q1", "fp": "Q1", "form": "10-Q", "filed": "2024-05-01"},
+                {"end": "2024-03-31", "val": 55, "accn": "q1", "fp": "Q1", "form": "10-Q", "filed": "2024-05-01"},
+            ]}},
+        }}}
+        t = extract_many(payload, "us-gaap", [rev, "AccountsReceivableNetCurrent"], "USD")
+        rows = {(r["period_end"], r["period_type"]): r for r in t.rows()}
+        self.assertEqual(set(rows), {("2023-09-30", "Q"), ("2023-12-31", "A"), ("2024-03-31", "Q")})
+        self.assertEqual(rows[("2023-09-30", "Q")][rev], 100.0)  # 3-month value, not YTD
+        self.assertEqual(rows[("2023-12-31", "A")][rev], 1000.0)
+        self.assertEqual(rows[("2023-12-31", "A")]["AccountsReceivableNetCurrent"], 50.0)
+        self.assertEqual(rows[("2024-03-31", "Q")], {"period_end": "2024-03-31", "period_type": "Q", "accn": "q1", "AccountsReceivableNetCurrent": 55.0})
+        self.assertEqual(t.instants, ["AccountsReceivableNetCurrent"])
+
+
 class TestMarketClient(unittest.TestCase):
     def test_build_stooq_url(self):
         self.assertIn("AAPL.US", build_stooq_daily_csv("AAPL", exchange_hint="NASDAQ"))
@@ -58,6 +170,59 @@ class TestMarketClient(unittest.TestCase):
         out = parse_alpha_vantage_daily(payload, "AAPL")
         self.assertIn("2024-01-02", out)
         self.assertAlmostEqual(out["2024-01-02"].close, 105.0)
+        series = PriceSeries.from_points("AAPL", out)
+        self.assertEqual(list(series), [("2024-01-02", 105.0), ("2024-01-03", 103.5)])
+
+
+_STOOQ = """Date,Open,High,Low,Close,Volume
+2024-01-02,1,1,1,100.0,10
+2024-01-03,1,1,1,101.5,10
+2024-01-05,1,1,1,99.0,10
+2024-01-08,1,1,1,102.0,10
+"""
+
+
+class _CSVFetcher:
+    def __init__(self, text):
+        self.text = text
+        self.urls = []
+
+    def get(self, url, source=None, max_age=None):
+        self.urls.append(url)
+        return FetchResult(url, 200, self.text.encode())
+
+
+class TestPriceSeries(unittest.TestCase):
+    def test_parse_and_range_queries(self):
+        s = parse_stooq_csv(io.StringIO(_STOOQ), "AAPL")
+        self.assertEqual((len(s), s.first_date, s.last_date), (4, "2024-01-02", "2024-01-08"))
+        self.assertEqual(list(s.range("2024-01-03", "2024-01-06").close), [101.5, 99.0])
+        self.assertEqual(len(s.range(end="2024-01-01")), 0)
+        self.assertEqual(s.asof("2024-01-06"), 99.0)  # weekend -> prior close
+        self.assertIsNone(s.asof("2023-12-31"))
+        after = parse_stooq_csv(io.StringIO(_STOOQ), "AAPL", after="2024-01-03")
+        self.assertEqual(after.first_date, "2024-01-05")
+        with self.assertRaises(ValueError):
+            s.append("2024-01-08", 1.0)
+        self.assertEqual(len(parse_stooq_csv(["No data"], "X")), 0)
+        shuffled = parse_stooq_csv(["Date,Open,High,Low,Close,Volume", "2024-01-03,1,1,1,2,1", "2024-01-02,1,1,1,1,1"], "X")
+        self.assertEqual(list(shuffled.close), [1.0, 2.0])
+
+    def test_store_appends_only_new_days(self):
+        with tempfile.TemporaryDirectory() as d:
+            store = PriceStore(d)
+            lines = _STOOQ.splitlines()
+            first = _CSVFetcher("\n".join(lines[:3]))
+            s = sources.prices("AAPL", "NASDAQ", store=store, fetcher=first)
+            self.assertEqual((len(s), store.last_date("AAPL")), (2, "2024-01-03"))
+            self.assertNotIn("d1=", first.urls[0])
+            # refresh: the provider returns an overlapping window; only newer rows land
+            second = _CSVFetcher(_STOOQ)
+            s = sources.prices("AAPL", "NASDAQ", store=store, fetcher=second)
+            self.assertIn("d1=20240104", second.urls[0])
+            self.assertEqual(list(s.close), [100.0, 101.5, 99.0, 102.0])
+            self.assertEqual(store.append(s), 0)
+            self.assertEqual(store.symbols(), ["AAPL"])
 
 
 if __name__ == "__main__":
@@ -1,6 +1,11 @@
 import unittest
 import json
-from services.mapper.engine import Mapper
+import os
+import random
+import tempfile
+import threading
+from services.mapper.engine import Mapper, MappingRule, period_lines
+from services.mapper.registry import GAAP_MAPPING_PATH, MapperRegistry
 from pathlib import Path
 
 GAAP_PATH = Path('services/mapper/mapping_gaap.json')
@@ -38,6 +43,139 @@ class TestMapper(unittest.TestCase):
         self.assertAlmostEqual(out['cogs'], 200)
         self.assertAlmostEqual(out['gross_profit'], 600)
 
+
+def _scan_map_period(mapper, facts_by_tag, unit):
+    """Rule-scan reference (the original map_period)."""
+    norm = {mapper.resolve_alias(k): v for k, v in facts_by_tag.items()}
+    out = {}
+    for rule in mapper.rules:
+        if rule.units and unit not in (rule.units or []):
+            continue
+        if rule.tag in norm:
+            out[rule.canonical] = rule.sign * float(norm[rule.tag])
+    if "revenue" in out and "cogs" in out and "gross_profit" not in out:
+        out["gross_profit"] = float(out["revenue"]) - float(out["cogs"])
+    return out
+
+
+class TestCompiledMapper(unittest.TestCase):
+    def _random_mapper(self, rng):
+        tags = [f"Tag{i}" for i in range(40)]
+        canon = ["revenue", "cogs", "gross_profit", "ebit", "da", "tax", "rnd"]
+        rules = [
+            MappingRule(
+                tag=rng.choice(tags),
+                canonical=rng.choice(canon),
+                sign=rng.choice([1, -1]),
+                precedence=rng.randint(0, 5),
+                units=rng.choice([None, [], ["USD"], ["EUR", "USD"], ["EUR"]]),
+            )
+            for _ in range(60)
+        ]
+        rules.sort(key=lambda r: r.precedence)
+        aliases = {f"Old{i}": rng.choice(tags) for i in range(10)}
+        return Mapper(rules=rules, aliases=aliases), tags + list(aliases)
+
+    def test_matches_rule_scan(self):
+        rng = random.Random(3)
+        for _ in range(20):
+            mapper, names = self._random_mapper(rng)
+            periods = [
+                {t: rng.uniform(-1e6, 1e6) for t in rng.sample(names, rng.randint(0, 15))}
+                for _ in range(30)
+            ]
+            for unit in ("USD", "EUR", "INR"):
+                expected = [_scan_map_period(mapper, f, unit) for f in periods]
+                got = [mapper.map_period(f, unit=unit) for f in periods]
+                self.assertEqual(got, expected)
+                self.assertEqual([list(g) for g in got], [list(e) for e in expected])  # key order too
+                self.assertEqual(mapper.map_periods(periods, unit=unit), expected)
+
+    def test_matrix_matches_map_period(self):
+        rng = random.Random(11)
+        nan = float('nan')
+        for _ in range(20):
+            mapper, names = self._random_mapper(rng)
+            cols = rng.sample(names, 20)
+            n = 25
+            columns = {t: [rng.uniform(-1e3, 1e3) if rng.random() < 0.4 else nan for _ in range(n)] for t in cols}
+            for unit in ("USD", "EUR"):
+                mapped = mapper.map_matrix(columns, unit=unit)
+                for i in range(n):
+                    facts = {t: v[i] for t, v in columns.items() if v[i] == v[i]}
+                    self.assertEqual(period_lines(mapped, i), mapper.map_period(facts, unit=unit))
+
+    def test_matrix_shipped_gaap(self):
+        gaap = Mapper.from_json_path(GAAP_PATH)
+        nan = float('nan')
+        columns = {
+            'SalesRevenueNet': [900.0, nan, 100.0],
+            'RevenueFromContractWithCustomerExcludingAssessedTax': [nan, 1000.0, 200.0],
+            'CostOfRevenue': [300.0, 400.0, nan],
+        }
+        mapped = gaap.map_matrix(columns)
+        self.assertEqual(list(mapped['revenue']), [900.0, 1000.0, 200.0])
+        self.assertEqual([period_lines(mapped, i).get('gross_profit') for i in range(3)], [600.0, 600.0, None])
+        self.assertEqual(gaap.map_matrix({}), {})
+
+    def test_shipped_tables(self):
+        gaap = Mapper.from_json_path(GAAP_PATH)
+        facts = {'SalesRevenueNet': 900, 'CostOfRevenue': 300, 'NetIncomeLoss': 10, 'Unmapped': 1}
+        self.assertEqual(gaap.map_period(facts, unit='USD'), _scan_map_period(gaap, facts, 'USD'))
+        self.assertEqual(gaap.map_period(facts, unit='EUR'), {})
+        self.assertEqual(gaap.map_periods([], unit='USD'), [])
+
+
+class TestMapperRegistry(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'mapping.json')
+        self._write('2024.0', 'revenue')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _write(self, version, canonical, mtime=None):
+        with open(self.path, 'w') as f:
+            json.dump({'version': version, 'rules': [{'tag': 'Rev', 'canonical': canonical}]}, f)
+        if mtime is not None:
+            os.utime(self.path, (mtime, mtime))
+
+    def test_cached_until_file_changes(self):
+        reg = MapperRegistry()
+        m1 = reg.get(self.path)
+        self.assertIs(reg.get(self.path), m1)
+        self.assertEqual(m1.taxonomy_version, '2024.0')
+        self._write('2025.1', 'sales', mtime=os.stat(self.path).st_mtime + 5)
+        m2 = reg.get(self.path)
+        self.assertIsNot(m2, m1)
+        self.assertEqual(m2.taxonomy_version, '2025.1')
+        self.assertEqual(m2.map_period({'Rev': 1.0}), {'sales': 1.0})
+        self.assertEqual({k: reg.stats()[k] for k in ('loads', 'reloads', 'hits')}, {'loads': 1, 'reloads': 1, 'hits': 1})
+
+    def test_broken_update_keeps_previous(self):
+        reg = MapperRegistry()
+        good = reg.get(self.path)
+        with open(self.path, 'w') as f:
+            f.write('{"rules": [')
+        os.utime(self.path, (os.stat(self.path).st_mtime + 5,) * 2)
+        self.assertIs(reg.get(self.path), good)
+        self.assertEqual(reg.stats()['errors'], 1)
+        with self.assertRaises(FileNotFoundError):
+            reg.get(os.path.join(self.tmp.name, 'missing.json'))
+
+    def test_shared_across_threads(self):
+        reg = MapperRegistry()
+        seen = []
+        threads = [threading.Thread(target=lambda: seen.append(reg.get(GAAP_MAPPING_PATH))) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(seen), 8)
+        self.assertEqual(seen[0].taxonomy_version, '2024.0')
+        self.assertIs(reg.get(GAAP_MAPPING_PATH), reg.get(GAAP_MAPPING_PATH))
+
 if __name__ == '__main__':
     unittest.main()
 
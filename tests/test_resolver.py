@@ -1,5 +1,99 @@
+import io
+import json
+import os
+import random
+import threading
+import time
 import unittest
-from services.resolver.core import resolve, Entity
+from unittest import mock
+from services.resolver.cache import ResolverCache
+from services.resolver.cli import run_bulk
+from services.resolver.core import resolve, resolve_many, Entity, EntityIndex, Candidate, ALIASES, _lev, _lev_batch, _lev_within, _norm
+
+
+def _scan_resolve(name, entities, aliases, limit=5):
+    # Reference: the original linear-scan heuristic
+    q = name.strip()
+    if not q:
+        return []
+    qn = _norm(q)
+    ranked = []
+    for e in entities:
+        if e.ticker.lower() == qn:
+            ranked.append(Candidate(e, 100.0, "exact_ticker"))
+    if qn in (_norm(k) for k in aliases.keys()):
+        target = aliases[[k for k in aliases.keys() if _norm(k) == qn][0]]
+        for e in entities:
+            if e.name == target:
+                ranked.append(Candidate(e, 95.0, "alias"))
+    for e in entities:
+        if _norm(e.name) == qn:
+            ranked.append(Candidate(e, 95.0, "exact_name"))
+    for e in entities:
+        dist = _lev(_norm(e.name), qn)
+        if 90.0 - dist >= 80:
+            ranked.append(Candidate(e, 90.0 - dist, f"lev:{dist}"))
+    for e in entities:
+        if qn and _norm(e.ticker) in qn:
+            ranked.append(Candidate(e, 82.0, "ticker_substr"))
+        if qn in _norm(e.name):
+            ranked.append(Candidate(e, 81.0, "name_substr"))
+    best = {}
+    for c in ranked:
+        key = (c.entity.exchange, c.entity.ticker)
+        if key not in best or c.score > best[key].score:
+            best[key] = c
+    return sorted(best.values(), key=lambda c: (-c.score, c.entity.exchange, c.entity.ticker))[:limit]
+
+
+def _universe(n, seed=7):
+    rng = random.Random(seed)
+    words = ["apple", "alpha", "micro", "soft", "global", "capital", "tech", "energy", "bio",
+             "first", "national", "bank", "united", "pacific", "green", "river", "data", "gold"]
+    suffixes = ["Inc.", "Corp", "Ltd", "Holdings", "plc", ""]
+    out = []
+    for i in range(n):
+        name = " ".join(rng.choice(words).capitalize() for _ in range(rng.randint(1, 3)))
+        name = f"{name} {rng.choice(suffixes)}".strip()
+        ticker = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(1, 4)))
+        out.append(Entity(name=name, ticker=ticker, exchange=rng.choice(["NYSE", "NASDAQ"]), country="US"))
+    return out
+
+
+def _syllable_universe(n, seed=7):
+    # Names built from syllables: unlike `_universe`'s small word list they
+    # are nearly all distinct, so a typo query has no close neighbours and
+    # its fuzzy search runs with a wide distance bound
+    rng = random.Random(seed)
+    onsets = "b c d f g h j k l m n p r s t v w z br ch cl cr dr fl gr kr pl pr sh st th tr".split()
+    vowels = "a e i o u ai ea io ou y".split()
+    suffixes = ["Inc.", "Corp", "Ltd", "Holdings", "plc", "Group", "Technologies", "Capital", ""]
+    out = []
+    for _ in range(n):
+        words = [
+            "".join(rng.choice(onsets) + rng.choice(vowels) for _ in range(rng.randint(2, 4))).capitalize()
+            for _ in range(rng.choice((1, 1, 2, 2, 3)))
+        ]
+        name = f"{' '.join(words)} {rng.choice(suffixes)}".strip()
+        ticker = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(rng.randint(1, 4)))
+        out.append(Entity(name=name, ticker=ticker, exchange=rng.choice(["NYSE", "NASDAQ"]), country="US"))
+    return out
+
+
+def _typo_queries(ents, count, seed=5):
+    # names with one substituted or deleted character, or left intact
+    rng = random.Random(seed)
+    out = []
+    for _ in range(count):
+        s = list(rng.choice(ents).name)
+        r = rng.random()
+        if r < 0.6:
+            s[rng.randrange(len(s))] = rng.choice("abcdefghijklmnopqrstuvwxyz")
+        elif r < 0.8:
+            del s[rng.randrange(len(s))]
+        out.append("".join(s))
+    return out
+
 
 class TestResolver(unittest.TestCase):
     def test_exact_alias(self):
@@ -19,6 +113,174 @@ class TestResolver(unittest.TestCase):
     def test_empty(self):
         self.assertEqual(resolve(""), [])
 
+
+class TestBatchResolve(unittest.TestCase):
+    def test_resolve_many_matches_resolve(self):
+        names = ["Google", "  google ", "", "msft", "Gooogle", "Apple Inc."]
+        got = resolve_many(names)
+        self.assertEqual(got, [resolve(n) for n in names])
+
+    def test_bulk_jsonl(self):
+        out = io.StringIO()
+        n = run_bulk(io.StringIO("Apple\nmsft\n\n"), out, limit=1)
+        self.assertEqual(n, 3)
+        lines = [json.loads(l) for l in out.getvalue().splitlines()]
+        self.assertEqual([l["query"] for l in lines], ["Apple", "msft", ""])
+        self.assertEqual(lines[0]["candidates"][0]["ticker"], "AAPL")
+        self.assertEqual(lines[2]["candidates"], [])
+
+    def test_bulk_csv_column(self):
+        out = io.StringIO()
+        run_bulk(io.StringIO("company,weight\nInfosys,0.5\n"), out, column="company")
+        self.assertEqual(json.loads(out.getvalue())["candidates"][0]["ticker"], "INFY")
+
+    def test_bulk_csv_unknown_column(self):
+        out = io.StringIO()
+        with self.assertRaises(ValueError) as ctx:
+            run_bulk(io.StringIO("company,weight\nInfosys,0.5\n"), out, column="name")
+        self.assertIn("company, weight", str(ctx.exception))
+        self.assertEqual(out.getvalue(), "")
+
+
+class TestResolverCache(unittest.TestCase):
+    def setUp(self):
+        self.now = 0.0
+        self.cache = ResolverCache(maxsize=2, ttl=10.0, negative_ttl=1.0, clock=lambda: self.now)
+
+    def test_hits_and_normalized_key(self):
+        first = self.cache.resolve("Google")
+        self.assertEqual(self.cache.resolve(" GOOGLE "), first)
+        st = self.cache.stats()
+        self.assertEqual((st["hits"], st["misses"]), (1, 1))
+        self.assertAlmostEqual(st["hit_rate"], 0.5)
+
+    def test_ttl_and_negative_entries(self):
+        junk = "q" * 40
+        self.assertEqual(self.cache.resolve(junk), [])
+        self.assertEqual(self.cache.resolve(junk), [])
+        self.assertEqual(self.cache.stats()["negative_hits"], 1)
+        self.now = 2.0  # past the negative TTL, within the positive one
+        self.cache.resolve("Apple")
+        self.cache.resolve(junk)
+        self.cache.resolve("Apple")
+        st = self.cache.stats()
+        self.assertEqual((st["hits"], st["expirations"]), (1, 1))
+        self.now = 20.0
+        self.cache.resolve("Apple")
+        self.assertEqual(self.cache.stats()["expirations"], 2)
+
+    def test_lru_eviction(self):
+        for n in ("Apple", "Google", "msft"):
+            self.cache.resolve(n)
+        st = self.cache.stats()
+        self.assertEqual((st["size"], st["evictions"]), (2, 1))
+        self.cache.resolve("Apple")  # evicted, so a miss
+        self.assertEqual(self.cache.stats()["misses"], 4)
+
+    def test_store_version_invalidates(self):
+        self.cache.resolve("Apple")
+        with mock.patch("services.resolver.cache.universe_version", return_value="v2"):
+            self.cache.resolve("Apple")
+        self.assertEqual(self.cache.stats()["misses"], 2)
+
+    def test_threads(self):
+        cache = ResolverCache(maxsize=8)
+        errors = []
+
+        def work():
+            try:
+                for n in ("Apple", "Google", "msft", "Infosys") * 50:
+                    self.assertTrue(cache.resolve(n))
+            except Exception as e:  # pragma: no cover
+                errors.append(e)
+
+        ts = [threading.Thread(target=work) for _ in range(4)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        self.assertEqual(errors, [])
+        st = cache.stats()
+        self.assertEqual(st["hits"] + st["misses"], 800)
+
+
+class TestBoundedDistance(unittest.TestCase):
+    def test_matches_full_dp(self):
+        rng = random.Random(3)
+        words = ["".join(rng.choice("abcde") for _ in range(rng.randint(0, 14))) for _ in range(80)]
+        for q in words[:20]:
+            for k in (0, 2, 10):
+                want = [d if d <= k else k + 1 for d in (_lev(q, w) for w in words)]
+                self.assertEqual(_lev_batch(q, words, k), want, f"q={q!r} k={k}")
+
+    def test_cutoff(self):
+        self.assertEqual(_lev_within("gooogle", "google", 1), 1)
+        self.assertEqual(_lev_within("gooogle", "alphabetinc", 3), 4)
+        self.assertEqual(_lev_within("", "abc", 5), 3)
+        # longer than one machine word
+        a = "x" * 70 + "apple"
+        self.assertEqual(_lev_within(a, "x" * 70 + "appel", 5), 2)
+
+
+class TestEntityIndex(unittest.TestCase):
+    def test_matches_linear_scan(self):
+        ents = _universe(500)
+        aliases = {**ALIASES, "green bank": ents[0].name}
+        idx = EntityIndex(ents, aliases)
+        rng = random.Random(11)
+        queries = ["", "!!!", "a", "ab", "green bank", "Gooogle", ents[3].ticker, ents[5].name]
+        for _ in range(30):
+            e = rng.choice(ents)
+            s = _norm(e.name)
+            if s and rng.random() < 0.7:
+                j = rng.randrange(len(s))
+                s = s[:j] + rng.choice("xyz") + s[j + 1:]
+            queries.append(s[: rng.randint(1, len(s) or 1)] if rng.random() < 0.3 else s)
+        for q in queries:
+            full = _scan_resolve(q, ents, aliases, limit=len(ents))
+            for limit in (1, 5, 20):
+                got = resolve(q, limit=limit, index=idx)
+                self.assertEqual(got, full[:limit], f"query={q!r} limit={limit}")
+
+    def test_short_queries_match_linear_scan(self):
+        ents = _universe(800, seed=3)
+        idx = EntityIndex(ents, ALIASES)
+        for q in ("u", "a", "aa", "ab", "zq", "x", "ol", "!!!"):
+            full = _scan_resolve(q, ents, ALIASES, limit=len(ents))
+            for limit in (1, 5, 60):
+                self.assertEqual(resolve(q, limit=limit, index=idx), full[:limit], f"query={q!r} limit={limit}")
+
+    def test_seed_index_matches_scan(self):
+        from services.resolver.core import SEED_ENTITIES
+        for q in ("Google", "Gooogle", "msft", "Infosys", "Apple Inc.", "inc"):
+            self.assertEqual(resolve(q), _scan_resolve(q, SEED_ENTITIES, ALIASES))
+
+    def test_distinct_names_match_linear_scan(self):
+        ents = _syllable_universe(1500, seed=9)
+        idx = EntityIndex(ents, ALIASES)
+        for q in _typo_queries(ents, 25, seed=2) + ["a", "Plio", "Holdings"]:
+            full = _scan_resolve(q, ents, ALIASES, limit=len(ents))
+            for limit in (1, 5, 20):
+                self.assertEqual(resolve(q, limit=limit, index=idx), full[:limit], f"query={q!r} limit={limit}")
+
+
+@unittest.skipUnless(os.environ.get("RESOLVER_BENCH"), "latency benchmark; set RESOLVER_BENCH=1 to run")
+class TestResolverLatency(unittest.TestCase):
+    def test_p95_at_100k(self):
+        # acceptance bar for resolve(): p95 < 200 ms over a 100k-entity
+        # universe of distinct, realistic names queried with typos
+        ents = _syllable_universe(100_000)
+        idx = EntityIndex(ents, ALIASES)
+        queries = ["U", "a", "ab", "Apple", "Gooogle", "xyz", "tech"] + _typo_queries(ents, 150)
+        times = []
+        for q in queries:
+            t0 = time.perf_counter()
+            resolve(q, index=idx)
+            times.append(time.perf_counter() - t0)
+        times.sort()
+        p95 = times[int(len(times) * 0.95)]
+        self.assertLess(p95, 0.2, f"p95={p95 * 1000:.0f}ms")
+
+
 if __name__ == "__main__":
     unittest.main()
-
@@ -0,0 +1,90 @@
+import json
+import threading
+import time
+import unittest
+
+from services.ingestion import sources
+from services.ingestion.fetcher import FetchResult
+from services.ingestion.singleflight import SingleFlight
+
+
+def _run_threads(n, target):
+    results, errors = [None] * n, []
+    start = threading.Barrier(n)
+
+    def work(i):
+        start.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            errors.append(e)
+
+    ts = [threading.Thread(target=work, args=(i,)) for i in range(n)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    return results, errors
+
+
+class TestSingleFlight(unittest.TestCase):
+    def test_concurrent_calls_share_one_execution(self):
+        sf = SingleFlight()
+        calls = []
+
+        def slow():
+            calls.append(1)
+            time.sleep(0.1)
+            return {"value": 42}
+
+        results, errors = _run_threads(8, lambda: sf.do("k", slow))
+        self.assertEqual(errors, [])
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(all(r is results[0] for r in results))
+        self.assertEqual(sf.stats, {"executed": 1, "shared": 7})
+        self.assertEqual(sf.in_flight(), 0)
+        # released after completion: the next call runs again
+        sf.do("k", slow)
+        self.assertEqual(len(calls), 2)
+
+    def test_errors_reach_every_waiter(self):
+        sf = SingleFlight()
+
+        def boom():
+            time.sleep(0.05)
+            raise ValueError("upstream down")
+
+        _, errors = _run_threads(4, lambda: sf.do("k", boom))
+        self.assertEqual(len(errors), 4)
+        self.assertTrue(all(isinstance(e, ValueError) for e in errors))
+
+
+class _FakeFetcher:
+    def __init__(self, payload):
+        self.body = json.dumps(payload).encode()
+        self.urls = []
+
+    def get(self, url, source=None, max_age=None):
+        self.urls.append(url)
+        time.sleep(0.1)
+        return FetchResult(url, 200, self.body)
+
+
+class TestCompanyFacts(unittest.TestCase):
+    def test_concurrent_runs_coalesce(self):
+        payload = {"facts": {"us-gaap": {"Revenues": {"units": {"USD": [
+            {"end": "2023-12-31", "val": 100.0, "fp": "FY", "filed": "2024-02-01"},
+        ]}}}}}
+        fetcher = _FakeFetcher(payload)
+        results, errors = _run_threads(6, lambda: sources.company_facts("320193", ["Revenues"], fetcher=fetcher))
+        self.assertEqual(errors, [])
+        self.assertEqual(len(fetcher.urls), 1)
+        self.assertTrue(fetcher.urls[0].endswith("CIK0000320193.json"))
+        self.assertEqual(list(results[0].values["Revenues"]), [100.0])
+        # a different tag set is a different flight
+        sources.company_facts(320193, ["Revenues", "CostOfRevenue"], fetcher=fetcher)
+        self.assertEqual(len(fetcher.urls), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+import json
+import threading
+import time
+import unittest
+from datetime import date, timedelta
+from unittest import mock
+
+from services.ingestion.fetcher import FetchError, FetchResult
+from services.ingestion.stage import IngestRequest, ingest
+
+
+_FACTS = {"cik": 1, "facts": {"us-gaap": {
+    "RevenueFromContractWithCustomerExcludingAssessedTax": {"units": {"INR": [
+        {"end": "2024-03-31", "val": 8340.0, "fp": "FY", "form": "20-F", "filed": "2024-05-01"},
+    ]}},
+    "CostOfRevenue": {"units": {"INR": [
+        {"end": "2024-03-31", "val": 4170.0, "fp": "FY", "form": "20-F", "filed": "2024-05-01"},
+    ]}},
+}}}
+_SUBMISSIONS = {"cik": "1", "name": "Infosys Ltd", "fiscalYearEnd": "0331", "filings": {"recent": {"accessionNumber": ["x"] * 50}}}
+_CSV = "Date,Open,High,Low,Close,Volume\n2024-03-27,1,1,1,10.0,1\n2024-03-28,1,1,1,10.5,1\n"
+_FX = {"base": "USD", "rates": {"2024-03-28": {"INR": 83.4}}}
+
+
+class _RoutingFetcher:
+    """Serves canned bodies by URL substring after a fixed delay; tracks concurrency per source."""
+
+    def __init__(self, delay=0.2, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.lock = threading.Lock()
+        self.active = {}
+        self.peak = {}
+
+    def get(self, url, source=None, max_age=None):
+        with self.lock:
+            self.active[source] = self.active.get(source, 0) + 1
+            self.peak[source] = max(self.peak.get(source, 0), self.active[source])
+        try:
+            time.sleep(self.delay)
+            if "companyfacts" in url:
+                body = _FACTS
+            elif "submissions" in url:
+                body = _SUBMISSIONS
+            elif "timeseries" in url:
+                body = _FX
+            else:
+                body = None
+            if source in self.fail:
+                raise FetchError(url, 503, "down")
+            raw = _CSV.encode() if body is None else json.dumps(body).encode()
+            return FetchResult(url, 200, raw)
+        finally:
+            with self.lock:
+                self.active[source] -= 1
+
+
+def _request(**kw):
+    base = dict(cik="0001067491", tags=("RevenueFromContractWithCustomerExcludingAssessedTax", "CostOfRevenue"),
+                unit="INR", ticker="INFY", exchange_hint="NYSE", benchmark="^SPX", fx_quote="INR")
+    base.update(kw)
+    return IngestRequest(**base)
+
+
+class TestIngestStage(unittest.TestCase):
+    def test_sources_overlap(self):
+        fetcher = _RoutingFetcher(delay=0.2)
+        res = ingest(_request(), fetcher=fetcher)
+        self.assertEqual(res.errors, {})
+        self.assertEqual(set(res.timings), {"facts", "profile", "prices", "benchmark", "fx"})
+        # five 0.2s sources: sequential would take ~1s
+        self.assertLess(res.elapsed, 0.6)
+        self.assertEqual(res.facts.periods, ["2024-03-31"])
+        self.assertEqual(res.profile["fiscal_year_end"], "03-31")
+        self.assertNotIn("filings", res.profile)
+        self.assertEqual(res.prices.last_date, "2024-03-28")
+        self.assertAlmostEqual(res.fx.rate("INR", "USD", "2024-03-31"), 1 / 83.4)
+
+    def test_per_host_limit_and_partial_failure(self):
+        fetcher = _RoutingFetcher(delay=0.05, fail={"market"})
+        res = ingest(_request(), fetcher=fetcher, per_host=1)
+        self.assertEqual(max(fetcher.peak.values()), 1)
+        self.assertEqual(set(res.errors), {"prices", "benchmark"})
+        self.assertIn("FetchError", res.errors["prices"])
+        self.assertIsNotNone(res.facts)
+        self.assertIsNone(res.prices)
+
+    def test_per_host_limit_spans_runs(self):
+        fetcher = _RoutingFetcher(delay=0.05)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(ingest(_request(), fetcher=fetcher, per_host=1)))
+                   for _ in range(3)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), 3)
+        self.assertTrue(all(r.errors == {} for r in results))
+        self.assertEqual(max(fetcher.peak.values()), 1)
+
+    def test_nothing_requested(self):
+        res = ingest(IngestRequest(), fetcher=_RoutingFetcher())
+        self.assertEqual((res.timings, res.errors), ({}, {}))
+
+    def test_history_from_ingested_facts(self):
+        from services.api.orchestrator import _history_from_facts
+        from services.mapper.engine import Mapper
+
+        res = ingest(_request(), fetcher=_RoutingFetcher(delay=0))
+        mapper = Mapper.from_json_path("services/mapper/mapping_gaap.json")
+        annual, quarterly = _history_from_facts(res, mapper, "INR")
+        self.assertEqual(quarterly, [])
+        self.assertEqual(annual[0]["period_end"], "2024-03-31")
+        self.assertAlmostEqual(annual[0]["revenue"], 100.0)
+        self.assertAlmostEqual(annual[0]["gross_profit"], 50.0)
+
+    def test_history_store_syncs_instead_of_raw_facts(self):
+        import tempfile
+        from services.historical.store import HistoryStore
+        from services.mapper.engine import Mapper
+
+        mapper = Mapper.from_json_path("services/mapper/mapping_gaap.json")
+        with tempfile.TemporaryDirectory() as tmp:
+            req = _request(history_store=HistoryStore(tmp), mapper=mapper, fx_quote=None)
+            res = ingest(req, fetcher=_RoutingFetcher(delay=0))
+            self.assertIsNone(res.facts)
+            self.assertNotIn("facts", res.timings)
+            self.assertEqual([(r["period_end"], r["period_type"]) for r in res.history.rows()], [("2024-03-31", "A")])
+            self.assertEqual(HistoryStore(tmp).load(req.cik).source_version, res.history.source_version)
+
+    def test_history_older_than_fx_window_is_dropped(self):
+        from services.api.orchestrator import _history_from_facts
+        from services.mapper.engine import Mapper
+
+        old = {"start": "2004-04-01", "end": "2005-03-31", "val": 999.0, "fp": "FY", "form": "20-F", "filed": "2005-05-01"}
+        facts = json.loads(json.dumps(_FACTS))
+        facts["facts"]["us-gaap"]["RevenueFromContractWithCustomerExcludingAssessedTax"]["units"]["INR"].insert(0, old)
+        # a year of weekly quotes at the same rate, so the FY average matches the close
+        weeks = [date(2023, 3, 31) + timedelta(days=7 * k) for k in range(53)]
+        fx = {"base": "USD", "rates": {d.isoformat(): {"INR": 83.4} for d in weeks}}
+        with mock.patch(__name__ + "._FACTS", facts), mock.patch(__name__ + "._FX", fx):
+            res = ingest(_request(), fetcher=_RoutingFetcher(delay=0))
+        self.assertEqual(res.facts.periods, ["2005-03-31", "2024-03-31"])
+        annual, _ = _history_from_facts(res, Mapper.from_json_path("services/mapper/mapping_gaap.json"), "INR")
+        # the FX history starts in 2024: the 2005 filing cannot be converted and is left out
+        self.assertEqual([r["period_end"] for r in annual], ["2024-03-31"])
+        self.assertAlmostEqual(annual[0]["revenue"], 100.0)
+
+    def test_fx_failure_falls_back_to_stub(self):
+        from services.api import orchestrator
+        from services.mapper.engine import Mapper
+
+        res = ingest(_request(), fetcher=_RoutingFetcher(delay=0, fail={"fx"}))
+        self.assertIsNone(res.fx)
+        self.assertIn("fx", res.errors)
+        with self.assertRaises(ValueError):
+            orchestrator._history_from_facts(res, Mapper.from_json_path("services/mapper/mapping_gaap.json"), "INR")
+
+        run = orchestrator.Run(id="r_fxdown", company_name="Infosys")
+        with mock.patch.object(orchestrator, "_ingest_live", return_value=res):
+            orchestrator.orchestrate(run)
+        self.assertEqual((run.status, run.error), ("completed", None))
+        messages = [e["message"] for e in run.events]
+        self.assertTrue(any("FX conversion failed" in m for m in messages))
+        self.assertIn("Fetching & mapping facts (stub dataset)", messages)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,18 @@
+import random
+import tempfile
 import unittest
+from unittest import mock
+from datetime import date, timedelta
+from services.forecasting.assumptions import Scenario
+from services.forecasting.engine import project_12q
+from services.ingestion.prices import PriceSeries, PriceStore
+from services.valuation.beta import BetaCache, aligned_returns, beta_many, rolling_beta
 from services.valuation.fcff import FCFFInputs, fcff
 from services.valuation.wacc import WACCInputs, wacc
 from services.valuation.terminal import TerminalInputs, gordon_pv
 from services.valuation.discount import discount_factors, present_value
+from services.valuation.montecarlo import Fixed, MonteCarloSpec, Normal, Uniform, parse_dist, path_ev, simulate
+from services.valuation.sketch import QuantileSketch
 
 class TestValuation(unittest.TestCase):
     def test_fcff(self):
@@ -27,6 +37,196 @@ class TestValuation(unittest.TestCase):
         pv = present_value([100, 100, 100], 0.1)
         self.assertAlmostEqual(pv, sum([100/1.1, 100/(1.1**2), 100/(1.1**3)]))
 
+
+def _ols(x, y):
+    n = len(x)
+    mx, my = sum(x) / n, sum(y) / n
+    return sum((a - mx) * (b - my) for a, b in zip(x, y)) / sum((a - mx) ** 2 for a in x)
+
+
+def _market(n=400, seed=7):
+    rng = random.Random(seed)
+    d0 = date(2022, 1, 3)
+    days = [d0 + timedelta(days=k) for k in range(n) if (d0 + timedelta(days=k)).weekday() < 5]
+    bench, stocks = PriceSeries("^SPX"), {t: PriceSeries(t) for t in ("AAA", "BBB")}
+    b, px = 100.0, {"AAA": 50.0, "BBB": 20.0}
+    for k, d in enumerate(days):
+        if k:
+            r = rng.gauss(0, 0.01)
+            b *= 1 + r
+            px["AAA"] *= 1 + 1.5 * r + rng.gauss(0, 0.002)
+            px["BBB"] *= 1 + 0.5 * r + rng.gauss(0, 0.002)
+        bench.append(d.isoformat(), b)
+        for t, s in stocks.items():
+            s.append(d.isoformat(), px[t])
+    return bench, stocks
+
+
+class TestBeta(unittest.TestCase):
+    def test_matches_naive_regression(self):
+        bench, stocks = _market()
+        _, x, y = aligned_returns(stocks["AAA"], bench)
+        betas = beta_many(stocks, bench, window=60)
+        self.assertAlmostEqual(betas["AAA"], _ols(x[-60:], y[-60:]), places=9)
+        self.assertAlmostEqual(betas["AAA"], 1.5, delta=0.1)
+        self.assertAlmostEqual(betas["BBB"], 0.5, delta=0.1)
+        days, roll = rolling_beta(stocks["AAA"], bench, 60)
+        self.assertEqual(len(roll), len(x) - 59)
+        for k in (0, 50, len(roll) - 1):
+            self.assertAlmostEqual(roll[k], _ols(x[k:k + 60], y[k:k + 60]), places=9)
+        self.assertAlmostEqual(roll[-1], betas["AAA"], places=9)
+        # as_of picks the window ending on that day
+        as_of = bench.range(end="2022-07-03")  # Sunday -> Friday close
+        k = list(days).index(as_of.days[-1])
+        self.assertAlmostEqual(beta_many(stocks, bench, 60, as_of="2022-07-03")["AAA"], roll[k], places=9)
+
+    def test_gaps_and_short_history(self):
+        bench, stocks = _market()
+        gappy = PriceSeries("GAP")
+        for k, (d, c) in enumerate(stocks["AAA"]):
+            if k % 10 != 5:
+                gappy.append(d, c)
+        out = beta_many({"GAP": gappy, "NEW": stocks["AAA"].range(start="2023-01-20")}, bench, 60, min_obs=30)
+        self.assertIsNotNone(out["GAP"])
+        self.assertAlmostEqual(out["GAP"], 1.5, delta=0.15)
+        self.assertIsNone(out["NEW"])
+
+    def test_cache_per_ticker_window_asof(self):
+        bench, stocks = _market()
+        with tempfile.TemporaryDirectory() as d:
+            store = PriceStore(d)
+            for s in [bench, *stocks.values()]:
+                store.append(s)
+            cache = BetaCache()
+            first = cache.get_many(["AAA", "BBB"], store, "^SPX", 60)
+            self.assertEqual(cache.stats(), {"hits": 0, "misses": 2, "size": 2})
+            self.assertEqual(cache.get("AAA", store, "^SPX", 60), first["AAA"])
+            self.assertEqual(cache.stats()["hits"], 1)
+            cache.get("AAA", store, "^SPX", 120)
+            self.assertEqual(cache.stats()["size"], 3)
+            self.assertIsNone(cache.get("ZZZ", store, "^SPX", 60))
+            self.assertIsNone(cache.get("AAA", store, "^NOPE", 60))
+
+    def test_cache_recomputes_after_ticker_prices_appended(self):
+        bench, stocks = _market()
+        with tempfile.TemporaryDirectory() as d:
+            store = PriceStore(d)
+            store.append(bench)
+            cache = BetaCache()
+            self.assertIsNone(cache.get("AAA", store, "^SPX", 60))  # ingest failed: no prices yet
+            store.append(stocks["AAA"].range(end=stocks["AAA"].first_date))
+            self.assertIsNone(cache.get("AAA", store, "^SPX", 60))  # one day is too short
+            store.append(stocks["AAA"])
+            self.assertEqual(cache.get("AAA", store, "^SPX", 60), beta_many(stocks, bench, 60)["AAA"])
+            self.assertIsNotNone(cache.get("AAA", store, "^SPX", 60))
+            self.assertEqual(cache.stats(), {"hits": 1, "misses": 3, "size": 3})
+
+    def test_cache_hits_skip_loading_series(self):
+        bench, stocks = _market()
+        with tempfile.TemporaryDirectory() as d:
+            store = PriceStore(d)
+            for s in [bench, *stocks.values()]:
+                store.append(s)
+            cache = BetaCache()
+            weekend = "2022-07-03"
+            first = cache.get_many(["AAA"], store, "^SPX", 60, as_of=weekend)
+            self.assertEqual(first["AAA"], beta_many(stocks, bench, 60, as_of=weekend)["AAA"])
+            with mock.patch.object(store, "load", side_effect=AssertionError("series loaded")):
+                self.assertEqual(cache.get_many(["AAA"], store, "^SPX", 60, as_of=weekend), first)
+                # the Friday before the weekend keys the same entry
+                self.assertEqual(cache.get("AAA", store, "^SPX", 60, as_of=store.last_date("^SPX", weekend)), first["AAA"])
+            self.assertEqual(cache.stats()["hits"], 2)
+            self.assertIsNone(cache.get("AAA", store, "^SPX", 60, as_of="1999-01-01"))
+            self.assertEqual(store.last_date("^SPX"), bench.last_date)
+            self.assertEqual(store.last_date("^SPX", bench.first_date), bench.first_date)
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_exact_when_small(self):
+        sk = QuantileSketch(k=200, seed=1)
+        sk.update_many([5.0, 1.0, 3.0, 2.0, 4.0, float("nan")])
+        self.assertEqual(len(sk), 5)
+        self.assertEqual(sk.quantiles([0.0, 0.2, 0.5, 1.0]), [1.0, 1.0, 3.0, 5.0])
+        self.assertIsNone(QuantileSketch().quantile(0.5))
+
+    def test_rank_error_and_merge(self):
+        rnd = random.Random(3)
+        values = [rnd.random() for _ in range(50_000)]
+        whole = QuantileSketch(seed=1)
+        whole.update_many(values)
+        left, right = QuantileSketch(seed=2), QuantileSketch(seed=3)
+        left.update_many(values[:20_000])
+        right.update_many(values[20_000:])
+        merged = left.merge(right)
+        self.assertEqual(len(merged), 50_000)
+        ordered = sorted(values)
+        for sk in (whole, merged):
+            self.assertLess(sum(len(level) for level in sk._levels), 2_000)
+            for q in (0.01, 0.25, 0.5, 0.75, 0.99):
+                got = sk.quantile(q)
+                true_rank = (ordered.index(got) + 1) / len(ordered)
+                self.assertLess(abs(true_rank - q), 0.02)
+
+    def test_seeded_is_deterministic(self):
+        values = [random.Random(9).gauss(0, 1) for _ in range(10_000)]
+        a, b = QuantileSketch(seed="x"), QuantileSketch(seed="x")
+        a.update_many(values)
+        b.update_many(values)
+        self.assertEqual(a.quantiles([0.1, 0.5, 0.9]), b.quantiles([0.1, 0.5, 0.9]))
+
+
+class TestMonteCarlo(unittest.TestCase):
+    base = Scenario(0.02, 0.6, 0.2, 45, 60, 50, 0.05, 0.03, 0.25)
+    last_q = {"revenue": 1000.0, "ar": 100.0, "inventory": 80.0, "ap": 70.0}
+
+    def test_fixed_inputs_match_point_valuation(self):
+        rows = project_12q(self.last_q, self.base)
+        fcfs = [fcff(FCFFInputs(r["ebit"], 0.25, r["da"], r["capex"], r["delta_nwc"])) for r in rows]
+        expected = path_ev(fcfs, 0.08, 0.03)
+        dfs = discount_factors(0.08, 12)
+        self.assertAlmostEqual(expected, present_value(fcfs, 0.08) + fcfs[-1] * 1.03 / 0.05 * dfs[-1], places=6)
+        res = simulate(self.last_q, MonteCarloSpec(self.base), paths=250, chunk_size=100)
+        self.assertEqual((res.paths, res.rejected), (250, 0))
+        self.assertEqual(set(res.percentiles().values()), {expected})
+        self.assertAlmostEqual(res.mean, expected, places=6)
+
+    def test_seeded_chunked_and_process_independent(self):
+        spec = MonteCarloSpec(
+            self.base,
+            {"revenue_growth_qoq": Normal(0.02, 0.01), "target_operating_margin": Uniform(0.1, 0.3)},
+            wacc=Uniform(0.07, 0.09),
+        )
+        a = simulate(self.last_q, spec, paths=3_000, seed=11, chunk_size=1_000)
+        b = simulate(self.last_q, spec, paths=3_000, seed=11, chunk_size=1_000, processes=2)
+        c = simulate(self.last_q, spec, paths=3_000, seed=12, chunk_size=1_000)
+        self.assertEqual(a.percentiles(), b.percentiles())
+        self.assertEqual(a.mean, b.mean)
+        self.assertNotEqual(a.percentiles(), c.percentiles())
+        p = a.percentiles((5, 50, 95))
+        self.assertLess(p[5], p[50])
+        self.assertLess(p[50], p[95])
+
+    def test_invalid_draws_are_rejected(self):
+        spec = MonteCarloSpec(
+            self.base,
+            {"target_operating_margin": Uniform(0.4, 0.8)},  # > 60% fails validate_scenario
+            terminal_growth=Fixed(0.03),
+        )
+        res = simulate(self.last_q, spec, paths=1_000, seed=1)
+        self.assertEqual(res.paths + res.rejected, 1_000)
+        self.assertGreater(res.rejected, 0)
+        self.assertGreater(res.paths, 0)
+        bad = simulate(self.last_q, MonteCarloSpec(self.base, wacc=Fixed(0.02)), paths=10)
+        self.assertEqual((bad.paths, bad.rejected, bad.mean), (0, 10, None))
+
+    def test_parse_dist(self):
+        self.assertEqual(parse_dist(0.05), Fixed(0.05))
+        self.assertEqual(parse_dist({"dist": "normal", "mu": 0.02, "sigma": 0.01}), Normal(0.02, 0.01))
+        with self.assertRaises(ValueError):
+            parse_dist({"dist": "cauchy"})
+        with self.assertRaises(ValueError):
+            MonteCarloSpec(self.base, {"wacc": Fixed(0.08)})
+
+
 if __name__ == '__main__':
     unittest.main()
 